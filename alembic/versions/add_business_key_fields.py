@@ -0,0 +1,89 @@
+"""
+Add normalized GSTIN / invoice number key columns to invoices
+
+Revision ID: add_business_key_fields
+Revises: add_content_sha256_field
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.normalization import normalize_gstin_key, normalize_invoice_number_key
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_business_key_fields'
+down_revision = 'add_content_sha256_field'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Check if columns already exist (for existing databases)
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'gst_number_key' not in columns:
+        op.add_column('invoices', sa.Column('gst_number_key', sa.String(length=20), nullable=True))
+
+    if 'invoice_number_key' not in columns:
+        op.add_column('invoices', sa.Column('invoice_number_key', sa.String(length=100), nullable=True))
+
+    # Check if index exists before creating it
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+
+    if 'ix_invoices_business_key' not in existing_indexes:
+        op.create_index('ix_invoices_business_key', 'invoices', ['gst_number_key', 'invoice_number_key'])
+
+    # Backfill: normalization lives in Python, so compute keys client-side in batches
+    invoices = sa.table(
+        'invoices',
+        sa.column('id', sa.Integer),
+        sa.column('gst_number', sa.String),
+        sa.column('invoice_number', sa.String),
+        sa.column('gst_number_key', sa.String),
+        sa.column('invoice_number_key', sa.String),
+    )
+    rows = connection.execute(
+        sa.select(invoices.c.id, invoices.c.gst_number, invoices.c.invoice_number)
+        .where(sa.or_(invoices.c.gst_number.isnot(None), invoices.c.invoice_number.isnot(None)))
+    ).fetchall()
+
+    update_stmt = (
+        invoices.update()
+        .where(invoices.c.id == sa.bindparam('row_id'))
+        .values(gst_number_key=sa.bindparam('gst_key'), invoice_number_key=sa.bindparam('inv_key'))
+    )
+    batch = []
+    for row_id, gst_number, invoice_number in rows:
+        batch.append({
+            'row_id': row_id,
+            'gst_key': normalize_gstin_key(gst_number),
+            'inv_key': normalize_invoice_number_key(invoice_number),
+        })
+        if len(batch) >= 1000:
+            connection.execute(update_stmt, batch)
+            batch = []
+    if batch:
+        connection.execute(update_stmt, batch)
+
+
+def downgrade():
+    # Check if index exists before dropping it
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+
+    if 'ix_invoices_business_key' in existing_indexes:
+        op.drop_index('ix_invoices_business_key', table_name='invoices')
+
+    # Check if columns exist before dropping them
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'invoice_number_key' in columns:
+        op.drop_column('invoices', 'invoice_number_key')
+
+    if 'gst_number_key' in columns:
+        op.drop_column('invoices', 'gst_number_key')
@@ -0,0 +1,52 @@
+"""
+Add content_sha256 column to invoices
+
+Revision ID: add_content_sha256_field
+Revises: add_po_number_field
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_content_sha256_field'
+down_revision = 'add_po_number_field'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Check if column already exists (for existing databases)
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    # Add content_sha256 column if it doesn't exist
+    if 'content_sha256' not in columns:
+        op.add_column('invoices', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+
+    # Check if index exists before creating it
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+
+    if 'ix_invoices_content_sha256' not in existing_indexes:
+        op.create_index('ix_invoices_content_sha256', 'invoices', ['content_sha256'])
+
+    # Existing rows are hashed by scripts/backfill_content_hashes.py
+
+
+def downgrade():
+    # Check if index exists before dropping it
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+
+    if 'ix_invoices_content_sha256' in existing_indexes:
+        op.drop_index('ix_invoices_content_sha256', table_name='invoices')
+
+    # Check if column exists before dropping it
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'content_sha256' in columns:
+        op.drop_column('invoices', 'content_sha256')
@@ -0,0 +1,135 @@
+"""
+Move invoices.selected_line_items JSON into an invoice_line_items table
+
+Revision ID: add_invoice_line_items_table
+Revises: move_raw_text_to_invoice_texts
+Create Date: 2026-10-19
+"""
+
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from models.invoice_line_item import InvoiceLineItem
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_invoice_line_items_table'
+down_revision = 'move_raw_text_to_invoice_texts'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # Create table if it doesn't exist (for existing databases)
+    if 'invoice_line_items' not in inspector.get_table_names():
+        op.create_table(
+            'invoice_line_items',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('invoice_id', sa.Integer(), sa.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('is_selected', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('line_item', sa.Text(), nullable=True),
+            sa.Column('hsn_sac', sa.String(length=20), nullable=True),
+            sa.Column('gst_percent', sa.Float(), nullable=True),
+            sa.Column('basic_amount', sa.Float(), nullable=True),
+            sa.Column('igst_amount', sa.Float(), nullable=True),
+            sa.Column('cgst_amount', sa.Float(), nullable=True),
+            sa.Column('sgst_amount', sa.Float(), nullable=True),
+            sa.Column('total_amount', sa.Float(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoice_line_items')] \
+        if 'invoice_line_items' in inspector.get_table_names() else []
+    if 'ix_invoice_line_items_invoice_id' not in existing_indexes:
+        op.create_index('ix_invoice_line_items_invoice_id', 'invoice_line_items', ['invoice_id'])
+    if 'ix_invoice_line_items_hsn_sac' not in existing_indexes:
+        op.create_index('ix_invoice_line_items_hsn_sac', 'invoice_line_items', ['hsn_sac'])
+
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+    if 'selected_line_items' not in columns:
+        return
+
+    # Convert saved JSON selections into rows, in id-ordered batches
+    invoices = sa.table('invoices', sa.column('id', sa.Integer), sa.column('selected_line_items', sa.Text))
+    line_items = sa.table(
+        'invoice_line_items',
+        *[sa.column(name) for name in (
+            'invoice_id', 'position', 'is_selected', 'line_item', 'hsn_sac', 'gst_percent', 'basic_amount',
+            'igst_amount', 'cgst_amount', 'sgst_amount', 'total_amount', 'created_at'
+        )]
+    )
+    now = datetime.utcnow()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(invoices.c.id, invoices.c.selected_line_items)
+            .where(invoices.c.id > last_id, invoices.c.selected_line_items.isnot(None))
+            .order_by(invoices.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        values = []
+        for invoice_id, raw in rows:
+            for position, item in enumerate(InvoiceLineItem.parse_items(raw)):
+                values.append(dict(
+                    InvoiceLineItem.row_values(item),
+                    invoice_id=invoice_id, position=position, is_selected=True, created_at=now
+                ))
+        if values:
+            connection.execute(line_items.insert(), values)
+        last_id = rows[-1][0]
+
+    # batch_alter_table recreates the table on SQLite, which cannot drop columns in place
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('selected_line_items')
+
+
+def downgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'selected_line_items' not in columns:
+        op.add_column('invoices', sa.Column('selected_line_items', sa.Text(), nullable=True))
+
+    if 'invoice_line_items' not in inspector.get_table_names():
+        return
+
+    # Rebuild the JSON selections from selected rows
+    line_items = sa.table(
+        'invoice_line_items',
+        *[sa.column(name) for name in (
+            'invoice_id', 'position', 'is_selected', 'line_item', 'hsn_sac', 'gst_percent', 'basic_amount',
+            'igst_amount', 'cgst_amount', 'sgst_amount', 'total_amount'
+        )]
+    )
+    rows = connection.execute(
+        sa.select(line_items).where(line_items.c.is_selected == sa.true())
+        .order_by(line_items.c.invoice_id, line_items.c.position)
+    ).mappings()
+    selections = {}
+    for row in rows:
+        selections.setdefault(row['invoice_id'], []).append(
+            {api_key: row[column] for api_key, column in InvoiceLineItem.API_FIELDS.items()}
+        )
+
+    invoices = sa.table('invoices', sa.column('id', sa.Integer), sa.column('selected_line_items', sa.Text))
+    update_stmt = invoices.update().where(invoices.c.id == sa.bindparam('row_id')) \
+        .values(selected_line_items=sa.bindparam('items'))
+    if selections:
+        connection.execute(update_stmt, [
+            {'row_id': invoice_id, 'items': json.dumps(items)} for invoice_id, items in selections.items()
+        ])
+
+    op.drop_table('invoice_line_items')
@@ -0,0 +1,47 @@
+"""
+Add invoice_rollups table of per-bucket invoice counts and amounts
+
+Revision ID: add_invoice_rollups
+Revises: add_vendor_name_norm
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from services.invoice_rollups import InvoiceRollups
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_invoice_rollups'
+down_revision = 'add_vendor_name_norm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Check if table exists before creating it (for existing databases)
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'invoice_rollups' not in inspector.get_table_names():
+        op.create_table(
+            'invoice_rollups',
+            sa.Column('department_id', sa.Integer(), sa.ForeignKey('departments.id'), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('priority', sa.String(length=10), nullable=False),
+            sa.Column('month', sa.Date(), nullable=False),
+            sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('total_amount', sa.Float(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('department_id', 'status', 'priority', 'month'),
+        )
+
+    # Backfill from the existing invoices
+    InvoiceRollups.rebuild(connection)
+
+
+def downgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if 'invoice_rollups' in inspector.get_table_names():
+        op.drop_table('invoice_rollups')
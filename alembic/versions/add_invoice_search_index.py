@@ -0,0 +1,32 @@
+"""
+Add the invoice full-text search index (FTS5 on SQLite, tsvector on PostgreSQL)
+
+Revision ID: add_invoice_search_index
+Revises: add_query_pattern_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+from services.search_index import SearchIndex
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_invoice_search_index'
+down_revision = 'add_query_pattern_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+
+    # Create and fill the index only if it doesn't exist (for existing databases)
+    if SearchIndex.exists(connection):
+        return
+    if SearchIndex.create(connection):
+        SearchIndex.rebuild(connection)
+
+
+def downgrade():
+    SearchIndex.drop(op.get_bind())
@@ -0,0 +1,52 @@
+"""
+Add composite indexes matching invoice, notification and audit log list queries
+
+Revision ID: add_query_pattern_indexes
+Revises: add_invoice_line_items_table
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_pattern_indexes'
+down_revision = 'add_invoice_line_items_table'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - kept in step with the models' __table_args__
+INDEXES = [
+    ('ix_invoices_status_created_at', 'invoices', ['status', 'created_at']),
+    ('ix_invoices_department_status_created_at', 'invoices', ['department_id', 'status', 'created_at']),
+    ('ix_invoices_uploaded_by_created_at', 'invoices', ['uploaded_by', 'created_at']),
+    ('ix_invoices_status_submitted_at', 'invoices', ['status', 'submitted_at']),
+    ('ix_notifications_user_read_created_at', 'notifications', ['user_id', 'is_read', 'created_at']),
+    ('ix_audit_logs_invoice_id_timestamp', 'audit_logs', ['invoice_id', 'timestamp']),
+    ('ix_audit_logs_user_id_timestamp', 'audit_logs', ['user_id', 'timestamp']),
+    ('ix_audit_logs_timestamp', 'audit_logs', ['timestamp']),
+]
+
+
+def upgrade():
+    # Check if indexes exist before creating them (for existing databases)
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    for name, table, columns in INDEXES:
+        existing_indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        if name not in existing_indexes:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    # Check if indexes exist before dropping them
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    for name, table, _columns in reversed(INDEXES):
+        existing_indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        if name in existing_indexes:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,86 @@
+"""
+Add normalized vendor name column with b-tree and (PostgreSQL) trigram indexes
+
+Revision ID: add_vendor_name_norm
+Revises: add_invoice_search_index
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from services.vendor_index import VendorIndex
+from utils.normalization import normalize_vendor_name_key
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_vendor_name_norm'
+down_revision = 'add_invoice_search_index'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    # Check if column exists before adding it (for existing databases)
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'vendor_name_norm' not in columns:
+        op.add_column('invoices', sa.Column('vendor_name_norm', sa.String(length=200), nullable=True))
+
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+    if 'ix_invoices_vendor_name_norm' not in existing_indexes:
+        op.create_index('ix_invoices_vendor_name_norm', 'invoices', ['vendor_name_norm'])
+
+    # Backfill: normalization lives in Python, so compute keys client-side in id-ordered batches
+    invoices = sa.table(
+        'invoices',
+        sa.column('id', sa.Integer),
+        sa.column('vendor_name', sa.String),
+        sa.column('vendor_name_norm', sa.String),
+    )
+    update_stmt = (
+        invoices.update()
+        .where(invoices.c.id == sa.bindparam('row_id'))
+        .values(vendor_name_norm=sa.bindparam('vendor_key'))
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(invoices.c.id, invoices.c.vendor_name)
+            .where(invoices.c.id > last_id, invoices.c.vendor_name.isnot(None))
+            .order_by(invoices.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        connection.execute(update_stmt, [
+            {'row_id': row_id, 'vendor_key': normalize_vendor_name_key(vendor_name)}
+            for row_id, vendor_name in rows
+        ])
+        last_id = rows[-1][0]
+
+    # PostgreSQL only; skipped with a warning if pg_trgm cannot be installed
+    VendorIndex.create_trigram_index(connection)
+
+
+def downgrade():
+    # Check if indexes exist before dropping them
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [idx['name'] for idx in inspector.get_indexes('invoices')]
+
+    if connection.dialect.name == 'postgresql':
+        op.execute(f"DROP INDEX IF EXISTS {VendorIndex.TRIGRAM_INDEX}")
+
+    if 'ix_invoices_vendor_name_norm' in existing_indexes:
+        op.drop_index('ix_invoices_vendor_name_norm', table_name='invoices')
+
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+    if 'vendor_name_norm' in columns:
+        with op.batch_alter_table('invoices') as batch_op:
+            batch_op.drop_column('vendor_name_norm')
@@ -0,0 +1,104 @@
+"""
+Reduce audit_logs payloads to the changed keys and store them as native JSON
+
+Revision ID: compact_audit_payloads
+Revises: add_invoice_rollups
+Create Date: 2026-10-19
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from models.audit_log import NATIVE_JSON_DIALECTS, diff_payloads
+
+
+# revision identifiers, used by Alembic.
+revision = 'compact_audit_payloads'
+down_revision = 'add_invoice_rollups'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+PAYLOAD_COLUMNS = ('old_values', 'new_values')
+
+
+def _json_type(dialect_name):
+    return postgresql.JSONB() if dialect_name == 'postgresql' else sa.JSON()
+
+
+def _dumps(values):
+    return json.dumps(values, separators=(',', ':')) if values is not None else None
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    native = connection.dialect.name in NATIVE_JSON_DIALECTS
+    column_types = {col['name']: col['type'] for col in inspector.get_columns('audit_logs')}
+    already_json = all(isinstance(column_types.get(name), sa.JSON) for name in PAYLOAD_COLUMNS)
+
+    if not already_json:
+        # Rewrite the text payloads as compact diffs in id-ordered batches before any type change
+        audit_logs = sa.table(
+            'audit_logs',
+            sa.column('id', sa.Integer),
+            sa.column('old_values', sa.Text),
+            sa.column('new_values', sa.Text),
+        )
+        update_stmt = (
+            audit_logs.update()
+            .where(audit_logs.c.id == sa.bindparam('row_id'))
+            .values(old_values=sa.bindparam('old_payload'), new_values=sa.bindparam('new_payload'))
+        )
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                sa.select(audit_logs.c.id, audit_logs.c.old_values, audit_logs.c.new_values)
+                .where(audit_logs.c.id > last_id)
+                .where(sa.or_(audit_logs.c.old_values.isnot(None), audit_logs.c.new_values.isnot(None)))
+                .order_by(audit_logs.c.id)
+                .limit(BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row_id, old_text, new_text in rows:
+                try:
+                    old_values = json.loads(old_text) if old_text else None
+                    new_values = json.loads(new_text) if new_text else None
+                except ValueError:
+                    continue  # leave rows that are not valid JSON as they are
+                if isinstance(old_values, dict) and isinstance(new_values, dict):
+                    old_values, new_values = diff_payloads(old_values, new_values)
+                old_payload, new_payload = _dumps(old_values), _dumps(new_values)
+                if (old_payload, new_payload) != (old_text, new_text):
+                    updates.append({'row_id': row_id, 'old_payload': old_payload, 'new_payload': new_payload})
+            if updates:
+                connection.execute(update_stmt, updates)
+            last_id = rows[-1][0]
+
+    if native and not already_json:
+        json_type = _json_type(connection.dialect.name)
+        for name in PAYLOAD_COLUMNS:
+            if connection.dialect.name == 'postgresql':
+                op.alter_column('audit_logs', name, type_=json_type, existing_nullable=True,
+                                postgresql_using=f'{name}::jsonb')
+            else:
+                op.alter_column('audit_logs', name, type_=json_type, existing_type=sa.Text(), existing_nullable=True)
+
+
+def downgrade():
+    # The columns go back to text; payloads stay reduced to the changed keys
+    connection = op.get_bind()
+    if connection.dialect.name not in NATIVE_JSON_DIALECTS:
+        return
+    for name in PAYLOAD_COLUMNS:
+        if connection.dialect.name == 'postgresql':
+            op.alter_column('audit_logs', name, type_=sa.Text(), existing_nullable=True,
+                            postgresql_using=f'{name}::text')
+        else:
+            op.alter_column('audit_logs', name, type_=sa.Text(), existing_type=sa.JSON(), existing_nullable=True)
@@ -0,0 +1,109 @@
+"""
+Move invoices.raw_text into a compressed invoice_texts table
+
+Revision ID: move_raw_text_to_invoice_texts
+Revises: add_business_key_fields
+Create Date: 2026-10-19
+"""
+
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'move_raw_text_to_invoice_texts'
+down_revision = 'add_business_key_fields'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # Create table if it doesn't exist (for existing databases)
+    if 'invoice_texts' not in inspector.get_table_names():
+        op.create_table(
+            'invoice_texts',
+            sa.Column('invoice_id', sa.Integer(), sa.ForeignKey('invoices.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('compression', sa.String(length=10), nullable=False, server_default='zlib'),
+            sa.Column('content', sa.LargeBinary(), nullable=False),
+            sa.Column('original_length', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+    if 'raw_text' not in columns:
+        return
+
+    # Copy existing text in id-ordered batches so large tables are never loaded at once
+    invoices = sa.table('invoices', sa.column('id', sa.Integer), sa.column('raw_text', sa.Text))
+    invoice_texts = sa.table(
+        'invoice_texts',
+        sa.column('invoice_id', sa.Integer),
+        sa.column('compression', sa.String),
+        sa.column('content', sa.LargeBinary),
+        sa.column('original_length', sa.Integer),
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(invoices.c.id, invoices.c.raw_text)
+            .where(invoices.c.id > last_id, invoices.c.raw_text.isnot(None), invoices.c.raw_text != '')
+            .order_by(invoices.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        connection.execute(invoice_texts.insert(), [
+            {
+                'invoice_id': row_id,
+                'compression': 'zlib',
+                'content': zlib.compress(raw_text.encode('utf-8'), 6),
+                'original_length': len(raw_text),
+            }
+            for row_id, raw_text in rows
+        ])
+        last_id = rows[-1][0]
+
+    # batch_alter_table recreates the table on SQLite, which cannot drop columns in place
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('raw_text')
+
+
+def downgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+
+    if 'raw_text' not in columns:
+        op.add_column('invoices', sa.Column('raw_text', sa.Text(), nullable=True))
+
+    if 'invoice_texts' not in inspector.get_table_names():
+        return
+
+    invoices = sa.table('invoices', sa.column('id', sa.Integer), sa.column('raw_text', sa.Text))
+    invoice_texts = sa.table('invoice_texts', sa.column('invoice_id', sa.Integer), sa.column('content', sa.LargeBinary))
+    update_stmt = invoices.update().where(invoices.c.id == sa.bindparam('row_id')).values(raw_text=sa.bindparam('text'))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(invoice_texts.c.invoice_id, invoice_texts.c.content)
+            .where(invoice_texts.c.invoice_id > last_id)
+            .order_by(invoice_texts.c.invoice_id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        connection.execute(update_stmt, [
+            {'row_id': invoice_id, 'text': zlib.decompress(content).decode('utf-8')}
+            for invoice_id, content in rows
+        ])
+        last_id = rows[-1][0]
+
+    op.drop_table('invoice_texts')
@@ -6,8 +6,10 @@ import os
 import logging
 from config import Config
 
+from utils.db_routing import RoutingSession
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 
 # JWT blacklist for v4
@@ -18,9 +20,36 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Backend-specific engine profile; explicitly configured engine options take precedence
+    from utils.engine_profiles import engine_options, merge_engine_options, apply_engine_profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = merge_engine_options(
+        engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config),
+        app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    # Read replicas become binds that RoutingSession sends GET requests' reads to
+    from utils.db_routing import replica_binds, register_write_tracking
+    binds = replica_binds(app.config.get('DATABASE_REPLICA_URLS', []), lambda url: engine_options(url, app.config))
+    if binds:
+        app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **binds)
+    
     # Initialize extensions with app
     db.init_app(app)
     jwt.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_engine_profile(engine, app.config)
+    
+    # Keep the invoice full-text index, rollups and statistics cache in step with ORM writes
+    from services.search_index import SearchIndex
+    SearchIndex.register(db.session)
+    from services.invoice_rollups import InvoiceRollups
+    InvoiceRollups.register(db.session)
+    from services.statistics_service import StatisticsService
+    StatisticsService.register(db.session)
+    register_write_tracking(db.session)
+    # Audit entries join the request's transaction; leftovers are committed after the request
+    from services.audit_service import AuditService
+    AuditService.init_app(app)
     # Configure CORS with explicit origin and no credentials (header-based JWT)
     CORS(app,
          origins=app.config.get('CORS_ORIGINS', ['http://localhost:3000', 'http://localhost:3330', 'http://127.0.0.1:3000', 'http://127.0.0.1:3330']),
@@ -1,12 +1,19 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from datetime import datetime, timedelta
 
 from models.user import User
 from models.invoice import Invoice
+from models.invoice_line_item import InvoiceLineItem
 from models.department import Department
 from models.audit_log import AuditLog
-from services.audit_service import AuditService
+from services.audit_service import AuditService, EXPORT_COLUMNS
+from services.statistics_service import StatisticsService
 from utils.simple_auth import role_required_simple
+from utils.exceptions import ValidationError
+from utils.export_streams import (
+    COMPRESSION_GZIP, COMPRESSIONS, FORMAT_CSV, FORMAT_NDJSON, MIMETYPES,
+    csv_lines, export_body, export_filename, ndjson_lines, primed, validate_choice,
+)
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -16,64 +23,21 @@ admin_bp = Blueprint('admin', __name__)
 def get_system_statistics():
     """System-wide statistics for Super Admin dashboard."""
     try:
-        from app import db
-
-        total_users = User.query.count()
-        total_active_users = User.query.filter_by(is_active=True).count()
-        total_departments = Department.query.count()
-
-        # Only count invoices that have been submitted for approval (not drafts)
-        submitted_invoices = Invoice.query.filter(
-            Invoice.status.in_([Invoice.STATUS_PENDING, Invoice.STATUS_APPROVED, Invoice.STATUS_REJECTED])
-        ).count()
-        pending_invoices = Invoice.query.filter_by(status=Invoice.STATUS_PENDING).count()
-        approved_invoices = Invoice.query.filter_by(status=Invoice.STATUS_APPROVED).count()
-        rejected_invoices = Invoice.query.filter_by(status=Invoice.STATUS_REJECTED).count()
-
-        # Simple trend: last 12 months submitted invoice counts
-        trend = []
-        try:
-            # Using SQLite/Postgres agnostic approach (approximate by timestamp month extraction via Python)
-            twelve_months_ago = datetime.utcnow().replace(day=1)
-            # Only include submitted invoices (pending, approved, rejected) in trend
-            monthly_counts = (
-                db.session.query(Invoice)
-                .filter(Invoice.status.in_([Invoice.STATUS_PENDING, Invoice.STATUS_APPROVED, Invoice.STATUS_REJECTED]))
-                .order_by(Invoice.created_at.desc())
-                .all()
-            )
-            buckets = {}
-            for inv in monthly_counts:
-                if not getattr(inv, 'created_at', None):
-                    continue
-                key = inv.created_at.strftime('%Y-%m')
-                buckets[key] = buckets.get(key, 0) + 1
-            trend = [
-                {'month': key, 'count': buckets[key]}
-                for key in sorted(buckets.keys())[-12:]
-            ]
-        except Exception:
-            trend = []
+        granularity = request.args.get('granularity', 'month', type=str)
+        date_from = request.args.get('date_from', type=str)
+        date_to = request.args.get('date_to', type=str)
 
-        recent_logs = [log.to_dict() for log in AuditService.get_recent_audit_logs(limit=20)]
+        df = datetime.fromisoformat(date_from) if date_from else None
+        dt = datetime.fromisoformat(date_to) if date_to else None
+        # A bare date_to includes that whole day
+        if dt and len(date_to) == 10:
+            dt += timedelta(days=1)
 
-        return jsonify({
-            'users': {
-                'total': total_users,
-                'active': total_active_users,
-            },
-            'departments': {
-                'total': total_departments
-            },
-            'invoices': {
-                'total': submitted_invoices,
-                'pending': pending_invoices,
-                'approved': approved_invoices,
-                'rejected': rejected_invoices,
-                'trend': trend
-            },
-            'recent_activity': recent_logs
-        }), 200
+        return jsonify(StatisticsService.get_system_statistics(granularity=granularity, date_from=df, date_to=dt)), 200
+    except ValidationError as e:
+        return jsonify({'message': str(e)}), 400
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use ISO 8601 (YYYY-MM-DD or full timestamp).'}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch system statistics: {str(e)}'}), 500
 
@@ -93,22 +57,78 @@ def get_audit_logs():
         df = datetime.fromisoformat(date_from) if date_from else None
         dt = datetime.fromisoformat(date_to) if date_to else None
 
-        logs = AuditService.get_audit_logs_with_filters(
+        result = AuditService.get_audit_logs_with_filters(
             user_id=user_id,
             invoice_id=invoice_id,
             action=action,
             date_from=df,
             date_to=dt,
-            limit=limit
+            limit=limit,
+            cursor=request.args.get('cursor', type=str),
+            include_total=request.args.get('include_total', 'false').lower() == 'true'
         )
 
-        return jsonify({'logs': [log.to_dict() for log in logs]}), 200
+        return jsonify({
+            'logs': [log.to_dict() for log in result['logs']],
+            'pagination': {
+                'total': result['total'],
+                'limit': limit,
+                'has_next': result['has_next'],
+                'has_prev': result['has_prev'],
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor']
+            }
+        }), 200
+    except ValidationError as e:
+        return jsonify({'message': str(e)}), 400
     except ValueError:
         return jsonify({'message': 'Invalid date format. Use ISO 8601 (YYYY-MM-DD or full timestamp).'}), 400
     except Exception as e:
         return jsonify({'message': f'Failed to fetch audit logs: {str(e)}'}), 500
 
 
+@admin_bp.route('/audit-logs/export', methods=['GET'])
+@role_required_simple('Super Admin')
+def export_audit_logs():
+    """
+    Stream every audit log matching the /audit-logs filters, oldest first, as NDJSON
+    (format=ndjson, default) or CSV (format=csv), gzip-compressed unless compression=none.
+    """
+    try:
+        fmt = validate_choice(request.args.get('format', FORMAT_NDJSON, type=str), (FORMAT_NDJSON, FORMAT_CSV), 'format')
+        compression = validate_choice(request.args.get('compression', COMPRESSION_GZIP, type=str), COMPRESSIONS, 'compression')
+        date_from = request.args.get('date_from', type=str)
+        date_to = request.args.get('date_to', type=str)
+
+        df = datetime.fromisoformat(date_from) if date_from else None
+        dt = datetime.fromisoformat(date_to) if date_to else None
+    except ValidationError as e:
+        return jsonify({'message': str(e)}), 400
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use ISO 8601 (YYYY-MM-DD or full timestamp).'}), 400
+
+    try:
+        # The first batch is read here, so a failing query or archive is a 500, not a cut-off 200
+        rows = primed(AuditService.iter_audit_logs_for_export(
+            user_id=request.args.get('user_id', type=int),
+            invoice_id=request.args.get('invoice_id', type=int),
+            action=request.args.get('action', type=str),
+            date_from=df,
+            date_to=dt,
+            batch_size=current_app.config.get('AUDIT_EXPORT_BATCH_SIZE', 1000)
+        ))
+        lines = csv_lines(rows, EXPORT_COLUMNS) if fmt == FORMAT_CSV else ndjson_lines(rows)
+        filename = export_filename('audit-logs', fmt, compression)
+
+        return Response(
+            stream_with_context(export_body(lines, compression)),
+            mimetype='application/gzip' if compression == COMPRESSION_GZIP else MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception as e:
+        return jsonify({'message': f'Failed to export audit logs: {str(e)}'}), 500
+
+
 @admin_bp.route('/audit-logs/statistics', methods=['GET'])
 @role_required_simple('Super Admin')
 def get_audit_statistics():
@@ -147,6 +167,24 @@ def get_comprehensive_report():
         except Exception:
             stats['invoices_by_department'] = []
 
+        # Approved spend by HSN/SAC from the user-selected line items
+        try:
+            hsn_rows = db.session.query(
+                InvoiceLineItem.hsn_sac,
+                db.func.count(InvoiceLineItem.id),
+                db.func.sum(InvoiceLineItem.basic_amount),
+                db.func.sum(InvoiceLineItem.total_amount)
+            ).join(Invoice, Invoice.id == InvoiceLineItem.invoice_id).filter(
+                InvoiceLineItem.is_selected.is_(True),
+                Invoice.status == Invoice.STATUS_APPROVED
+            ).group_by(InvoiceLineItem.hsn_sac).order_by(db.func.sum(InvoiceLineItem.total_amount).desc()).all()
+            stats['spend_by_hsn_sac'] = [
+                {'hsn_sac': hsn or None, 'line_items': count, 'basic_amount': basic or 0.0, 'total_amount': total or 0.0}
+                for hsn, count, basic, total in hsn_rows
+            ]
+        except Exception:
+            stats['spend_by_hsn_sac'] = []
+
         stats['audit'] = AuditService.get_audit_statistics()
 
         return jsonify({'report': stats}), 200
@@ -228,8 +228,8 @@ def change_password():
         audit_log = AuditLog.log_user_action(
             user_id=current_user_id,
             action=AuditLog.ACTION_USER_UPDATED,
-            old_values={'password': '***'},
-            new_values={'password': '***'},
+            old_values=None,
+            new_values={'password': 'changed'},
             remarks="Password changed"
         )
         db.session.add(audit_log)
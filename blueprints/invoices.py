@@ -1,11 +1,16 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
+import json
+import time
 import logging
 from typing import Dict, Any
 
 from services.invoice_service import InvoiceService
+from services.chunked_upload_service import ChunkedUploadService
+from services.progress_service import ProgressService
 from services.database_service import DatabaseService
 from services.fields import ALLOWED_INVOICE_UPDATE_FIELDS
 from services.audit_service import AuditService
+from services.bulk_invoice_service import BulkInvoiceService, ACTION_APPROVE, ACTION_REJECT
 from services.notification_service import NotificationService
 from models.user import User
 from models.department import Department
@@ -13,9 +18,14 @@ from models.invoice import Invoice
 from utils.simple_auth import simple_auth_required, role_required_simple
 from utils.workflow_validators import ensure_can_submit, ensure_can_approve, ensure_can_update, ensure_valid_rejection
 from utils.response_formatters import success, error, paginated_list
-from utils.exceptions import InvoiceProcessingError, FileValidationError, PermissionError, DatabaseError
+from utils.export_streams import (
+    COMPRESSION_NONE, FORMAT_CSV, FORMAT_PARQUET, FORMAT_XLSX, MIMETYPES,
+    csv_lines, export_body, export_filename, parquet_chunks, primed, require_pyarrow, validate_choice, xlsx_chunks,
+)
+from required_fields import REQUIRED_FIELDS
+from utils.exceptions import InvoiceProcessingError, FileValidationError, PermissionError, DatabaseError, InvoiceFileNotFoundError, UploadOffsetError, ValidationError
 from dateutil import parser as date_parser
-from datetime import datetime
+from datetime import date, datetime
 from flask import send_file
 
 logger = logging.getLogger(__name__)
@@ -29,71 +39,172 @@ def get_invoice_service():
         max_file_size=current_app.config['MAX_CONTENT_LENGTH']
     )
 
+def get_chunked_upload_service():
+    return ChunkedUploadService(
+        upload_folder=current_app.config['UPLOAD_FOLDER'],
+        max_file_size=current_app.config['MAX_UPLOAD_FILE_SIZE'],
+        max_chunk_size=current_app.config['UPLOAD_CHUNK_SIZE']
+    )
+
+def get_progress_service():
+    return ProgressService(upload_folder=current_app.config['UPLOAD_FOLDER'])
+
 def get_current_user():
     """Get current user from request context (set by simple_auth decorators)."""
     return getattr(request, 'current_user', None)
 
+def _fields_arg(args, extra=()):
+    """Sparse fieldset from ?fields=, or None for full rows."""
+    try:
+        return Invoice.parse_fields(args.get('fields'), extra=extra)
+    except ValueError as e:
+        raise ValidationError(str(e))
 
-@invoices_bp.route('/', methods=['GET'])
-@simple_auth_required
-def list_invoices():
-    user = get_current_user()
-    args = request.args
+def _cursor_args(args):
+    """Keyset pagination parameters shared by the invoice list endpoints."""
+    return {
+        'cursor': args.get('cursor') or None,
+        'include_total': args.get('include_total', 'false').lower() == 'true'
+    }
+
+
+def _list_filters(args, user) -> Dict[str, Any]:
+    """
+    Invoice list filters from the query string, scoped to what user may see.
+
+    Raises:
+        ValidationError: If date_from/date_to cannot be parsed
+    """
     filters: Dict[str, Any] = {
         'department_id': args.get('department_id', type=int),
         'user_id': args.get('user_id', type=int),
         'status': args.get('status'),
         'vendor_name': args.get('vendor_name'),
+        'vendor_match': args.get('vendor_match', default='contains'),
         'search': args.get('search'),
         'amount_min': args.get('amount_min', type=float),
         'amount_max': args.get('amount_max', type=float)
     }
     date_from_raw = args.get('date_from')
     date_to_raw = args.get('date_to')
-    date_from = None
-    date_to = None
+    filters['date_from'] = None
+    filters['date_to'] = None
     try:
         if date_from_raw:
-            date_from = date_parser.parse(date_from_raw).date()
+            filters['date_from'] = date_parser.parse(date_from_raw).date()
         if date_to_raw:
-            date_to = date_parser.parse(date_to_raw).date()
+            filters['date_to'] = date_parser.parse(date_to_raw).date()
     except Exception:
-        body, status = error('Invalid date format for date_from/date_to', status=400)
-        return jsonify(body), status
-    page = args.get('page', default=1, type=int)
-    per_page = args.get('per_page', default=20, type=int)
-    sort_by = args.get('sort_by', default='created_at')
-    sort_order = args.get('sort_order', default='desc')
+        raise ValidationError('Invalid date format for date_from/date_to')
 
     # Department scoping for non super-admin users
     if user and not user.is_super_admin() and not user.is_finance():
         # Department users can see all department invoices
         filters['department_id'] = user.department_id
         filters['user_id'] = None
+    return filters
 
-    result = DatabaseService.get_invoices_with_filters(
-        department_id=filters['department_id'],
-        user_id=filters['user_id'],
-        status=filters['status'],
-        vendor_name=filters['vendor_name'],
-        date_from=date_from,
-        date_to=date_to,
-        search=filters['search'],
-        amount_min=filters['amount_min'],
-        amount_max=filters['amount_max'],
-        page=page,
-        per_page=per_page,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        requesting_user_id=(user.id if user else None)
-    )
 
-    items = [inv.to_dict() for inv in result['invoices']]
-    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'])
+@invoices_bp.route('/', methods=['GET'])
+@simple_auth_required
+def list_invoices():
+    user = get_current_user()
+    args = request.args
+    try:
+        filters = _list_filters(args, user)
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    page = args.get('page', default=1, type=int)
+    per_page = args.get('per_page', default=20, type=int)
+    sort_by = args.get('sort_by', default='created_at')
+    sort_order = args.get('sort_order', default='desc')
+
+    try:
+        fields = _fields_arg(args)
+        result = DatabaseService.get_invoices_with_filters(
+            department_id=filters['department_id'],
+            user_id=filters['user_id'],
+            status=filters['status'],
+            vendor_name=filters['vendor_name'],
+            vendor_match=filters['vendor_match'],
+            date_from=filters['date_from'],
+            date_to=filters['date_to'],
+            search=filters['search'],
+            amount_min=filters['amount_min'],
+            amount_max=filters['amount_max'],
+            page=page,
+            per_page=per_page,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            requesting_user_id=(user.id if user else None),
+            fields=fields,
+            **_cursor_args(args)
+        )
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+
+    items = [inv.to_dict(fields) for inv in result['invoices']]
+    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'], result['next_cursor'], result['prev_cursor'])
     body, status = success('Invoices fetched', {'items': payload['items']}, {'pagination': payload['pagination']})
     return jsonify(body), status
 
 
+def _invoice_export_types() -> Dict[str, str]:
+    """Parquet column types of the invoice export, from the Invoice column types."""
+    kinds = {float: 'float', int: 'int', date: 'date'}
+    return {
+        key: kinds.get(Invoice.__table__.c[column].type.python_type, 'string')
+        for key, column in Invoice.INVOICE_DATA_FIELDS.items()
+    }
+
+
+@invoices_bp.route('/export', methods=['GET'])
+@simple_auth_required
+def export_invoices():
+    """
+    Stream every invoice matching the list_invoices filters, one REQUIRED_FIELDS row each,
+    as xlsx (default), csv or parquet. Bytes are sent as rows are read; memory stays flat.
+    """
+    user = get_current_user()
+    args = request.args
+    try:
+        fmt = validate_choice(args.get('format', FORMAT_XLSX), (FORMAT_XLSX, FORMAT_CSV, FORMAT_PARQUET), 'format')
+        if fmt == FORMAT_PARQUET:
+            require_pyarrow()
+        filters = _list_filters(args, user)
+        # Builds the query and reads the first batch now, so bad filters are a 400 and
+        # database errors a 500 rather than a broken stream
+        rows = primed(DatabaseService.iter_invoices_for_export(
+            **filters,
+            sort_by=args.get('sort_by', default='created_at'),
+            sort_order=args.get('sort_order', default='desc'),
+            requesting_user_id=(user.id if user else None),
+            batch_size=current_app.config.get('INVOICE_EXPORT_BATCH_SIZE', 1000)
+        ))
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    except DatabaseError as e:
+        body, status = error('Database error while exporting invoices', {'error': str(e)}, status=500)
+        return jsonify(body), status
+
+    if fmt == FORMAT_XLSX:
+        chunks = xlsx_chunks(rows, REQUIRED_FIELDS, sheet_name='Invoices')
+    elif fmt == FORMAT_PARQUET:
+        chunks = parquet_chunks(rows, REQUIRED_FIELDS, _invoice_export_types())
+    else:
+        chunks = export_body(csv_lines(rows, REQUIRED_FIELDS), COMPRESSION_NONE)
+
+    filename = export_filename('invoices', fmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @invoices_bp.route('/<int:invoice_id>', methods=['GET'])
 @simple_auth_required
 def get_invoice(invoice_id: int):
@@ -111,6 +222,23 @@ def get_invoice(invoice_id: int):
     return jsonify(body), status
 
 
+@invoices_bp.route('/<int:invoice_id>/raw-text', methods=['GET'])
+@simple_auth_required
+def get_invoice_raw_text(invoice_id: int):
+    user = get_current_user()
+    invoice = DatabaseService.get_invoice_by_id(invoice_id)
+    if not invoice:
+        body, status = error('Invoice not found', status=404)
+        return jsonify(body), status
+    if not (user.is_super_admin() or user.is_finance() or user.department_id == invoice.department_id or user.id == invoice.uploaded_by):
+        body, status = error('Access denied', status=403)
+        return jsonify(body), status
+    record = DatabaseService.get_invoice_text(invoice_id)
+    item = record.to_dict() if record else {'invoice_id': invoice_id, 'raw_text': '', 'length': 0, 'compressed_size': 0}
+    body, status = success('Invoice text fetched', {'item': item})
+    return jsonify(body), status
+
+
 @invoices_bp.route('/<int:invoice_id>', methods=['PUT'])
 @simple_auth_required
 def update_invoice(invoice_id: int):
@@ -131,9 +259,11 @@ def update_invoice(invoice_id: int):
             return jsonify(body), status
         try:
             old_values = invoice.to_dict()
-            updated = DatabaseService.update_invoice(invoice_id, data)
-            if updated:
-                AuditService.log_invoice_edit(user_id=user.id, invoice_id=invoice_id, old_values=old_values, new_values=updated.to_dict())
+            updated = DatabaseService.update_invoice(
+                invoice_id, data,
+                before_commit=lambda changed: AuditService.log_invoice_edit(
+                    user_id=user.id, invoice_id=invoice_id, old_values=old_values, new_values=changed.to_dict())
+            )
             body, status = success('Payment status updated', {'item': (updated.to_dict() if updated else invoice.to_dict())})
             return jsonify(body), status
         except DatabaseError as e:
@@ -171,15 +301,13 @@ def update_invoice(invoice_id: int):
             # Workflow fields for saving as draft
             workflow_payload = {'status': Invoice.STATUS_DRAFT, 'is_saved': True}
 
-            # Persist combined payload; allow workflow fields
+            # Persist combined payload; allow workflow fields. Logged first so the entry commits with it
+            AuditService.log_invoice_save_as_draft(user_id=user.id, invoice_id=invoice_id)
             updated = DatabaseService.update_invoice(
                 invoice_id,
                 {**business_payload, **workflow_payload},
                 allow_workflow_fields=True
             )
-
-            # Ensure we return fresh updated invoice
-            AuditService.log_invoice_save_as_draft(user_id=user.id, invoice_id=invoice_id)
             body, status = success('Changes saved', {'item': updated.to_dict()})
             return jsonify(body), status
         except DatabaseError as e:
@@ -207,10 +335,12 @@ def update_invoice(invoice_id: int):
             update_payload['priority'] = invoice.priority
 
         old_values = invoice.to_dict()
-        updated = DatabaseService.update_invoice(invoice_id, update_payload)
-        # DatabaseService logs no-op internally; only audit when actual change
-        if updated and updated.to_dict() != old_values:
-            AuditService.log_invoice_edit(user_id=user.id, invoice_id=invoice_id, old_values=old_values, new_values=updated.to_dict())
+        # Audited in the update's transaction; no-op updates commit nothing and log nothing
+        updated = DatabaseService.update_invoice(
+            invoice_id, update_payload,
+            before_commit=lambda changed: AuditService.log_invoice_edit(
+                user_id=user.id, invoice_id=invoice_id, old_values=old_values, new_values=changed.to_dict())
+        )
         body, status = success('Invoice updated', {'item': (updated.to_dict() if updated else invoice.to_dict())})
         return jsonify(body), status
     except DatabaseError as e:
@@ -236,12 +366,16 @@ def delete_invoice(invoice_id: int):
     # Delete via service to remove file and DB row
     service = get_invoice_service()
     try:
-        ok = service.delete_invoice(invoice)
+        # Audited in the deleting transaction
+        ok = service.delete_invoice(
+            invoice,
+            before_commit=lambda deleted: AuditService.log_invoice_deletion(
+                user_id=user.id, invoice_id=invoice_id, filename=filename)
+        )
     except Exception as e:
         body, status = error('Delete failed', {'error': str(e)}, status=400)
         return jsonify(body), status
     if ok:
-        AuditService.log_invoice_deletion(user_id=user.id, invoice_id=invoice_id, filename=filename)
         body, status = success('Invoice deleted')
         return jsonify(body), status
     body, status = error('Delete failed', status=400)
@@ -263,11 +397,12 @@ def submit_invoice(invoice_id: int):
 
     # Set submitted timestamp and pending status
     invoice.submit()
+    # Logged first so the entry commits with the status change
+    AuditService.log_invoice_submission(user_id=user.id, invoice_id=invoice_id)
     updated = DatabaseService.update_invoice(invoice_id, {
         'status': invoice.status,
         'submitted_at': invoice.submitted_at
     }, allow_workflow_fields=True)
-    AuditService.log_invoice_submission(user_id=user.id, invoice_id=invoice_id)
     NotificationService.notify_finance_on_submission(updated)
     body, status = success('Invoice submitted for approval', {'item': updated.to_dict()})
     return jsonify(body), status
@@ -289,13 +424,13 @@ def approve_invoice(invoice_id: int):
     data = request.get_json() or {}
     remarks = data.get('remarks')
     invoice.approve(approved_by_user_id=user.id, remarks=remarks)
+    AuditService.log_invoice_approval(user_id=user.id, invoice_id=invoice_id, approver_remarks=remarks)
     updated = DatabaseService.update_invoice(invoice_id, {
         'status': invoice.status,
         'approved_by': invoice.approved_by,
         'approved_at': invoice.approved_at,
         'approval_remarks': invoice.approval_remarks
     }, allow_workflow_fields=True)
-    AuditService.log_invoice_approval(user_id=user.id, invoice_id=invoice_id, approver_remarks=remarks)
     NotificationService.notify_uploader_on_approval(updated)
     body, status = success('Invoice approved', {'item': updated.to_dict()})
     return jsonify(body), status
@@ -321,18 +456,78 @@ def reject_invoice(invoice_id: int):
         body, status = error(msg, status=400)
         return jsonify(body), status
     invoice.reject(rejected_by_user_id=user.id, remarks=remarks)
+    AuditService.log_invoice_rejection(user_id=user.id, invoice_id=invoice_id, rejection_reason=remarks)
     updated = DatabaseService.update_invoice(invoice_id, {
         'status': invoice.status,
         'approved_by': invoice.approved_by,
         'approved_at': invoice.approved_at,
         'rejection_remarks': invoice.rejection_remarks
     }, allow_workflow_fields=True)
-    AuditService.log_invoice_rejection(user_id=user.id, invoice_id=invoice_id, rejection_reason=remarks)
     NotificationService.notify_uploader_on_rejection(updated)
     body, status = success('Invoice rejected', {'item': updated.to_dict()})
     return jsonify(body), status
 
 
+def _bulk_review(action: str, done_message: str):
+    user = get_current_user()
+    if not user.can_approve_invoices():
+        body, status = error('Only Finance & Accounts or Super Admin can approve/reject', status=403)
+        return jsonify(body), status
+    data = request.get_json() or {}
+    try:
+        invoice_ids = BulkInvoiceService.parse_invoice_ids(data.get('invoice_ids'))
+        results = BulkInvoiceService.review_invoices(invoice_ids, user, action, remarks=data.get('remarks'))
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    except DatabaseError as e:
+        body, status = error('Database error while reviewing invoices', {'error': str(e)}, status=500)
+        return jsonify(body), status
+    succeeded = sum(1 for result in results if result['success'])
+    body, status = success(f'{succeeded} of {len(results)} invoices {done_message}', {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    })
+    return jsonify(body), status
+
+
+@invoices_bp.route('/bulk/approve', methods=['POST'])
+@simple_auth_required
+def bulk_approve_invoices():
+    """Approve many pending invoices in one transaction; body {invoice_ids: [...], remarks}."""
+    return _bulk_review(ACTION_APPROVE, 'approved')
+
+
+@invoices_bp.route('/bulk/reject', methods=['POST'])
+@simple_auth_required
+def bulk_reject_invoices():
+    """Reject many pending invoices in one transaction; body {invoice_ids: [...], remarks} with remarks required."""
+    return _bulk_review(ACTION_REJECT, 'rejected')
+
+
+@invoices_bp.route('/bulk/update', methods=['POST'])
+@simple_auth_required
+def bulk_update_invoices():
+    """Edit many invoices in one transaction; body {updates: [{id, changes: {field: value}}]}."""
+    user = get_current_user()
+    data = request.get_json() or {}
+    try:
+        updates = BulkInvoiceService.parse_updates(data.get('updates'))
+        results = BulkInvoiceService.update_invoices(updates, user)
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    except DatabaseError as e:
+        body, status = error('Database error while updating invoices', {'error': str(e)}, status=500)
+        return jsonify(body), status
+    counts = {'updated': 0, 'unchanged': 0, 'failed': 0}
+    for result in results:
+        counts[result['status'] if result['success'] else 'failed'] += 1
+    body, status = success(f"{counts['updated']} of {len(results)} invoices updated", dict(results=results, **counts))
+    return jsonify(body), status
+
+
 @invoices_bp.route('/pending', methods=['GET'])
 @simple_auth_required
 def list_pending():
@@ -355,22 +550,39 @@ def list_pending():
         body, status = error('Invalid date format for date_from/date_to', status=400)
         return jsonify(body), status
 
-    result = DatabaseService.get_invoices_with_filters(
-        department_id=args.get('department_id', type=int),
-        status=Invoice.STATUS_PENDING,
-        vendor_name=args.get('vendor_name'),
-        date_from=date_from,
-        date_to=date_to,
-        search=args.get('search'),
-        amount_min=args.get('amount_min', type=float),
-        amount_max=args.get('amount_max', type=float),
-        page=args.get('page', default=1, type=int),
-        per_page=args.get('per_page', default=20, type=int),
-        sort_by=args.get('sort_by', default='submitted_at'),
-        sort_order=args.get('sort_order', default='desc')
-    )
-    items = [inv.to_dict() for inv in result['invoices']]
-    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'])
+    try:
+        fields = _fields_arg(args, extra=('possible_duplicates',))
+        result = DatabaseService.get_invoices_with_filters(
+            department_id=args.get('department_id', type=int),
+            status=Invoice.STATUS_PENDING,
+            vendor_name=args.get('vendor_name'),
+            vendor_match=args.get('vendor_match', default='contains'),
+            date_from=date_from,
+            date_to=date_to,
+            search=args.get('search'),
+            amount_min=args.get('amount_min', type=float),
+            amount_max=args.get('amount_max', type=float),
+            page=args.get('page', default=1, type=int),
+            per_page=args.get('per_page', default=20, type=int),
+            sort_by=args.get('sort_by', default='submitted_at'),
+            sort_order=args.get('sort_order', default='desc'),
+            fields=fields,
+            extra_columns=('gst_number_key', 'invoice_number_key'),
+            **_cursor_args(args)
+        )
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    with_duplicates = fields is None or 'possible_duplicates' in fields
+    # Flag likely duplicate bills for finance review (one indexed lookup per page)
+    duplicates = DatabaseService.get_possible_duplicates_map(result['invoices']) if with_duplicates else {}
+    items = []
+    for inv in result['invoices']:
+        item = inv.to_dict(fields)
+        if with_duplicates:
+            item['possible_duplicates'] = duplicates.get(inv.id, [])
+        items.append(item)
+    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'], result['next_cursor'], result['prev_cursor'])
     body, status = success('Pending invoices fetched', {'items': payload['items']}, {'pagination': payload['pagination']})
     return jsonify(body), status
 
@@ -393,22 +605,30 @@ def list_approved():
         body, status = error('Invalid date format for date_from/date_to', status=400)
         return jsonify(body), status
 
-    result = DatabaseService.get_invoices_with_filters(
-        department_id=args.get('department_id', type=int),
-        status=Invoice.STATUS_APPROVED,
-        vendor_name=args.get('vendor_name'),
-        date_from=date_from,
-        date_to=date_to,
-        search=args.get('search'),
-        amount_min=args.get('amount_min', type=float),
-        amount_max=args.get('amount_max', type=float),
-        page=args.get('page', default=1, type=int),
-        per_page=args.get('per_page', default=20, type=int),
-        sort_by=args.get('sort_by', default='approved_at'),
-        sort_order=args.get('sort_order', default='desc')
-    )
-    items = [inv.to_dict() for inv in result['invoices']]
-    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'])
+    try:
+        fields = _fields_arg(args)
+        result = DatabaseService.get_invoices_with_filters(
+            department_id=args.get('department_id', type=int),
+            status=Invoice.STATUS_APPROVED,
+            vendor_name=args.get('vendor_name'),
+            vendor_match=args.get('vendor_match', default='contains'),
+            date_from=date_from,
+            date_to=date_to,
+            search=args.get('search'),
+            amount_min=args.get('amount_min', type=float),
+            amount_max=args.get('amount_max', type=float),
+            page=args.get('page', default=1, type=int),
+            per_page=args.get('per_page', default=20, type=int),
+            sort_by=args.get('sort_by', default='approved_at'),
+            sort_order=args.get('sort_order', default='desc'),
+            fields=fields,
+            **_cursor_args(args)
+        )
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
+    items = [inv.to_dict(fields) for inv in result['invoices']]
+    payload = paginated_list(items, result['total'], result['current_page'], result['per_page'], result['pages'], result['has_next'], result['has_prev'], result['next_cursor'], result['prev_cursor'])
     body, status = success('Approved invoices fetched', {'items': payload['items']}, {'pagination': payload['pagination']})
     return jsonify(body), status
 
@@ -454,12 +674,83 @@ def download_file(invoice_id: int):
         body, status = error('File not available', status=404)
         return jsonify(body), status
     try:
-        return send_file(invoice.file_path, as_attachment=False)
+        response = send_file(invoice.file_path, as_attachment=False)
+        AuditService.log_invoice_download(user_id=user.id, invoice_id=invoice_id, filename=invoice.filename or '')
+        return response
     except Exception as e:
         body, status = error('Failed to serve file', {'error': str(e)}, status=500)
         return jsonify(body), status
 
 
+def _upload_result_response(user: User, result: Dict[str, Any], progress=None):
+    """Persist a processed upload and build the (body, status) response shared by direct and chunked uploads."""
+    # Same file already uploaded: link to the existing invoice instead of re-extracting
+    if isinstance(result, dict) and '__duplicate_of__' in result:
+        existing = result['__duplicate_of__']
+        if not (user.is_super_admin() or user.is_finance() or user.department_id == existing.department_id or user.id == existing.uploaded_by):
+            return error('This file has already been uploaded', {'duplicate_of': existing.id}, status=409)
+        item_payload = existing.to_dict()
+        item_payload['duplicate_of'] = existing.id
+        return success('Invoice already uploaded', {'item': item_payload, 'duplicate': True})
+    # Support both new tuple-like response (dict with keys) and legacy dict
+    if isinstance(result, dict) and '__db_payload__' in result and '__api_payload__' in result:
+        db_payload = result['__db_payload__']
+        processed_data_api = result['__api_payload__']
+    else:
+        # Backward compatibility: use same dict for both, but avoid passing line_items to DB
+        db_payload = {k: v for k, v in (result or {}).items() if k != 'line_items'}
+        processed_data_api = dict(result or {})
+
+    # Persist using DatabaseService with DB-only payload
+    # Force extracted + unsaved on upload
+    db_payload = dict(db_payload)
+    db_payload['is_saved'] = False
+    db_payload['line_items'] = processed_data_api.get('line_items', [])
+    # Ensure extracted initial state by model __init__
+    try:
+        # The upload is audited in the transaction that creates the invoice
+        invoice = DatabaseService.create_invoice(
+            db_payload,
+            before_commit=lambda created: AuditService.log_invoice_upload(
+                user_id=user.id, invoice_id=created.id, filename=created.filename or '')
+        )
+    except Exception as e:
+        if progress:
+            progress(ProgressService.STAGE_FAILED, error=str(e))
+        raise
+    if progress:
+        progress(ProgressService.STAGE_PERSISTED, invoice_id=invoice.id)
+
+    # Build response including invoice_data snapshot and line_items
+    item_payload = invoice.to_dict()
+    # Populate uppercase canonical keys; fall back to lowercase DB fields if missing
+    def upfirst(key_up: str, key_low: str):
+        return processed_data_api.get(key_up) if processed_data_api.get(key_up) is not None else db_payload.get(key_low)
+
+    item_payload['invoice_data'] = {
+        'S_No': processed_data_api.get('S_No') if processed_data_api.get('S_No') is not None else db_payload.get('s_no'),
+        'Invoice_Date': processed_data_api.get('Invoice_Date') if processed_data_api.get('Invoice_Date') is not None else db_payload.get('invoice_date'),
+        'Invoice_Number': processed_data_api.get('Invoice_Number') if processed_data_api.get('Invoice_Number') is not None else db_payload.get('invoice_number'),
+        'GST_Number': processed_data_api.get('GST_Number') if processed_data_api.get('GST_Number') is not None else db_payload.get('gst_number'),
+        'Vendor_Name': processed_data_api.get('Vendor_Name') if processed_data_api.get('Vendor_Name') is not None else db_payload.get('vendor_name'),
+        'Line_Item': processed_data_api.get('Line_Item') if processed_data_api.get('Line_Item') is not None else db_payload.get('line_item'),
+        'HSN_SAC': processed_data_api.get('HSN_SAC') if processed_data_api.get('HSN_SAC') is not None else db_payload.get('hsn_sac'),
+        'gst_percent': processed_data_api.get('gst_percent') if processed_data_api.get('gst_percent') is not None else db_payload.get('gst_percent'),
+        'IGST_Amount': processed_data_api.get('IGST_Amount') if processed_data_api.get('IGST_Amount') is not None else db_payload.get('igst_amount'),
+        'CGST_Amount': processed_data_api.get('CGST_Amount') if processed_data_api.get('CGST_Amount') is not None else db_payload.get('cgst_amount'),
+        'SGST_Amount': processed_data_api.get('SGST_Amount') if processed_data_api.get('SGST_Amount') is not None else db_payload.get('sgst_amount'),
+        'Basic_Amount': processed_data_api.get('Basic_Amount') if processed_data_api.get('Basic_Amount') is not None else db_payload.get('basic_amount'),
+        'Total_Amount': processed_data_api.get('Total_Amount') if processed_data_api.get('Total_Amount') is not None else db_payload.get('total_amount'),
+        'TDS': processed_data_api.get('TDS') if processed_data_api.get('TDS') is not None else db_payload.get('tds'),
+        'Net_Payable': processed_data_api.get('Net_Payable') if processed_data_api.get('Net_Payable') is not None else db_payload.get('net_payable'),
+        'filename': processed_data_api.get('filename') if processed_data_api.get('filename') is not None else db_payload.get('filename')
+    }
+    item_payload['line_items'] = processed_data_api.get('line_items', [])
+    item_payload['possible_duplicates'] = DatabaseService.find_possible_duplicates(invoice)
+
+    return success('Invoice uploaded', {'item': item_payload})
+
+
 @invoices_bp.route('/upload', methods=['POST'])
 @simple_auth_required
 def upload_invoice():
@@ -482,6 +773,14 @@ def upload_invoice():
         body, status = error('department_id is required', status=400)
         return jsonify(body), status
 
+    # Optional client-chosen id for streaming progress from /progress/<job_id>
+    job_id = request.form.get('job_id') if request.form else None
+    if job_id is None:
+        job_id = (request.get_json(silent=True) or {}).get('job_id')
+    if job_id and not ProgressService.is_valid_job_id(job_id):
+        body, status = error('Invalid job_id', status=400)
+        return jsonify(body), status
+
     # Access control: non super-admin must upload to their own department
     if not (user.is_super_admin() or user.is_finance()) and user.department_id != department_id:
         body, status = error('Cannot upload invoice to another department', status=403)
@@ -498,52 +797,13 @@ def upload_invoice():
 
     service = get_invoice_service()
     try:
-        result = service.process_uploaded_invoice(file, user, department_id)
-        # Support both new tuple-like response (dict with keys) and legacy dict
-        if isinstance(result, dict) and '__db_payload__' in result and '__api_payload__' in result:
-            db_payload = result['__db_payload__']
-            processed_data_api = result['__api_payload__']
-        else:
-            # Backward compatibility: use same dict for both, but avoid passing line_items to DB
-            db_payload = {k: v for k, v in (result or {}).items() if k != 'line_items'}
-            processed_data_api = dict(result or {})
-
-        # Persist using DatabaseService with DB-only payload
-        # Force extracted + unsaved on upload
-        db_payload = dict(db_payload)
-        db_payload['is_saved'] = False
-        # Ensure extracted initial state by model __init__
-        invoice = DatabaseService.create_invoice(db_payload)
-        # Log upload
-        AuditService.log_invoice_upload(user_id=user.id, invoice_id=invoice.id, filename=invoice.filename or '')
-
-        # Build response including invoice_data snapshot and line_items
-        item_payload = invoice.to_dict()
-        # Populate uppercase canonical keys; fall back to lowercase DB fields if missing
-        def upfirst(key_up: str, key_low: str):
-            return processed_data_api.get(key_up) if processed_data_api.get(key_up) is not None else db_payload.get(key_low)
-
-        item_payload['invoice_data'] = {
-            'S_No': processed_data_api.get('S_No') if processed_data_api.get('S_No') is not None else db_payload.get('s_no'),
-            'Invoice_Date': processed_data_api.get('Invoice_Date') if processed_data_api.get('Invoice_Date') is not None else db_payload.get('invoice_date'),
-            'Invoice_Number': processed_data_api.get('Invoice_Number') if processed_data_api.get('Invoice_Number') is not None else db_payload.get('invoice_number'),
-            'GST_Number': processed_data_api.get('GST_Number') if processed_data_api.get('GST_Number') is not None else db_payload.get('gst_number'),
-            'Vendor_Name': processed_data_api.get('Vendor_Name') if processed_data_api.get('Vendor_Name') is not None else db_payload.get('vendor_name'),
-            'Line_Item': processed_data_api.get('Line_Item') if processed_data_api.get('Line_Item') is not None else db_payload.get('line_item'),
-            'HSN_SAC': processed_data_api.get('HSN_SAC') if processed_data_api.get('HSN_SAC') is not None else db_payload.get('hsn_sac'),
-            'gst_percent': processed_data_api.get('gst_percent') if processed_data_api.get('gst_percent') is not None else db_payload.get('gst_percent'),
-            'IGST_Amount': processed_data_api.get('IGST_Amount') if processed_data_api.get('IGST_Amount') is not None else db_payload.get('igst_amount'),
-            'CGST_Amount': processed_data_api.get('CGST_Amount') if processed_data_api.get('CGST_Amount') is not None else db_payload.get('cgst_amount'),
-            'SGST_Amount': processed_data_api.get('SGST_Amount') if processed_data_api.get('SGST_Amount') is not None else db_payload.get('sgst_amount'),
-            'Basic_Amount': processed_data_api.get('Basic_Amount') if processed_data_api.get('Basic_Amount') is not None else db_payload.get('basic_amount'),
-            'Total_Amount': processed_data_api.get('Total_Amount') if processed_data_api.get('Total_Amount') is not None else db_payload.get('total_amount'),
-            'TDS': processed_data_api.get('TDS') if processed_data_api.get('TDS') is not None else db_payload.get('tds'),
-            'Net_Payable': processed_data_api.get('Net_Payable') if processed_data_api.get('Net_Payable') is not None else db_payload.get('net_payable'),
-            'filename': processed_data_api.get('filename') if processed_data_api.get('filename') is not None else db_payload.get('filename')
-        }
-        item_payload['line_items'] = processed_data_api.get('line_items', [])
-
-        body, status = success('Invoice uploaded', {'item': item_payload})
+        progress = get_progress_service().reporter(job_id, user.id)
+    except FileExistsError:
+        body, status = error('job_id is already in use', status=409)
+        return jsonify(body), status
+    try:
+        result = service.process_uploaded_invoice(file, user, department_id, progress=progress)
+        body, status = _upload_result_response(user, result, progress)
         return jsonify(body), status
     except FileValidationError as e:
         body, status = error('File validation failed', {'error': str(e)}, status=400)
@@ -557,3 +817,217 @@ def upload_invoice():
     except Exception as e:
         body, status = error('Unexpected error during upload', {'error': str(e)}, status=500)
         return jsonify(body), status
+
+
+@invoices_bp.route('/upload/chunked', methods=['POST'])
+@simple_auth_required
+def init_chunked_upload():
+    """Start a resumable upload; the file is then sent with PUT requests of at most chunk_size bytes."""
+    user = get_current_user()
+    data = request.get_json(silent=True) or {}
+
+    department_id = data.get('department_id')
+    if isinstance(department_id, str) and department_id.isdigit():
+        department_id = int(department_id)
+    if not department_id:
+        body, status = error('department_id is required', status=400)
+        return jsonify(body), status
+
+    if not (user.is_super_admin() or user.is_finance()) and user.department_id != department_id:
+        body, status = error('Cannot upload invoice to another department', status=403)
+        return jsonify(body), status
+
+    total_size = data.get('total_size')
+    if isinstance(total_size, str) and total_size.isdigit():
+        total_size = int(total_size)
+
+    try:
+        upload = get_chunked_upload_service().init_upload(
+            user_id=user.id,
+            filename=data.get('filename'),
+            total_size=total_size,
+            department_id=department_id,
+            sha256=data.get('sha256')
+        )
+        body, status = success('Upload started', {'item': upload}, status=201)
+        return jsonify(body), status
+    except FileValidationError as e:
+        body, status = error('File validation failed', {'error': str(e)}, status=400)
+        return jsonify(body), status
+    except Exception as e:
+        body, status = error('Failed to start upload', {'error': str(e)}, status=500)
+        return jsonify(body), status
+
+
+@invoices_bp.route('/upload/chunked/<upload_id>', methods=['GET'])
+@simple_auth_required
+def chunked_upload_status(upload_id: str):
+    user = get_current_user()
+    try:
+        upload = get_chunked_upload_service().get_status(user.id, upload_id)
+        body, status = success('Upload status', {'item': upload})
+        return jsonify(body), status
+    except InvoiceFileNotFoundError as e:
+        body, status = error('Upload not found', {'error': str(e)}, status=404)
+        return jsonify(body), status
+
+
+@invoices_bp.route('/upload/chunked/<upload_id>', methods=['PUT'])
+@simple_auth_required
+def upload_chunk(upload_id: str):
+    """Append the raw request body at ?offset=N. Send X-Chunk-SHA256 to have the chunk verified."""
+    user = get_current_user()
+    offset = request.args.get('offset', type=int)
+    if offset is None or offset < 0:
+        body, status = error('offset query parameter is required', status=400)
+        return jsonify(body), status
+
+    try:
+        upload = get_chunked_upload_service().append_chunk(
+            user.id,
+            upload_id,
+            offset,
+            request.stream,
+            chunk_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+        body, status = success('Chunk stored', {'item': upload})
+        return jsonify(body), status
+    except InvoiceFileNotFoundError as e:
+        body, status = error('Upload not found', {'error': str(e)}, status=404)
+        return jsonify(body), status
+    except UploadOffsetError as e:
+        body, status = error('Offset mismatch', {'error': str(e), 'expected_offset': e.expected_offset}, status=409)
+        return jsonify(body), status
+    except FileValidationError as e:
+        body, status = error('Chunk rejected', {'error': str(e)}, status=400)
+        return jsonify(body), status
+    except Exception as e:
+        body, status = error('Failed to store chunk', {'error': str(e)}, status=500)
+        return jsonify(body), status
+
+
+@invoices_bp.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+@simple_auth_required
+def complete_chunked_upload(upload_id: str):
+    """Assemble the upload and run it through the same extraction flow as /upload."""
+    user = get_current_user()
+    job_id = request.args.get('job_id') or (request.get_json(silent=True) or {}).get('job_id')
+    if job_id and not ProgressService.is_valid_job_id(job_id):
+        body, status = error('Invalid job_id', status=400)
+        return jsonify(body), status
+    # Claimed before finalize so a taken job_id does not consume the assembled upload
+    try:
+        progress = get_progress_service().reporter(job_id, user.id)
+    except FileExistsError:
+        body, status = error('job_id is already in use', status=409)
+        return jsonify(body), status
+
+    try:
+        file_path, meta = get_chunked_upload_service().finalize(user.id, upload_id)
+    except InvoiceFileNotFoundError as e:
+        if progress:
+            progress(ProgressService.STAGE_FAILED, error=str(e))
+        body, status = error('Upload not found', {'error': str(e)}, status=404)
+        return jsonify(body), status
+    except UploadOffsetError as e:
+        if progress:
+            progress(ProgressService.STAGE_FAILED, error=str(e))
+        body, status = error('Upload incomplete', {'error': str(e), 'expected_offset': e.expected_offset}, status=409)
+        return jsonify(body), status
+    except FileValidationError as e:
+        if progress:
+            progress(ProgressService.STAGE_FAILED, error=str(e))
+        body, status = error('File validation failed', {'error': str(e)}, status=400)
+        return jsonify(body), status
+
+    service = InvoiceService(
+        upload_folder=current_app.config['UPLOAD_FOLDER'],
+        max_file_size=current_app.config['MAX_UPLOAD_FILE_SIZE']
+    )
+    try:
+        result = service.process_stored_invoice(file_path, meta['filename'], user, meta['department_id'], progress=progress)
+        body, status = _upload_result_response(user, result, progress)
+        return jsonify(body), status
+    except DatabaseError as e:
+        body, status = error('Database error while creating invoice', {'error': str(e)}, status=400)
+        return jsonify(body), status
+    except InvoiceProcessingError as e:
+        body, status = error('Invoice processing failed', {'error': str(e)}, status=400)
+        return jsonify(body), status
+    except Exception as e:
+        body, status = error('Unexpected error during upload', {'error': str(e)}, status=500)
+        return jsonify(body), status
+
+
+@invoices_bp.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+@simple_auth_required
+def abort_chunked_upload(upload_id: str):
+    user = get_current_user()
+    try:
+        if not get_chunked_upload_service().abort(user.id, upload_id):
+            body, status = error('Upload not found', status=404)
+            return jsonify(body), status
+        body, status = success('Upload discarded')
+        return jsonify(body), status
+    except InvoiceFileNotFoundError as e:
+        body, status = error('Upload not found', {'error': str(e)}, status=404)
+        return jsonify(body), status
+
+
+@invoices_bp.route('/progress/<job_id>', methods=['GET'])
+@simple_auth_required
+def stream_progress(job_id: str):
+    """
+    Server-Sent Events stream of extraction stages for an upload started with the same job_id.
+
+    The stream may be opened before the upload request; it waits for the job to appear,
+    sends a comment heartbeat while idle and closes after a terminal stage
+    (persisted, duplicate or failed). Event ids are byte offsets, so a reconnecting
+    client resumes via Last-Event-ID without replaying earlier stages.
+    """
+    user = get_current_user()
+    service = get_progress_service()
+    if not service.is_valid_job_id(job_id):
+        body, status = error('Invalid job_id', status=400)
+        return jsonify(body), status
+    if service.exists(job_id) and service.get_owner(job_id) != user.id:
+        body, status = error('Job not found', status=404)
+        return jsonify(body), status
+
+    user_id = user.id
+    poll_interval = current_app.config['PROGRESS_POLL_INTERVAL']
+    heartbeat_interval = current_app.config['PROGRESS_HEARTBEAT_SECONDS']
+    timeout = current_app.config['PROGRESS_STREAM_TIMEOUT']
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    offset = int(last_event_id) if last_event_id.isdigit() else 0
+
+    def generate():
+        nonlocal offset
+        started = last_sent = time.monotonic()
+        owner_checked = False
+        yield "retry: 2000\n\n"
+        while time.monotonic() - started < timeout:
+            if not owner_checked and service.exists(job_id):
+                if service.get_owner(job_id) != user_id:
+                    yield f"event: {ProgressService.STAGE_FAILED}\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                    return
+                owner_checked = True
+
+            events, offset = service.read_events(job_id, offset) if owner_checked else ([], offset)
+            for event_offset, event in events:
+                event.pop('user_id', None)
+                yield f"id: {event_offset}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+                last_sent = time.monotonic()
+                if event['stage'] in ProgressService.TERMINAL_STAGES:
+                    return
+
+            if time.monotonic() - last_sent >= heartbeat_interval:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from services.notification_service import NotificationService
 from utils.response_formatters import success, error
+from utils.exceptions import ValidationError
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -14,14 +15,24 @@ def list_notifications():
     only_unread = request.args.get('only_unread', 'false').lower() == 'true'
     page = request.args.get('page', default=1, type=int)
     per_page = request.args.get('per_page', default=20, type=int)
-    data = NotificationService.get_user_notifications(user_id, only_unread=only_unread, page=page, per_page=per_page)
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
+    try:
+        data = NotificationService.get_user_notifications(
+            user_id, only_unread=only_unread, page=page, per_page=per_page,
+            cursor=request.args.get('cursor'), include_total=include_total
+        )
+    except ValidationError as e:
+        body, status = error(str(e), status=400)
+        return jsonify(body), status
     pagination = {
         'total': data['total'],
         'page': data['current_page'],
         'per_page': data['per_page'],
         'pages': data['pages'],
         'has_next': data['has_next'],
-        'has_prev': data['has_prev']
+        'has_prev': data['has_prev'],
+        'next_cursor': data['next_cursor'],
+        'prev_cursor': data['prev_cursor']
     }
     body, status = success('Notifications fetched', {'items': data['notifications']}, {'pagination': pagination})
     return jsonify(body), status
@@ -6,6 +6,21 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///smartinv.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine profiles (utils/engine_profiles.py); SQLALCHEMY_ENGINE_OPTIONS set here override them
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # Safe with WAL; FULL for power-loss durability
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # PostgreSQL only; 0 disables
+    # Read replicas (comma-separated URLs) serving GET requests; a client reads from the primary for
+    # REPLICA_STICKY_SECONDS after its own write
+    DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
     
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
@@ -20,7 +35,11 @@ class Config:
     
     # File Upload Configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request size
+    # Chunked uploads: per-file limit is independent of the per-request limit above
+    MAX_UPLOAD_FILE_SIZE = int(os.environ.get('MAX_UPLOAD_FILE_SIZE', 200 * 1024 * 1024))  # 200MB
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # 4MB per chunk request
+    CHUNKED_UPLOAD_EXPIRY_HOURS = 24  # Unfinished chunked uploads are discarded after this
     ALLOWED_EXTENSIONS = {'pdf'}  # Only PDF files for invoice processing
     UPLOAD_EXTENSIONS = ALLOWED_EXTENSIONS
     
@@ -28,6 +47,40 @@ class Config:
     PROCESSING_TIMEOUT = 300  # 5 minutes timeout for processing
     OCR_ENABLED = True
     LLM_FALLBACK_ENABLED = True
+    # Upload progress stream (SSE); one poll of a small local file per interval per open stream
+    PROGRESS_POLL_INTERVAL = 0.5  # seconds
+    PROGRESS_HEARTBEAT_SECONDS = 15
+    PROGRESS_STREAM_TIMEOUT = 600  # Close streams that never reach a terminal stage
+    # Full-text invoice search (FTS5 on SQLite, tsvector on PostgreSQL)
+    SEARCH_INDEX_INCLUDE_TEXT = True  # Also index the extracted PDF text
+    SEARCH_INDEX_MAX_TEXT_CHARS = 100000
+    # vendor_match=fuzzy: trigram similarity cut-off, and how often the in-process vendor index reloads (non-PostgreSQL)
+    VENDOR_FUZZY_THRESHOLD = 0.3
+    VENDOR_INDEX_REFRESH_SECONDS = 300
+    # Dashboard statistics cache lifetime; 0 disables caching
+    STATS_CACHE_TTL_SECONDS = 30
+    # Most invoices one bulk approve/reject request may touch
+    BULK_REVIEW_MAX_INVOICES = 1000
+    # Most invoices one batch edit request may change
+    BULK_UPDATE_MAX_INVOICES = 5000
+    # Rows fetched per round trip by /api/invoices/export
+    INVOICE_EXPORT_BATCH_SIZE = 1000
+    # Audit actions (comma-separated, e.g. 'viewed,downloaded') written in batches by a background
+    # thread instead of the request's transaction; queued entries are lost if the process dies
+    AUDIT_ASYNC_ACTIONS = [a.strip() for a in os.environ.get('AUDIT_ASYNC_ACTIONS', '').split(',') if a.strip()]
+    AUDIT_ASYNC_BATCH_SIZE = 200
+    AUDIT_ASYNC_FLUSH_SECONDS = 1.0
+    AUDIT_ASYNC_QUEUE_SIZE = 10000  # When full, entries fall back to the request's transaction
+    # Audit entries older than this move to gzip JSON Lines archives (scripts/archive_audit_logs.py);
+    # audit log listings read the archive when their date range reaches past the live table
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 365))
+    AUDIT_ARCHIVE_FOLDER = os.environ.get('AUDIT_ARCHIVE_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_archive')
+    AUDIT_EXPORT_BATCH_SIZE = 1000  # Rows fetched per round trip by /api/admin/audit-logs/export
+    # Parquet copy of invoices, line items and audit logs for analysts (scripts/snapshot_analytics.py);
+    # invoice changes and audit entries younger than the lag wait for the next run so in-flight transactions are not missed
+    ANALYTICS_SNAPSHOT_FOLDER = os.environ.get('ANALYTICS_SNAPSHOT_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analytics_snapshot')
+    ANALYTICS_SNAPSHOT_LAG_SECONDS = int(os.environ.get('ANALYTICS_SNAPSHOT_LAG_SECONDS', 300))
+    ANALYTICS_SNAPSHOT_BATCH_SIZE = 10000  # Rows per database round trip and per Parquet row group
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
@@ -16,14 +16,30 @@ except ImportError:
 from models.user import User
 from models.department import Department
 from models.invoice import Invoice
+from models.invoice_text import InvoiceText
+from models.invoice_line_item import InvoiceLineItem
+from models.invoice_rollup import InvoiceRollup
 from models.notification import Notification
 from models.audit_log import AuditLog
+from services.search_index import SearchIndex
+from services.vendor_index import VendorIndex
+from services.invoice_rollups import InvoiceRollups
 
 def create_tables():
     """Create all database tables."""
     try:
         db.create_all()
         print("✓ Database tables created successfully")
+        # The full-text index is backend-specific DDL that create_all cannot express
+        from flask import current_app
+        if SearchIndex.ensure(db.engine, include_text=current_app.config.get('SEARCH_INDEX_INCLUDE_TEXT', True)):
+            print("✓ Invoice search index ready")
+        else:
+            print("✗ Invoice search index unavailable; search falls back to substring matching")
+        if VendorIndex.ensure(db.engine):
+            print("✓ Vendor trigram index ready")
+        # Tables added to an existing database start empty
+        InvoiceRollups.ensure(db.engine)
         return True
     except Exception as e:
         print(f"✗ Error creating database tables: {str(e)}")
@@ -32,6 +48,9 @@ def create_tables():
 def drop_tables():
     """Drop all database tables."""
     try:
+        # Drop the search index first; on PostgreSQL it references invoices
+        with db.engine.begin() as connection:
+            SearchIndex.drop(connection)
         db.drop_all()
         print("✓ Database tables dropped successfully")
         return True
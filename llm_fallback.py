@@ -1,6 +1,6 @@
 import os
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Callable
 from openai import OpenAI
 
 DEFAULT_MODEL = "gpt-4o-mini"
@@ -128,10 +128,18 @@ def _normalize_line_items(li_val) -> List[Dict[str, str]]:
             out.append(d)
     return out
 
-def extract_with_llm(required_fields: List[str], invoice_text: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+def extract_with_llm(
+    required_fields: List[str],
+    invoice_text: str,
+    model: str = DEFAULT_MODEL,
+    progress: Optional[Callable[..., None]] = None,
+) -> Dict[str, Any]:
     client = _make_client()
     system_prompt = _build_system_prompt(required_fields)
 
+    if progress:
+        progress("llm_requested", model=model)
+
     resp = client.chat.completions.create(
         model=model,
         messages=[{"role": "system", "content": system_prompt},
@@ -140,6 +148,9 @@ def extract_with_llm(required_fields: List[str], invoice_text: str, model: str =
         temperature=0.0,
     )
 
+    if progress:
+        progress("llm_done", model=model)
+
     content = resp.choices[0].message.content if resp and resp.choices else "{}"
     raw = _safe_parse_json(content)
 
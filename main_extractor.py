@@ -1,6 +1,6 @@
 import os
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Callable
 from dateutil import parser
 import datetime
 
@@ -131,10 +131,15 @@ def validate_gst_number(gst: str) -> str:
 
     return gst
 
-def process_pdf(file_path: str, model: str = "gpt-4o-mini", use_ocr: bool = True) -> tuple[List[Dict[str, Any]], str]:
+def process_pdf(
+    file_path: str,
+    model: str = "gpt-4o-mini",
+    use_ocr: bool = True,
+    progress: Optional[Callable[..., None]] = None,
+) -> tuple[List[Dict[str, Any]], str]:
     try:
-        full_text, used_ocr, _ = extract_text(file_path, use_ocr=use_ocr)
-        raw = extract_with_llm(REQUIRED_FIELDS, full_text, model=model)
+        full_text, used_ocr, _ = extract_text(file_path, use_ocr=use_ocr, progress=progress)
+        raw = extract_with_llm(REQUIRED_FIELDS, full_text, model=model, progress=progress)
 
         base = {k: raw.get(k, None) for k in REQUIRED_FIELDS}
         base["filename"] = os.path.basename(file_path)
@@ -2,7 +2,10 @@
 from .user import User
 from .department import Department
 from .invoice import Invoice
+from .invoice_text import InvoiceText
+from .invoice_line_item import InvoiceLineItem
+from .invoice_rollup import InvoiceRollup
 from .notification import Notification
 from .audit_log import AuditLog
 
-__all__ = ['User', 'Department', 'Invoice', 'Notification', 'AuditLog']
+__all__ = ['User', 'Department', 'Invoice', 'InvoiceText', 'InvoiceLineItem', 'InvoiceRollup', 'Notification', 'AuditLog']
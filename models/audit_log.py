@@ -1,6 +1,9 @@
 from datetime import datetime
 import json
 
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import JSON, Text, TypeDecorator
+
 # Import db from app module
 try:
     from app import db
@@ -8,16 +11,99 @@ except ImportError:
     from flask_sqlalchemy import SQLAlchemy
     db = SQLAlchemy()
 
+# Backends whose JSON type is stored in binary form and returned parsed by the driver
+NATIVE_JSON_DIALECTS = ('postgresql', 'mysql', 'mariadb')
+
+
+class JSONPayload(TypeDecorator):
+    """
+    JSON document column: JSONB on PostgreSQL, JSON on MySQL, compact JSON text elsewhere.
+    On text backends the loaded value stays a string until AuditLog parses it on access.
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB())
+        if dialect.name in NATIVE_JSON_DIALECTS:
+            return dialect.type_descriptor(JSON())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name in NATIVE_JSON_DIALECTS:
+            # Strings are taken as already-serialized documents
+            return json.loads(value) if isinstance(value, str) else value
+        return value if isinstance(value, str) else json.dumps(value, separators=(',', ':'))
+
+
+def parse_payload(value):
+    """Payload as stored (dict, JSON string or None) to a dict."""
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    return json.loads(value)
+
+
+# Bookkeeping keys that change on every write and say nothing about the edit
+DIFF_IGNORED_KEYS = frozenset({'updated_at'})
+
+
+def diff_payloads(old_values, new_values):
+    """
+    Reduce a before/after pair to the keys whose values differ.
+
+    Nested dicts (e.g. invoice_data) are reduced the same way, and
+    DIFF_IGNORED_KEYS are dropped. Keys present on only one side are kept on
+    that side. When either side is missing (creation, deletion) the other is
+    returned unchanged.
+
+    Returns:
+        (old, new) tuple; a side with nothing left is None
+    """
+    if not old_values or not new_values:
+        return old_values or None, new_values or None
+    old_diff, new_diff = {}, {}
+    for key in old_values.keys() | new_values.keys():
+        if key in DIFF_IGNORED_KEYS:
+            continue
+        if key not in new_values:
+            old_diff[key] = old_values[key]
+        elif key not in old_values:
+            new_diff[key] = new_values[key]
+        elif isinstance(old_values[key], dict) and isinstance(new_values[key], dict):
+            old_part, new_part = diff_payloads(old_values[key], new_values[key])
+            if old_part is not None:
+                old_diff[key] = old_part
+            if new_part is not None:
+                new_diff[key] = new_part
+        elif old_values[key] != new_values[key]:
+            old_diff[key] = old_values[key]
+            new_diff[key] = new_values[key]
+    # Keep the callers' key order
+    old_diff = {key: old_diff[key] for key in old_values if key in old_diff}
+    new_diff = {key: new_diff[key] for key in new_values if key in new_diff}
+    return old_diff or None, new_diff or None
+
+
 class AuditLog(db.Model):
     """Audit log model for tracking all invoice actions."""
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Per-invoice and per-user history, newest first; timestamp alone for recent activity
+        db.Index('ix_audit_logs_invoice_id_timestamp', 'invoice_id', 'timestamp'),
+        db.Index('ix_audit_logs_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_audit_logs_timestamp', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     action = db.Column(db.String(50), nullable=False)
-    old_values = db.Column(db.Text, nullable=True)  # JSON string
-    new_values = db.Column(db.Text, nullable=True)  # JSON string
+    # Changed keys only, see diff_payloads
+    old_values = db.Column(JSONPayload, nullable=True)
+    new_values = db.Column(JSONPayload, nullable=True)
     remarks = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
@@ -56,25 +142,24 @@ class AuditLog(db.Model):
         self.user_id = user_id
         self.action = action
         self.invoice_id = invoice_id
-        self.old_values = json.dumps(old_values) if old_values else None
-        self.new_values = json.dumps(new_values) if new_values else None
+        self.old_values, self.new_values = diff_payloads(old_values, new_values)
         self.remarks = remarks
     
     def get_old_values(self):
         """Get old values as dictionary."""
-        return json.loads(self.old_values) if self.old_values else None
+        return parse_payload(self.old_values)
     
     def get_new_values(self):
         """Get new values as dictionary."""
-        return json.loads(self.new_values) if self.new_values else None
+        return parse_payload(self.new_values)
     
     def set_old_values(self, values):
-        """Set old values from dictionary."""
-        self.old_values = json.dumps(values) if values else None
+        """Set old values from dictionary; keys unchanged in the new values are dropped from both."""
+        self.old_values, self.new_values = diff_payloads(values, self.get_new_values())
     
     def set_new_values(self, values):
-        """Set new values from dictionary."""
-        self.new_values = json.dumps(values) if values else None
+        """Set new values from dictionary; keys unchanged from the old values are dropped from both."""
+        self.old_values, self.new_values = diff_payloads(self.get_old_values(), values)
     
     @staticmethod
     def log_invoice_action(user_id, action, invoice_id=None, old_values=None, new_values=None, remarks=None):
@@ -1,6 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 from flask import url_for
-import json
+from sqlalchemy.orm import validates, deferred
+
+from utils.normalization import normalize_gstin_key, normalize_invoice_number_key, normalize_vendor_name_key
 
 # Import db from app module
 try:
@@ -12,6 +14,16 @@ except ImportError:
 class Invoice(db.Model):
     """Invoice model for storing extracted invoice data."""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        # Normalized business key used for duplicate-bill detection
+        db.Index('ix_invoices_business_key', 'gst_number_key', 'invoice_number_key'),
+        # List endpoints: filter by status / department / uploader, newest first
+        db.Index('ix_invoices_status_created_at', 'status', 'created_at'),
+        db.Index('ix_invoices_department_status_created_at', 'department_id', 'status', 'created_at'),
+        db.Index('ix_invoices_uploaded_by_created_at', 'uploaded_by', 'created_at'),
+        # Finance pending queue is ordered by submission time
+        db.Index('ix_invoices_status_submitted_at', 'status', 'submitted_at'),
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -23,12 +35,15 @@ class Invoice(db.Model):
     # New workflow helpers
     priority = db.Column(db.String(10), default='low', nullable=False)
     is_saved = db.Column(db.Boolean, default=False, nullable=False)
-    rejection_remarks = db.Column(db.Text, nullable=True)
+    # Free-text columns are deferred: loaded on first access, or up front with undefer_group('text')
+    rejection_remarks = deferred(db.Column(db.Text, nullable=True), group='text')
     approved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     submitted_at = db.Column(db.DateTime, nullable=True)
     approved_at = db.Column(db.DateTime, nullable=True)
-    approval_remarks = db.Column(db.Text, nullable=True)
+    approval_remarks = deferred(db.Column(db.Text, nullable=True), group='text')
     file_path = db.Column(db.String(500), nullable=True)
+    # SHA-256 of the uploaded file bytes, used to detect re-uploads of the same PDF
+    content_sha256 = db.Column(db.String(64), nullable=True, index=True)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -41,7 +56,7 @@ class Invoice(db.Model):
     po_number = db.Column(db.String(100), nullable=True)
     gst_number = db.Column(db.String(20), nullable=True)
     vendor_name = db.Column(db.String(200), nullable=True)
-    line_item = db.Column(db.Text, nullable=True)
+    line_item = deferred(db.Column(db.Text, nullable=True), group='text')
     hsn_sac = db.Column(db.String(20), nullable=True)
     gst_percent = db.Column(db.Float, nullable=True)
     igst_amount = db.Column(db.Float, nullable=True)
@@ -52,13 +67,17 @@ class Invoice(db.Model):
     tds = db.Column(db.Float, nullable=True)
     net_payable = db.Column(db.Float, nullable=True)
     filename = db.Column(db.String(255), nullable=True)
+    # Normalized lookup keys, kept in sync with gst_number/invoice_number/vendor_name by _sync_business_key
+    gst_number_key = db.Column(db.String(20), nullable=True)
+    invoice_number_key = db.Column(db.String(100), nullable=True)
+    # Vendor filters match on this; PostgreSQL also has a pg_trgm index on it (see VendorIndex)
+    vendor_name_norm = db.Column(db.String(200), nullable=True, index=True)
     
     # Additional metadata
     extraction_confidence = db.Column(db.Float, nullable=True)
     extraction_method = db.Column(db.String(50), nullable=True)  # 'openai', 'tesseract', 'fallback'
-    raw_text = db.Column(db.Text, nullable=True)
-    # Persist user-selected line items as JSON string
-    selected_line_items = db.Column(db.Text, nullable=True)
+    # Full extracted text lives compressed in invoice_texts; see the raw_text property
+    # User-selected line items are rows in invoice_line_items; see the selected_line_items property
     # Payment tracking
     payment_status = db.Column(db.String(30), nullable=True)  # DUE_NOT_PAID, DUE_PARTIAL, DUE_FULL, NOT_DUE
     amount_paid = db.Column(db.Float, nullable=True)
@@ -70,6 +89,12 @@ class Invoice(db.Model):
     approver = db.relationship('User', foreign_keys=[approved_by], lazy=True, overlaps="approved_invoices")
     notifications = db.relationship('Notification', backref='invoice', lazy=True)
     audit_logs = db.relationship('AuditLog', backref='invoice', lazy=True)
+    # Loaded only when raw_text is accessed, so list queries never read the text
+    text_record = db.relationship('InvoiceText', uselist=False, lazy='select', cascade='all, delete-orphan')
+    line_item_rows = db.relationship(
+        'InvoiceLineItem', lazy='select', cascade='all, delete-orphan',
+        order_by='InvoiceLineItem.position'
+    )
     
     # Status constants
     STATUS_PENDING = 'pending'
@@ -89,17 +114,8 @@ class Invoice(db.Model):
         self.priority = kwargs.get('priority', 'low')
         self.is_saved = kwargs.get('is_saved', False)
         
-        # Normalize selected_line_items to JSON string if provided
-        if 'selected_line_items' in kwargs:
-            sli = kwargs.get('selected_line_items')
-            try:
-                if isinstance(sli, (list, dict)):
-                    kwargs['selected_line_items'] = json.dumps(sli)
-            except Exception:
-                pass
-
         # Set invoice data fields
-        for field in ['file_path', 's_no', 'invoice_date', 'invoice_number', 'po_number', 'gst_number', 
+        for field in ['file_path', 'content_sha256', 's_no', 'invoice_date', 'invoice_number', 'po_number', 'gst_number', 
                      'vendor_name', 'line_item', 'hsn_sac', 'gst_percent',
                      'igst_amount', 'cgst_amount', 'sgst_amount', 'basic_amount',
                      'total_amount', 'tds', 'net_payable', 'filename',
@@ -108,6 +124,60 @@ class Invoice(db.Model):
             if field in kwargs:
                 setattr(self, field, kwargs[field])
     
+    @property
+    def raw_text(self):
+        """Full extracted text, decompressed from invoice_texts on first access."""
+        return self.text_record.text if self.text_record else None
+    
+    @raw_text.setter
+    def raw_text(self, value):
+        if not value:
+            self.text_record = None
+            return
+        from models.invoice_text import InvoiceText
+        if self.text_record is None:
+            self.text_record = InvoiceText()
+        self.text_record.text = value
+    
+    @property
+    def selected_line_items(self):
+        """User-selected line items serialized with the uppercase API keys."""
+        return [row.to_api_dict() for row in self.line_item_rows if row.is_selected]
+    
+    @selected_line_items.setter
+    def selected_line_items(self, items):
+        """Replace the selected rows; accepts a list, a single dict or a legacy JSON string."""
+        from models.invoice_line_item import InvoiceLineItem
+        kept = [row for row in self.line_item_rows if not row.is_selected]
+        selected = [
+            InvoiceLineItem(position=position, is_selected=True, **InvoiceLineItem.row_values(item))
+            for position, item in enumerate(InvoiceLineItem.parse_items(items))
+        ]
+        self.line_item_rows = kept + selected
+    
+    @staticmethod
+    def business_key_values(values):
+        """Normalized key columns for the business key fields present in values, for writes that bypass the ORM."""
+        keys = {}
+        if 'gst_number' in values:
+            keys['gst_number_key'] = normalize_gstin_key(values['gst_number'])
+        if 'invoice_number' in values:
+            keys['invoice_number_key'] = normalize_invoice_number_key(values['invoice_number'])
+        if 'vendor_name' in values:
+            keys['vendor_name_norm'] = normalize_vendor_name_key(values['vendor_name'])
+        return keys
+
+    @validates('gst_number', 'invoice_number', 'vendor_name')
+    def _sync_business_key(self, key, value):
+        """Keep normalized business key columns in step with the raw values."""
+        if key == 'gst_number':
+            self.gst_number_key = normalize_gstin_key(value)
+        elif key == 'vendor_name':
+            self.vendor_name_norm = normalize_vendor_name_key(value)
+        else:
+            self.invoice_number_key = normalize_invoice_number_key(value)
+        return value
+    
     def approve(self, approved_by_user_id, remarks=None):
         """Approve the invoice."""
         self.status = self.STATUS_APPROVED
@@ -172,58 +242,131 @@ class Invoice(db.Model):
             return True
         return False
     
-    def get_invoice_data_dict(self):
-        """Get invoice data as dictionary matching required_fields format."""
-        return {
-            'S_No': self.s_no,
-            'Invoice_Date': self.invoice_date.isoformat() if self.invoice_date else None,
-            'Invoice_Number': self.invoice_number,
-            'PO_Number': self.po_number,
-            'GST_Number': self.gst_number,
-            'Vendor_Name': self.vendor_name,
-            'Line_Item': self.line_item,
-            'HSN_SAC': self.hsn_sac,
-            'gst_percent': self.gst_percent,
-            'IGST_Amount': self.igst_amount,
-            'CGST_Amount': self.cgst_amount,
-            'SGST_Amount': self.sgst_amount,
-            'Basic_Amount': self.basic_amount,
-            'Total_Amount': self.total_amount,
-            'TDS': self.tds,
-            'Net_Payable': self.net_payable,
-            'filename': self.filename
-        }
-    
-    def to_dict(self):
-        """Convert invoice to dictionary for JSON serialization."""
-        return {
-            'id': self.id,
-            'department_id': self.department_id,
-            'department_name': self.department.name if self.department else None,
-            'uploaded_by': self.uploaded_by,
-            'uploader_name': self.uploader.username if self.uploader else None,
-            'status': self.status,
-            'is_saved': self.is_saved,
-            'priority': self.priority,
-            'rejection_remarks': self.rejection_remarks,
-            'approval_remarks': self.approval_remarks,
-            'approved_by': self.approved_by,
-            'approver_name': self.approver.username if self.approver else None,
-            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
-            'approved_at': self.approved_at.isoformat() if self.approved_at else None,
-            'file_path': self.file_path,
-            'file_url': url_for('invoices.download_file', invoice_id=self.id, _external=True) if self.id else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'invoice_data': self.get_invoice_data_dict(),
-            # line_items may be attached at upload-time; keep optional passthrough in response layers
-            'extraction_confidence': self.extraction_confidence,
-            'extraction_method': self.extraction_method,
-            'selected_line_items': (json.loads(self.selected_line_items) if self.selected_line_items else []),
-            'payment_status': self.payment_status,
-            'amount_paid': self.amount_paid,
-            'paid_at': self.paid_at.isoformat() if self.paid_at else None
-        }
+    # invoice_data key -> column, in required_fields order
+    INVOICE_DATA_FIELDS = {
+        'S_No': 's_no',
+        'Invoice_Date': 'invoice_date',
+        'Invoice_Number': 'invoice_number',
+        'PO_Number': 'po_number',
+        'GST_Number': 'gst_number',
+        'Vendor_Name': 'vendor_name',
+        'Line_Item': 'line_item',
+        'HSN_SAC': 'hsn_sac',
+        'gst_percent': 'gst_percent',
+        'IGST_Amount': 'igst_amount',
+        'CGST_Amount': 'cgst_amount',
+        'SGST_Amount': 'sgst_amount',
+        'Basic_Amount': 'basic_amount',
+        'Total_Amount': 'total_amount',
+        'TDS': 'tds',
+        'Net_Payable': 'net_payable',
+        'filename': 'filename'
+    }
+    
+    def get_invoice_data_dict(self, keys=None):
+        """Get invoice data as dictionary matching required_fields format, optionally only some keys."""
+        data = {}
+        for key in keys or self.INVOICE_DATA_FIELDS:
+            value = getattr(self, self.INVOICE_DATA_FIELDS[key])
+            data[key] = value.isoformat() if isinstance(value, date) else value
+        return data
+    
+    @staticmethod
+    def _iso(value):
+        return value.isoformat() if value else None
+    
+    # to_dict key -> (serializer, columns it reads, relationship it reads); drives ?fields= projections
+    SERIALIZED_FIELDS = {
+        'id': (lambda inv: inv.id, ('id',), None),
+        'department_id': (lambda inv: inv.department_id, ('department_id',), None),
+        'department_name': (lambda inv: inv.department.name if inv.department else None, ('department_id',), 'department'),
+        'uploaded_by': (lambda inv: inv.uploaded_by, ('uploaded_by',), None),
+        'uploader_name': (lambda inv: inv.uploader.username if inv.uploader else None, ('uploaded_by',), 'uploader'),
+        'status': (lambda inv: inv.status, ('status',), None),
+        'is_saved': (lambda inv: inv.is_saved, ('is_saved',), None),
+        'priority': (lambda inv: inv.priority, ('priority',), None),
+        'rejection_remarks': (lambda inv: inv.rejection_remarks, ('rejection_remarks',), None),
+        'approval_remarks': (lambda inv: inv.approval_remarks, ('approval_remarks',), None),
+        'approved_by': (lambda inv: inv.approved_by, ('approved_by',), None),
+        'approver_name': (lambda inv: inv.approver.username if inv.approver else None, ('approved_by',), 'approver'),
+        'submitted_at': (lambda inv: Invoice._iso(inv.submitted_at), ('submitted_at',), None),
+        'approved_at': (lambda inv: Invoice._iso(inv.approved_at), ('approved_at',), None),
+        'file_path': (lambda inv: inv.file_path, ('file_path',), None),
+        'content_sha256': (lambda inv: inv.content_sha256, ('content_sha256',), None),
+        'file_url': (lambda inv: url_for('invoices.download_file', invoice_id=inv.id, _external=True) if inv.id else None, ('id',), None),
+        'created_at': (lambda inv: Invoice._iso(inv.created_at), ('created_at',), None),
+        'updated_at': (lambda inv: Invoice._iso(inv.updated_at), ('updated_at',), None),
+        'invoice_data': (lambda inv: inv.get_invoice_data_dict(), tuple(INVOICE_DATA_FIELDS.values()), None),
+        # line_items may be attached at upload-time; keep optional passthrough in response layers
+        'extraction_confidence': (lambda inv: inv.extraction_confidence, ('extraction_confidence',), None),
+        'extraction_method': (lambda inv: inv.extraction_method, ('extraction_method',), None),
+        'selected_line_items': (lambda inv: inv.selected_line_items, (), 'line_item_rows'),
+        'payment_status': (lambda inv: inv.payment_status, ('payment_status',), None),
+        'amount_paid': (lambda inv: inv.amount_paid, ('amount_paid',), None),
+        'paid_at': (lambda inv: Invoice._iso(inv.paid_at), ('paid_at',), None)
+    }
+    
+    @classmethod
+    def parse_fields(cls, raw, extra=()):
+        """
+        Parse a comma-separated sparse fieldset such as 'status,invoice_data.Vendor_Name'.
+        
+        Args:
+            raw: Field list from the request; to_dict keys, or invoice_data.<key> for single invoice_data keys
+            extra: Endpoint-specific names to accept as well; to_dict leaves them to the caller
+            
+        Returns:
+            Field names in request order with id first, or None when raw is empty (all fields)
+            
+        Raises:
+            ValueError: If a field name is unknown
+        """
+        names = [name.strip() for name in (raw or '').split(',') if name.strip()]
+        if not names:
+            return None
+        unknown = [
+            name for name in names
+            if name not in cls.SERIALIZED_FIELDS and name not in extra
+            and not (name.startswith('invoice_data.') and name[len('invoice_data.'):] in cls.INVOICE_DATA_FIELDS)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # id is always returned so rows stay addressable
+        return list(dict.fromkeys(['id'] + names))
+    
+    @classmethod
+    def fields_requirements(cls, fields):
+        """Columns and relationships that to_dict(fields) reads."""
+        columns, relationships = {'id'}, set()
+        for name in fields:
+            if name.startswith('invoice_data.'):
+                columns.add(cls.INVOICE_DATA_FIELDS[name[len('invoice_data.'):]])
+                continue
+            if name not in cls.SERIALIZED_FIELDS:
+                continue
+            _serializer, field_columns, relationship = cls.SERIALIZED_FIELDS[name]
+            columns.update(field_columns)
+            if relationship:
+                relationships.add(relationship)
+        return columns, relationships
+    
+    def to_dict(self, fields=None):
+        """
+        Convert invoice to dictionary for JSON serialization.
+        
+        Args:
+            fields: Optional sparse fieldset from parse_fields; all fields when None
+        """
+        if fields is None:
+            return {name: spec[0](self) for name, spec in self.SERIALIZED_FIELDS.items()}
+        result = {}
+        data_keys = [name[len('invoice_data.'):] for name in fields if name.startswith('invoice_data.')]
+        for name in fields:
+            if name in self.SERIALIZED_FIELDS:
+                result[name] = self.SERIALIZED_FIELDS[name][0](self)
+        if data_keys and 'invoice_data' not in result:
+            result['invoice_data'] = self.get_invoice_data_dict(data_keys)
+        return result
     
     def __repr__(self):
         return f'<Invoice {self.invoice_number or self.id}>'
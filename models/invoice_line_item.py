@@ -0,0 +1,105 @@
+from datetime import datetime
+import json
+
+# Import db from app module
+try:
+    from app import db
+except ImportError:
+    from flask_sqlalchemy import SQLAlchemy
+    db = SQLAlchemy()
+
+class InvoiceLineItem(db.Model):
+    """Line item of an invoice, as extracted at upload and as selected by the user."""
+    __tablename__ = 'invoice_line_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    # Extracted rows are kept with is_selected=False; the user's saved selection has is_selected=True
+    is_selected = db.Column(db.Boolean, nullable=False, default=False)
+    line_item = db.Column(db.Text, nullable=True)
+    hsn_sac = db.Column(db.String(20), nullable=True, index=True)
+    gst_percent = db.Column(db.Float, nullable=True)
+    basic_amount = db.Column(db.Float, nullable=True)
+    igst_amount = db.Column(db.Float, nullable=True)
+    cgst_amount = db.Column(db.Float, nullable=True)
+    sgst_amount = db.Column(db.Float, nullable=True)
+    total_amount = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # API key -> column; lowercase keys are accepted as fallbacks on input
+    API_FIELDS = {
+        'Line_Item': 'line_item',
+        'HSN_SAC': 'hsn_sac',
+        'gst_percent': 'gst_percent',
+        'Basic_Amount': 'basic_amount',
+        'IGST_Amount': 'igst_amount',
+        'CGST_Amount': 'cgst_amount',
+        'SGST_Amount': 'sgst_amount',
+        'Total_Amount': 'total_amount',
+    }
+    AMOUNT_COLUMNS = {'gst_percent', 'basic_amount', 'igst_amount', 'cgst_amount', 'sgst_amount', 'total_amount'}
+
+    @staticmethod
+    def _to_float(val):
+        """Convert value to float, handling commas, currency symbols, and parentheses."""
+        if val is None or val == '':
+            return None
+        if isinstance(val, (int, float)):
+            return float(val)
+        s = str(val).strip().replace(',', '').replace('%', '')
+        s = s.replace('₹', '').replace('$', '').replace('€', '').replace('£', '')
+        if s.startswith('(') and s.endswith(')'):
+            s = '-' + s[1:-1]
+        try:
+            return float(s)
+        except ValueError:
+            return None
+
+    @classmethod
+    def row_values(cls, item):
+        """Map one API line item dict to column values."""
+        values = {}
+        for api_key, column in cls.API_FIELDS.items():
+            value = item.get(api_key)
+            if value is None:
+                value = item.get(column)
+            if column in cls.AMOUNT_COLUMNS:
+                value = cls._to_float(value)
+            elif value is not None:
+                value = str(value).strip()
+                if column == 'hsn_sac':
+                    value = value[:20]
+            values[column] = value
+        return values
+
+    @classmethod
+    def parse_items(cls, items):
+        """
+        Accept a list, a single dict or a legacy JSON string and return a list of dicts.
+        Non-dict entries are dropped.
+        """
+        if items is None or items == '':
+            return []
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                return []
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            return []
+        return [it for it in items if isinstance(it, dict)]
+
+    @classmethod
+    def normalize_items(cls, items):
+        """Return items in the exact shape they serialize back to, for change detection."""
+        return [cls(**cls.row_values(it)).to_api_dict() for it in cls.parse_items(items)]
+
+    def to_api_dict(self):
+        """Serialize with the uppercase keys used by the extraction pipeline and frontend."""
+        return {api_key: getattr(self, column) for api_key, column in self.API_FIELDS.items()}
+
+    def __repr__(self):
+        return f'<InvoiceLineItem {self.invoice_id}:{self.position}>'
@@ -0,0 +1,31 @@
+# Import db from app module
+try:
+    from app import db
+except ImportError:
+    from flask_sqlalchemy import SQLAlchemy
+    db = SQLAlchemy()
+
+class InvoiceRollup(db.Model):
+    """Invoice count and amount totals per (department, status, priority, month) bucket."""
+    __tablename__ = 'invoice_rollups'
+
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    priority = db.Column(db.String(10), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # First day of the invoices' created_at month
+    invoice_count = db.Column(db.Integer, default=0, nullable=False)
+    total_amount = db.Column(db.Float, default=0.0, nullable=False)
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization."""
+        return {
+            'department_id': self.department_id,
+            'status': self.status,
+            'priority': self.priority,
+            'month': self.month.isoformat() if self.month else None,
+            'invoice_count': self.invoice_count,
+            'total_amount': self.total_amount
+        }
+
+    def __repr__(self):
+        return f'<InvoiceRollup {self.department_id}/{self.status}/{self.priority}/{self.month}: {self.invoice_count}>'
@@ -0,0 +1,53 @@
+from datetime import datetime
+import zlib
+
+# Import db from app module
+try:
+    from app import db
+except ImportError:
+    from flask_sqlalchemy import SQLAlchemy
+    db = SQLAlchemy()
+
+class InvoiceText(db.Model):
+    """Compressed OCR/text-layer output for an invoice, kept out of the invoices row."""
+    __tablename__ = 'invoice_texts'
+
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), primary_key=True)
+    compression = db.Column(db.String(10), default='zlib', nullable=False)
+    content = db.Column(db.LargeBinary, nullable=False)
+    original_length = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    COMPRESSION_ZLIB = 'zlib'
+    COMPRESSION_LEVEL = 6
+
+    @staticmethod
+    def compress(text):
+        """Compress text for storage."""
+        return zlib.compress((text or '').encode('utf-8'), InvoiceText.COMPRESSION_LEVEL)
+
+    @property
+    def text(self):
+        """Decompressed text."""
+        if not self.content:
+            return ''
+        return zlib.decompress(self.content).decode('utf-8')
+
+    @text.setter
+    def text(self, value):
+        value = value or ''
+        self.compression = self.COMPRESSION_ZLIB
+        self.content = self.compress(value)
+        self.original_length = len(value)
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization."""
+        return {
+            'invoice_id': self.invoice_id,
+            'raw_text': self.text,
+            'length': self.original_length,
+            'compressed_size': len(self.content) if self.content else 0
+        }
+
+    def __repr__(self):
+        return f'<InvoiceText {self.invoice_id}>'
@@ -10,6 +10,10 @@ except ImportError:
 class Notification(db.Model):
     """Notification model for in-app notifications."""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Notification list and unread count: per user, unread first filter, newest first
+        db.Index('ix_notifications_user_read_created_at', 'user_id', 'is_read', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
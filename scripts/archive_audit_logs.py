@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Audit log archival script.
+Moves audit entries older than AUDIT_RETENTION_DAYS out of audit_logs into the
+compressed, date-partitioned archive under AUDIT_ARCHIVE_FOLDER. Run it
+periodically (e.g. nightly via cron); an interrupted run can be repeated.
+"""
+
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from services.audit_archive import AuditArchive
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main archival function."""
+    parser = argparse.ArgumentParser(description='Move old audit log entries into the compressed archive')
+    parser.add_argument('--days', type=int, default=None, help='Retention in days (default: AUDIT_RETENTION_DAYS)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report how many entries would be archived')
+    parser.add_argument('--verify', action='store_true', help='Check the archive files against the manifest and exit')
+    args = parser.parse_args()
+
+    try:
+        app = create_app()
+
+        with app.app_context():
+            archive = AuditArchive(app.config['AUDIT_ARCHIVE_FOLDER'])
+
+            if args.verify:
+                problems = archive.verify()
+                for problem in problems:
+                    logger.error(problem)
+                if problems:
+                    sys.exit(1)
+                logger.info(f"Archive is consistent with its manifest ({archive.statistics()['rows']} entries)")
+                return
+
+            days = args.days if args.days is not None else app.config.get('AUDIT_RETENTION_DAYS', AuditArchive.DEFAULT_RETENTION_DAYS)
+            before = datetime.utcnow() - timedelta(days=days)
+            summary = archive.archive(db.engine, before, dry_run=args.dry_run)
+
+            if args.dry_run:
+                logger.info(f"{summary['archived']} audit entries over {summary['days']} days are older than {days} days")
+            else:
+                logger.info(f"Archived {summary['archived']} audit entries over {summary['days']} days into "
+                            f"{len(summary['files'])} files; deleted {summary['deleted']} rows from audit_logs")
+
+    except Exception as e:
+        logger.error(f"Error during audit archival: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Backfill script for invoice content hashes.
+Hashes the stored files of invoices that predate the content_sha256 column so
+that duplicate uploads of older invoices are detected as well.
+"""
+
+import os
+import sys
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models.invoice import Invoice
+from utils.file_utils import FileUtils
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _hash_file(item):
+    """Hash a single (invoice_id, file_path) pair; returns (invoice_id, digest or None)."""
+    invoice_id, file_path = item
+    try:
+        return invoice_id, FileUtils.compute_sha256(file_path)
+    except OSError as e:
+        logger.warning(f"Could not hash file for invoice {invoice_id}: {str(e)}")
+        return invoice_id, None
+
+
+def main():
+    """Main backfill function."""
+    parser = argparse.ArgumentParser(description='Backfill content_sha256 for existing invoices')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Number of parallel hashing workers')
+    parser.add_argument('--batch-size', type=int, default=500, help='Number of rows updated per commit')
+    args = parser.parse_args()
+
+    try:
+        # Create Flask app context
+        app = create_app()
+
+        with app.app_context():
+            upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+
+            # Only id and file_path are needed; avoid loading full invoice rows
+            rows = db.session.query(Invoice.id, Invoice.file_path).filter(
+                Invoice.content_sha256.is_(None),
+                Invoice.file_path.isnot(None)
+            ).all()
+
+            pending = [
+                (invoice_id, file_path) for invoice_id, file_path in rows
+                if os.path.abspath(file_path).startswith(upload_folder + os.sep) and os.path.isfile(file_path)
+            ]
+            logger.info(f"Hashing {len(pending)} of {len(rows)} unhashed invoices with {args.workers} workers")
+
+            updated_count = 0
+            batch = []
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                for invoice_id, digest in executor.map(_hash_file, pending):
+                    if not digest:
+                        continue
+                    batch.append({'id': invoice_id, 'content_sha256': digest})
+                    if len(batch) >= args.batch_size:
+                        db.session.bulk_update_mappings(Invoice, batch)
+                        db.session.commit()
+                        updated_count += len(batch)
+                        batch = []
+
+            if batch:
+                db.session.bulk_update_mappings(Invoice, batch)
+                db.session.commit()
+                updated_count += len(batch)
+
+            logger.info(f"Backfilled content hashes for {updated_count} invoices")
+
+    except Exception as e:
+        logger.error(f"Error during content hash backfill: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+SQLite write-concurrency benchmark for the engine profile.
+Runs the same mixed workload twice against a fresh database file: once with a
+plain create_engine (rollback journal, default synchronous mode) and once with
+the profile from utils/engine_profiles.py (WAL, busy_timeout, synchronous=NORMAL,
+mmap and cache size). Writer processes insert and update rows in short
+transactions, the way an upload burst does, while reader processes run
+dashboard-style aggregates. Reports committed writes per second, write latency
+and how many transactions failed with "database is locked".
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from utils.engine_profiles import engine_options, apply_engine_profile
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PROFILES = ('default', 'tuned')
+CONFIG = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+
+
+def make_engine(url, profile):
+    if profile == 'default':
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url, CONFIG))
+    apply_engine_profile(engine, CONFIG)
+    return engine
+
+
+def prepare(url, profile, seed_rows):
+    engine = make_engine(url, profile)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE bench_invoices (id INTEGER PRIMARY KEY, department_id INTEGER NOT NULL, "
+            "status VARCHAR(20) NOT NULL, total_amount FLOAT, payload TEXT, created_at TIMESTAMP)"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_bench_status ON bench_invoices (status, created_at)")
+        conn.execute(
+            text("INSERT INTO bench_invoices (department_id, status, total_amount, payload, created_at) "
+                 "VALUES (:d, 'pending', :a, :p, CURRENT_TIMESTAMP)"),
+            [{'d': i % 5, 'a': float(i), 'p': 'x' * 500} for i in range(seed_rows)]
+        )
+    engine.dispose()
+
+
+def writer(url, profile, transactions, results):
+    engine = make_engine(url, profile)
+    latencies, errors = [], 0
+    for _ in range(transactions):
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO bench_invoices (department_id, status, total_amount, payload, created_at) "
+                         "VALUES (:d, 'extracted', :a, :p, CURRENT_TIMESTAMP)"),
+                    {'d': random.randrange(5), 'a': random.random() * 1000, 'p': 'y' * 2000}
+                )
+                conn.execute(
+                    text("UPDATE bench_invoices SET status = 'approved' WHERE id = :id"),
+                    {'id': random.randrange(1, 1000)}
+                )
+            latencies.append(time.perf_counter() - started)
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            errors += 1
+    engine.dispose()
+    results.put(('writer', latencies, errors))
+
+
+def reader(url, profile, stop_at, results):
+    engine = make_engine(url, profile)
+    queries, errors = 0, 0
+    while time.time() < stop_at.value:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(
+                    "SELECT department_id, status, count(*), sum(total_amount), sum(length(payload)) "
+                    "FROM bench_invoices GROUP BY department_id, status"
+                )).fetchall()
+            queries += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('reader', queries, errors))
+
+
+def run(profile, writers, readers, transactions, seed_rows):
+    with tempfile.TemporaryDirectory() as folder:
+        url = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        prepare(url, profile, seed_rows)
+        results = multiprocessing.Queue()
+        # Readers keep querying until the last writer is done
+        stop_at = multiprocessing.Value('d', float('inf'))
+        writer_procs = [
+            multiprocessing.Process(target=writer, args=(url, profile, transactions, results))
+            for _ in range(writers)
+        ]
+        reader_procs = [
+            multiprocessing.Process(target=reader, args=(url, profile, stop_at, results))
+            for _ in range(readers)
+        ]
+        started = time.perf_counter()
+        for p in writer_procs + reader_procs:
+            p.start()
+        # Drain results before joining; readers only report once stopped, so writers come first
+        outcomes = [results.get() for _ in writer_procs]
+        elapsed = time.perf_counter() - started
+        stop_at.value = time.time()
+        outcomes += [results.get() for _ in reader_procs]
+        for p in writer_procs + reader_procs:
+            p.join()
+
+    latencies, write_errors, reads, read_errors = [], 0, 0, 0
+    for kind, value, errors in outcomes:
+        if kind == 'writer':
+            latencies.extend(value)
+            write_errors += errors
+        else:
+            reads += value
+            read_errors += errors
+    latencies.sort()
+    return {
+        'profile': profile,
+        'committed': len(latencies),
+        'failed': write_errors,
+        'writes_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        'reads': reads,
+        'read_errors': read_errors,
+        'elapsed_s': elapsed,
+    }
+
+
+def main():
+    """Main benchmark function."""
+    parser = argparse.ArgumentParser(description='Compare SQLite write concurrency with and without the engine profile')
+    parser.add_argument('--writers', type=int, default=8, help='Concurrent writer processes')
+    parser.add_argument('--readers', type=int, default=8, help='Concurrent reader processes')
+    parser.add_argument('--transactions', type=int, default=100, help='Write transactions per writer')
+    parser.add_argument('--seed-rows', type=int, default=200000, help='Rows present before the run')
+    args = parser.parse_args()
+
+    rows = [run(profile, args.writers, args.readers, args.transactions, args.seed_rows) for profile in PROFILES]
+
+    logger.info(f"{args.writers} writers x {args.transactions} transactions, {args.readers} readers, {args.seed_rows} seed rows")
+    header = f"{'profile':<8} {'committed':>9} {'locked':>7} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'reads':>7} {'elapsed s':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        p50 = f"{r['p50_ms']:.1f}" if r['p50_ms'] is not None else '-'
+        p95 = f"{r['p95_ms']:.1f}" if r['p95_ms'] is not None else '-'
+        print(f"{r['profile']:<8} {r['committed']:>9} {r['failed']:>7} {r['writes_per_sec']:>9.1f} "
+              f"{p50:>8} {p95:>8} {r['reads']:>7} {r['elapsed_s']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Query plan check for the hot list queries.
+Runs the real service methods behind the invoice, notification and audit log
+listings, captures the SQL they issue and EXPLAINs each statement. Exits with
+status 1 if any of them falls back to a full table scan, or if serializing a
+listing issues more queries for a large page than for a small one (N+1), so it
+can run in CI.
+"""
+
+import os
+import re
+import sys
+import logging
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text
+
+from app import create_app, db
+from config import TestingConfig
+from models.user import User
+from models.department import Department
+from models.invoice import Invoice
+from models.notification import Notification
+from models.audit_log import AuditLog
+from services.database_service import DatabaseService
+from services.notification_service import NotificationService
+from services.audit_service import AuditService
+from services.search_index import SearchIndex
+from services.statistics_service import StatisticsService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Tables that must never be scanned in full by a list query
+HOT_TABLES = ('invoices', 'notifications', 'audit_logs', 'invoice_line_items')
+
+_SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(%s)\b(?!.*\bUSING\b)' % '|'.join(HOT_TABLES))
+_POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (%s)\b' % '|'.join(HOT_TABLES))
+
+# (name, callable) pairs exercising the list endpoints' query paths
+HOT_QUERIES = [
+    ('invoices by status', lambda: DatabaseService.get_invoices_with_filters(status='pending', per_page=20)),
+    ('invoices by department and status', lambda: DatabaseService.get_invoices_with_filters(department_id=1, status='pending', per_page=20)),
+    ('invoices by uploader', lambda: DatabaseService.get_invoices_with_filters(user_id=1, per_page=20)),
+    ('invoice search', lambda: DatabaseService.get_invoices_with_filters(search='acme steel', per_page=20)),
+    ('invoice search by relevance', lambda: DatabaseService.get_invoices_with_filters(search='acme', sort_by='relevance', per_page=20)),
+    ('pending queue', lambda: DatabaseService.get_pending_invoices()),
+    ('unread notifications', lambda: NotificationService.get_user_notifications(1, only_unread=True)),
+    ('unread count', lambda: NotificationService.get_unread_count(1)),
+    ('audit logs for invoice', lambda: AuditService.get_audit_logs_for_invoice(1)),
+    ('audit logs for user', lambda: AuditService.get_audit_logs_for_user(1)),
+    ('recent audit logs', lambda: AuditService.get_recent_audit_logs(limit=20)),
+    ('weekly submission trend', lambda: StatisticsService._build_submission_trend('week', datetime(2026, 1, 1), None)),
+]
+
+SPARSE_FIELDS = Invoice.parse_fields('status,uploader_name,created_at,invoice_data.Vendor_Name,invoice_data.Total_Amount')
+
+# (name, callable(page_size) -> serialized rows) for the N+1 check; the number of
+# statements must not depend on page_size
+SERIALIZED_LISTS = [
+    ('invoice list', lambda n: [inv.to_dict() for inv in DatabaseService.get_invoices_with_filters(per_page=n)['invoices']]),
+    ('pending invoices', lambda n: [inv.to_dict() for inv in DatabaseService.get_invoices_with_filters(status='pending', per_page=n)['invoices']]),
+    ('sparse invoice list', lambda n: [inv.to_dict(SPARSE_FIELDS) for inv in DatabaseService.get_invoices_with_filters(per_page=n, fields=SPARSE_FIELDS)['invoices']]),
+    ('notifications', lambda n: NotificationService.get_user_notifications(1, per_page=n)['notifications']),
+    ('audit logs', lambda n: [log.to_dict() for log in AuditService.get_audit_logs_with_filters(limit=n)['logs']]),
+]
+SMALL_PAGE, LARGE_PAGE = 2, 20
+
+
+@contextmanager
+def capture_statements():
+    """Collect (statement, parameters) for every SELECT executed inside the block."""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(statement, parameters):
+    """Return the plan lines for a captured statement on the current backend."""
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        cursor = raw.cursor()
+        try:
+            if dialect == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                return [row[-1] for row in cursor.fetchall()]
+            # Discourage sequential scans so tiny tables still show whether an index is usable
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {statement}", parameters)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+def full_scans(plan_lines):
+    """Return the hot tables a plan reads without an index."""
+    pattern = _SQLITE_FULL_SCAN if db.engine.dialect.name == 'sqlite' else _POSTGRES_FULL_SCAN
+    return sorted({m.group(1) for line in plan_lines for m in [pattern.search(line)] if m})
+
+
+def seed_rows(count=LARGE_PAGE + 5):
+    """Create enough related rows in the in-memory schema for the N+1 check."""
+    departments = [Department(name=f'Dept {i}') for i in range(3)]
+    db.session.add_all(departments)
+    db.session.flush()
+    users = [
+        User(username=f'user{i}', email=f'user{i}@example.com', password='x', department_id=departments[i % 3].id)
+        for i in range(4)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    for i in range(count):
+        invoice = Invoice(
+            department_id=departments[i % 3].id,
+            uploaded_by=users[i % 4].id,
+            invoice_number=f'INV-{i}',
+            selected_line_items=[{'Line_Item': 'Item', 'HSN_SAC': '9983', 'Total_Amount': 100}]
+        )
+        invoice.status = Invoice.STATUS_PENDING
+        invoice.approved_by = users[(i + 1) % 4].id
+        db.session.add(invoice)
+        db.session.flush()
+        db.session.add(AuditLog(user_id=users[i % 4].id, action=AuditLog.ACTION_UPLOADED, invoice_id=invoice.id))
+        db.session.add(Notification(user_id=1, message='msg', notification_type='invoice_submitted', invoice_id=invoice.id))
+    db.session.commit()
+
+
+def count_statements(run, page_size):
+    """Number of SELECTs issued by run(page_size), starting from an empty session."""
+    db.session.remove()
+    with capture_statements() as statements:
+        run(page_size)
+    return len(statements)
+
+
+def main():
+    """Main check function."""
+    parser = argparse.ArgumentParser(description='Fail if a hot list query does a full table scan')
+    parser.add_argument('--use-configured-db', action='store_true',
+                        help='Check the database from the app config instead of a fresh in-memory schema')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+
+    app = create_app() if args.use_configured_db else create_app(TestingConfig)
+    failures = []
+
+    with app.app_context():
+        if not args.use_configured_db:
+            db.create_all()
+            SearchIndex.ensure(db.engine)
+
+        for name, run in HOT_QUERIES:
+            with capture_statements() as statements:
+                run()
+            for statement, parameters in statements:
+                plan = explain(statement, parameters)
+                scanned = full_scans(plan)
+                if args.verbose or scanned:
+                    logger.info(f"[{name}] {' '.join(statement.split())}\n    " + "\n    ".join(plan))
+                if scanned:
+                    failures.append(f"Full scan in '{name}' on: {', '.join(scanned)}")
+
+        # N+1 check needs rows to serialize; only seed the throwaway in-memory schema
+        if not args.use_configured_db:
+            seed_rows()
+            with app.test_request_context():
+                for name, run in SERIALIZED_LISTS:
+                    small = count_statements(run, SMALL_PAGE)
+                    large = count_statements(run, LARGE_PAGE)
+                    if args.verbose:
+                        logger.info(f"[{name}] {small} queries for {SMALL_PAGE} rows, {large} for {LARGE_PAGE} rows")
+                    if large > small:
+                        failures.append(
+                            f"'{name}' issues {small} queries for {SMALL_PAGE} rows but {large} for {LARGE_PAGE} rows"
+                        )
+
+    if failures:
+        for failure in failures:
+            logger.error(failure)
+        sys.exit(1)
+    logger.info(f"All hot queries use indexes and list serialization is N+1 free ({datetime.utcnow().isoformat()})")
+
+
+if __name__ == "__main__":
+    main()
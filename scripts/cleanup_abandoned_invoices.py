@@ -15,6 +15,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app
 from services.invoice_service import InvoiceService
+from services.chunked_upload_service import ChunkedUploadService
+from services.progress_service import ProgressService
 
 # Configure logging
 logging.basicConfig(
@@ -43,6 +45,23 @@ def main():
                 logger.info(f"Successfully cleaned up {cleaned_count} abandoned invoices")
             else:
                 logger.info("No abandoned invoices found to clean up")
+            
+            # Discard chunked uploads that were started but never completed
+            chunked_service = ChunkedUploadService(
+                upload_folder=app.config['UPLOAD_FOLDER'],
+                max_file_size=app.config['MAX_UPLOAD_FILE_SIZE'],
+                max_chunk_size=app.config['UPLOAD_CHUNK_SIZE']
+            )
+            stale_count = chunked_service.cleanup_stale_uploads(
+                hours_threshold=app.config['CHUNKED_UPLOAD_EXPIRY_HOURS']
+            )
+            if stale_count > 0:
+                logger.info(f"Discarded {stale_count} unfinished chunked uploads")
+            
+            # Remove upload progress logs of finished or abandoned jobs
+            progress_count = ProgressService(app.config['UPLOAD_FOLDER']).cleanup_old_jobs(hours_threshold=24)
+            if progress_count > 0:
+                logger.info(f"Removed {progress_count} old upload progress logs")
                 
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
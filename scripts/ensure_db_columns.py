@@ -11,20 +11,30 @@ DB_CANDIDATES: List[str] = [
 ]
 
 
-def ensure_selected_line_items(db_path: str) -> None:
+def ensure_line_items_table(db_path: str) -> None:
+    """Check that line items live in invoice_line_items (alembic revision add_invoice_line_items_table)."""
     conn = sqlite3.connect(db_path)
     try:
         cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'invoice_line_items'")
+        has_table = cur.fetchone() is not None
         cur.execute('PRAGMA table_info(invoices)')
         cols = [r[1] for r in cur.fetchall()]
-        print(f"DB {db_path} columns: {cols}")
-        if 'selected_line_items' not in cols:
-            print(f"Adding selected_line_items to {db_path}")
-            cur.execute('ALTER TABLE invoices ADD COLUMN selected_line_items TEXT')
-            conn.commit()
-            print(f"Added selected_line_items to {db_path}")
+        print(f"DB {db_path} invoices columns: {cols}")
+        if not has_table:
+            print(f"invoice_line_items missing in {db_path}; run 'alembic upgrade head' to create it")
+        elif 'selected_line_items' in cols:
+            # Re-added by an older copy of this script after the migration dropped it; nothing reads it
+            cur.execute('SELECT COUNT(*) FROM invoices WHERE selected_line_items IS NOT NULL')
+            if cur.fetchone()[0]:
+                print(f"invoices.selected_line_items in {db_path} still holds data; "
+                      f"check the add_invoice_line_items_table migration before dropping it")
+            else:
+                print(f"Dropping unused selected_line_items from {db_path}")
+                cur.execute('ALTER TABLE invoices DROP COLUMN selected_line_items')
+                conn.commit()
         else:
-            print(f"selected_line_items already exists in {db_path}")
+            print(f"invoice_line_items present in {db_path}")
     finally:
         conn.close()
 
@@ -35,9 +45,9 @@ def main():
         if os.path.exists(p):
             any_found = True
             try:
-                ensure_selected_line_items(p)
+                ensure_line_items_table(p)
             except Exception as e:
-                print(f"Failed to update {p}: {e}")
+                print(f"Failed to check {p}: {e}")
     if not any_found:
         print('No candidate SQLite DB files found.')
 
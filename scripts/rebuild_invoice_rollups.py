@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Rebuild or check the invoice_rollups table.
+Without arguments the rollups are recomputed from the invoices table in one
+transaction. With --check nothing is written; every bucket whose stored count or
+amount differs from the invoices is reported and the script exits with status 1,
+so it can run periodically from cron or CI.
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from services.invoice_rollups import InvoiceRollups
+from services.statistics_service import StatisticsService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main rebuild/check function."""
+    parser = argparse.ArgumentParser(description='Rebuild or verify the invoice rollup table')
+    parser.add_argument('--check', action='store_true',
+                        help='Only compare the rollups with the invoices and exit 1 on any mismatch')
+    args = parser.parse_args()
+
+    try:
+        app = create_app()
+
+        with app.app_context():
+            with db.engine.begin() as connection:
+                if not InvoiceRollups.exists(connection):
+                    logger.error(f"Table {InvoiceRollups.TABLE} does not exist; run the database migrations first")
+                    sys.exit(1)
+
+                if args.check:
+                    mismatches = InvoiceRollups.check(connection)
+                    for bucket in mismatches:
+                        logger.error(f"Rollup mismatch: {bucket}")
+                    if mismatches:
+                        logger.error(f"{len(mismatches)} rollup buckets are inconsistent; rerun without --check to rebuild")
+                        sys.exit(1)
+                    logger.info("Invoice rollups are consistent")
+                    return
+
+                buckets = InvoiceRollups.rebuild(connection)
+            StatisticsService.invalidate()
+            logger.info(f"Rebuilt {buckets} invoice rollup buckets")
+
+    except Exception as e:
+        logger.error(f"Error rebuilding invoice rollups: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
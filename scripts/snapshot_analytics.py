@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Analytics snapshot script.
+Exports invoices, line items and audit logs changed since the previous run to
+the Parquet snapshot under ANALYTICS_SNAPSHOT_FOLDER (run it periodically, e.g.
+hourly via cron), or with --report prints vendor or department spend computed
+from the snapshot with DuckDB or pandas, without touching the database.
+Needs pyarrow (in requirements.txt); DuckDB is optional and only speeds up reports.
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import date
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from services.analytics_snapshot import AnalyticsSnapshot
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main snapshot function."""
+    parser = argparse.ArgumentParser(description='Export invoice data to the Parquet analytics snapshot')
+    parser.add_argument('--report', choices=['vendors', 'departments'], help='Print spend from the snapshot instead of exporting')
+    parser.add_argument('--status', default='approved', help="Invoice status for --report ('all' for every status)")
+    parser.add_argument('--date-from', type=date.fromisoformat, help='Invoice date from (YYYY-MM-DD) for --report')
+    parser.add_argument('--date-to', type=date.fromisoformat, help='Invoice date to (YYYY-MM-DD) for --report')
+    parser.add_argument('--limit', type=int, default=20, help='Vendors to print for --report vendors (0 for all)')
+    args = parser.parse_args()
+
+    try:
+        app = create_app()
+
+        with app.app_context():
+            snapshot = AnalyticsSnapshot(
+                app.config['ANALYTICS_SNAPSHOT_FOLDER'],
+                batch_size=app.config.get('ANALYTICS_SNAPSHOT_BATCH_SIZE', AnalyticsSnapshot.DEFAULT_BATCH_SIZE)
+            )
+
+            if args.report:
+                status = None if args.status == 'all' else args.status
+                if args.report == 'vendors':
+                    rows = snapshot.spend_by_vendor(status, args.date_from, args.date_to, limit=args.limit)
+                else:
+                    rows = snapshot.spend_by_department(status, args.date_from, args.date_to)
+                for row in rows:
+                    print(json.dumps(row, default=str))
+                return
+
+            summary = snapshot.export(
+                db.session,
+                lag_seconds=app.config.get('ANALYTICS_SNAPSHOT_LAG_SECONDS', AnalyticsSnapshot.DEFAULT_LAG_SECONDS)
+            )
+            logger.info(f"Snapshot run {summary['run']}: {summary['invoices']} invoices, "
+                        f"{summary['invoice_line_items']} line items, {summary['deleted_invoices']} deleted invoices, "
+                        f"{summary['audit_logs']} audit entries")
+
+    except Exception as e:
+        logger.error(f"Error during analytics snapshot: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
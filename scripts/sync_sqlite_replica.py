@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Copy a SQLite database into a replica file for local read-replica testing.
+Uses SQLite's online backup API, so the primary can stay in use. Point
+DATABASE_REPLICA_URLS at the copy and rerun this script to "replicate"; anything
+written in between is replica lag.
+"""
+
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from utils.db_routing import REPLICA_BIND_PREFIX
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main sync function."""
+    parser = argparse.ArgumentParser(description='Copy the SQLite primary into the configured replica files')
+    parser.parse_args()
+
+    try:
+        app = create_app()
+        with app.app_context():
+            replicas = [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+            if not replicas:
+                logger.error("No replica configured; set DATABASE_REPLICA_URLS")
+                sys.exit(1)
+            if any(engine.dialect.name != 'sqlite' for engine in [db.engine] + replicas):
+                logger.error("Primary and replicas must all be SQLite files")
+                sys.exit(1)
+
+            # Engine URLs, since relative SQLite paths are resolved against the instance folder
+            primary = db.engine.url.database
+            source = sqlite3.connect(primary)
+            try:
+                for engine in replicas:
+                    target = sqlite3.connect(engine.url.database)
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+                    logger.info(f"Copied {primary} to {engine.url.database}")
+            finally:
+                source.close()
+
+    except Exception as e:
+        logger.error(f"Error syncing replica: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
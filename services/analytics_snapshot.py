@@ -0,0 +1,474 @@
+"""
+Columnar analytics snapshot of invoice data.
+Copies invoices, their line items and audit_logs into Parquet files under
+ANALYTICS_SNAPSHOT_FOLDER so ad-hoc analysis scans those instead of the OLTP
+database. Runs are incremental: invoices changed since the previous run's
+watermark (with all their line items) and audit entries written since then.
+Invoices and line items are partitioned by the run's date and keep every
+exported version; readers take the newest, as load() and the spend helpers do.
+Deleted invoices are recorded as tombstones that hide their earlier versions.
+Audit entries never change and are partitioned by day.
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_, select
+
+from models.audit_log import AuditLog
+from models.department import Department
+from models.invoice import Invoice
+from models.invoice_line_item import InvoiceLineItem
+from utils.db_routing import replica_reads
+from utils.export_streams import arrow_schema, arrow_table, require_pyarrow
+
+logger = logging.getLogger(__name__)
+
+TABLE_INVOICES = 'invoices'
+TABLE_LINE_ITEMS = 'invoice_line_items'
+TABLE_AUDIT_LOGS = 'audit_logs'
+TABLE_DEPARTMENTS = 'departments'
+# Ids of invoices deleted from the database, with the run that noticed
+TABLE_DELETED_INVOICES = 'deleted_invoices'
+
+# Column every exported row carries: the run that wrote it; the newest version of a row has the largest
+SNAPSHOT_RUN = 'snapshot_run'
+
+_PART_FILE = re.compile(r'^part-(?P<run>[0-9TZ]+)\.parquet$')
+_PYTHON_TYPES = {bool: 'bool', int: 'int', float: 'float', date: 'date', datetime: 'timestamp'}
+
+
+def _column_types(columns) -> Dict[str, str]:
+    types = {}
+    for column in columns:
+        try:
+            types[column.name] = _PYTHON_TYPES.get(column.type.python_type, 'string')
+        except NotImplementedError:
+            types[column.name] = 'string'
+    return types
+
+
+class _PartitionedWriter:
+    """Parquet files of one table and run, one per partition, written batch_size rows per row group."""
+
+    def __init__(self, root: str, run_id: str, columns: List[str], types: Dict[str, str], batch_size: int):
+        self.root = root
+        self.run_id = run_id
+        self.schema = arrow_schema(columns, types)
+        self.batch_size = batch_size
+        self.rows = 0
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._writers: Dict[str, Any] = {}
+
+    def add(self, partition: str, row: Dict[str, Any]) -> None:
+        batch = self._pending.setdefault(partition, [])
+        batch.append(row)
+        self.rows += 1
+        if len(batch) >= self.batch_size:
+            self._flush(partition)
+
+    def _flush(self, partition: str) -> None:
+        import pyarrow.parquet as pq
+
+        batch = self._pending.pop(partition, None)
+        if not batch:
+            return
+        writer = self._writers.get(partition)
+        if writer is None:
+            folder = os.path.join(self.root, partition)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f'part-{self.run_id}.parquet.tmp')
+            writer = self._writers[partition] = pq.ParquetWriter(path, self.schema, compression='snappy')
+        writer.write_table(arrow_table(batch, self.schema))
+
+    def close(self) -> List[str]:
+        """Finish every file and move it into place; returns their paths."""
+        for partition in list(self._pending):
+            self._flush(partition)
+        paths = []
+        for partition, writer in self._writers.items():
+            writer.close()
+            path = os.path.join(self.root, partition, f'part-{self.run_id}.parquet')
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return paths
+
+
+class AnalyticsSnapshot:
+    """Exports to and reads the Parquet snapshot in one folder."""
+
+    STATE_FILE = '_state.json'
+    DEFAULT_LAG_SECONDS = 300
+    DEFAULT_BATCH_SIZE = 10000
+
+    def __init__(self, folder: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.folder = os.path.abspath(folder)
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_config(cls) -> Optional['AnalyticsSnapshot']:
+        """The snapshot configured for the current application, or None outside an app context."""
+        try:
+            from flask import current_app
+            folder = current_app.config.get('ANALYTICS_SNAPSHOT_FOLDER')
+            batch_size = current_app.config.get('ANALYTICS_SNAPSHOT_BATCH_SIZE', cls.DEFAULT_BATCH_SIZE)
+        except RuntimeError:
+            return None
+        return cls(folder, batch_size) if folder else None
+
+    # State
+
+    def state(self) -> Dict[str, Any]:
+        """Completed runs and the watermarks the next run starts from."""
+        try:
+            with open(os.path.join(self.folder, self.STATE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'runs': [], 'watermark': None}
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.folder, self.STATE_FILE))
+
+    def _discard_incomplete(self, state: Dict[str, Any]) -> None:
+        """Remove files of runs that did not finish, so a failed run cannot leave duplicates."""
+        completed = set(state['runs'])
+        for path in glob.glob(os.path.join(self.folder, '*', '*', 'part-*')):
+            match = _PART_FILE.match(os.path.basename(path))
+            if match is None or match.group('run') not in completed:
+                logger.info(f"Removing incomplete snapshot file {path}")
+                os.remove(path)
+
+    # Export
+
+    def export(self, session, now: Optional[datetime] = None, lag_seconds: int = DEFAULT_LAG_SECONDS) -> Dict[str, Any]:
+        """
+        Export what changed since the previous run.
+
+        Invoices updated and audit entries written in the last lag_seconds are left for the
+        next run, so transactions still in flight when this one starts are not skipped. Every
+        run also compares the invoice ids in the snapshot with those in the database and
+        records the missing ones as deleted. Reads go to a read replica when one is configured.
+
+        Args:
+            session: SQLAlchemy session to read with
+            now: Run time (default: current UTC time)
+            lag_seconds: Age a change needs before it is exported
+
+        Returns:
+            Summary with the run id and rows written per table
+
+        Raises:
+            ValidationError: If pyarrow is not installed
+        """
+        require_pyarrow()
+        now = now or datetime.utcnow()
+        state = self.state()
+        self._discard_incomplete(state)
+
+        run_id = now.strftime('%Y%m%dT%H%M%S%fZ')
+        low = datetime.fromisoformat(state['watermark']) if state.get('watermark') else None
+        high = now - timedelta(seconds=lag_seconds)
+        if low is not None and high < low:
+            high = low
+
+        with replica_reads(session):
+            summary = {
+                TABLE_INVOICES: self._export_invoices(session, run_id, low, high),
+                TABLE_LINE_ITEMS: self._export_line_items(session, run_id, low, high),
+                TABLE_DELETED_INVOICES: self._export_deleted_invoices(session, run_id),
+                TABLE_AUDIT_LOGS: self._export_audit_logs(session, run_id, low, high),
+                TABLE_DEPARTMENTS: self._export_departments(session, run_id),
+            }
+
+        state['runs'].append(run_id)
+        state['watermark'] = high.isoformat()
+        self._save_state(state)
+        logger.info(f"Analytics snapshot {run_id}: {summary}")
+        return dict(summary, run=run_id)
+
+    @staticmethod
+    def _changed_invoices(low: Optional[datetime], high: datetime):
+        """Invoices updated in [low, high), or whose line items were replaced then."""
+        updated = [Invoice.updated_at < high]
+        replaced = [InvoiceLineItem.created_at < high]
+        if low is not None:
+            updated.append(Invoice.updated_at >= low)
+            replaced.append(InvoiceLineItem.created_at >= low)
+        return or_(and_(*updated), Invoice.id.in_(select(InvoiceLineItem.invoice_id).where(*replaced)))
+
+    @staticmethod
+    def _run_partition(run_id: str) -> str:
+        return f'snapshot_date={run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}'
+
+    def _write(self, table: str, run_id: str, columns, rows: Iterable[Dict[str, Any]], partition_of) -> int:
+        names = [column.name for column in columns]
+        types = _column_types(columns)
+        writer = _PartitionedWriter(os.path.join(self.folder, table), run_id, names + [SNAPSHOT_RUN], types, self.batch_size)
+        for row in rows:
+            writer.add(partition_of(row), row)
+        writer.close()
+        return writer.rows
+
+    def _export_invoices(self, session, run_id: str, low: Optional[datetime], high: datetime) -> int:
+        columns = list(Invoice.__table__.columns)
+        stmt = (
+            select(*columns)
+            .where(self._changed_invoices(low, high))
+            .order_by(Invoice.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        partition = self._run_partition(run_id)
+        rows = (dict(row._mapping, **{SNAPSHOT_RUN: run_id}) for row in session.execute(stmt))
+        return self._write(TABLE_INVOICES, run_id, columns, rows, lambda row: partition)
+
+    def _export_line_items(self, session, run_id: str, low: Optional[datetime], high: datetime) -> int:
+        # All rows of each changed invoice, so a newer version replaces the whole set
+        columns = list(InvoiceLineItem.__table__.columns)
+        changed = select(Invoice.id).where(self._changed_invoices(low, high))
+        stmt = (
+            select(*columns)
+            .where(InvoiceLineItem.invoice_id.in_(changed))
+            .order_by(InvoiceLineItem.invoice_id, InvoiceLineItem.position, InvoiceLineItem.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        partition = self._run_partition(run_id)
+        rows = (dict(row._mapping, **{SNAPSHOT_RUN: run_id}) for row in session.execute(stmt))
+        return self._write(TABLE_LINE_ITEMS, run_id, columns, rows, lambda row: partition)
+
+    def _export_deleted_invoices(self, session, run_id: str) -> int:
+        """Tombstone every invoice that is live in the snapshot but no longer in the database."""
+        invoices = self._newest_runs(TABLE_INVOICES, 'id')
+        deleted = self._newest_runs(TABLE_DELETED_INVOICES, 'id')
+        live = {invoice_id for invoice_id, run in invoices.items() if run > deleted.get(invoice_id, '')}
+        # Only ids are read, so this full pass stays cheap next to the incremental export
+        for invoice_id in session.execute(select(Invoice.id).execution_options(yield_per=self.batch_size)).scalars():
+            live.discard(invoice_id)
+        partition = self._run_partition(run_id)
+        rows = ({'id': invoice_id, SNAPSHOT_RUN: run_id} for invoice_id in sorted(live))
+        return self._write(TABLE_DELETED_INVOICES, run_id, [Invoice.__table__.c.id], rows, lambda row: partition)
+
+    def _export_audit_logs(self, session, run_id: str, low: Optional[datetime], high: datetime) -> int:
+        # By timestamp, not id: ids of transactions that commit late can be lower than ones already read
+        columns = list(AuditLog.__table__.columns)
+        window = [AuditLog.timestamp < high]
+        if low is not None:
+            window.append(AuditLog.timestamp >= low)
+        stmt = (
+            select(*columns)
+            .where(*window)
+            .order_by(AuditLog.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        rows = (dict(row._mapping, **{SNAPSHOT_RUN: run_id}) for row in session.execute(stmt))
+        return self._write(TABLE_AUDIT_LOGS, run_id, columns, rows,
+                           lambda row: f"date={row['timestamp'].date().isoformat()}")
+
+    def _export_departments(self, session, run_id: str) -> int:
+        # Small and rarely changed: a full copy each run
+        columns = list(Department.__table__.columns)
+        rows = (dict(row._mapping, **{SNAPSHOT_RUN: run_id}) for row in session.execute(select(*columns)))
+        partition = self._run_partition(run_id)
+        return self._write(TABLE_DEPARTMENTS, run_id, columns, rows, lambda row: partition)
+
+    # Reading
+
+    # Table -> column identifying one logical row; the newest snapshot_run of each wins.
+    # None: every run writes a full copy, so the newest run's rows are the current ones
+    LATEST_KEYS = {
+        TABLE_INVOICES: 'id',
+        TABLE_LINE_ITEMS: 'invoice_id',
+        TABLE_AUDIT_LOGS: 'id',
+        TABLE_DEPARTMENTS: None,
+        TABLE_DELETED_INVOICES: 'id',
+    }
+    # Table -> column holding the invoice id; rows of deleted invoices are dropped
+    INVOICE_KEYS = {
+        TABLE_INVOICES: 'id',
+        TABLE_LINE_ITEMS: 'invoice_id',
+    }
+
+    def _pattern(self, table: str) -> str:
+        return os.path.join(self.folder, table, '*', 'part-*.parquet')
+
+    def has_data(self, table: str = TABLE_INVOICES) -> bool:
+        return bool(glob.glob(self._pattern(table)))
+
+    def _newest_runs(self, table: str, key: str) -> Dict[Any, str]:
+        """The newest snapshot_run of each key value in table's files."""
+        import pyarrow.parquet as pq
+
+        newest: Dict[Any, str] = {}
+        for path in glob.glob(self._pattern(table)):
+            data = pq.read_table(path, columns=[key, SNAPSHOT_RUN])
+            for value, run in zip(data.column(key).to_pylist(), data.column(SNAPSHOT_RUN).to_pylist()):
+                if run > newest.get(value, ''):
+                    newest[value] = run
+        return newest
+
+    def _latest_sql(self, table: str) -> str:
+        pattern = self._pattern(table).replace("'", "''")
+        key = self.LATEST_KEYS[table]
+        partition = f"PARTITION BY {key}" if key else ''
+        sql = (
+            f"SELECT * FROM read_parquet('{pattern}', union_by_name = true) "
+            f"QUALIFY {SNAPSHOT_RUN} = max({SNAPSHOT_RUN}) OVER ({partition})"
+        )
+        invoice_key = self.INVOICE_KEYS.get(table)
+        if invoice_key and self.has_data(TABLE_DELETED_INVOICES):
+            # A tombstone hides the versions exported up to its run; a later re-export wins again
+            deleted = self._pattern(TABLE_DELETED_INVOICES).replace("'", "''")
+            sql = (
+                f"SELECT * FROM ({sql}) t WHERE NOT EXISTS ("
+                f"SELECT 1 FROM read_parquet('{deleted}') d "
+                f"WHERE d.id = t.{invoice_key} AND d.{SNAPSHOT_RUN} >= t.{SNAPSHOT_RUN})"
+            )
+        return sql
+
+    def _read_pandas(self, table: str):
+        import pandas as pd
+
+        return pd.concat(
+            [pd.read_parquet(path) for path in sorted(glob.glob(self._pattern(table)))], ignore_index=True
+        )
+
+    def load(self, table: str):
+        """
+        The current rows of table as a pandas DataFrame (older versions dropped).
+        Reads with DuckDB when it is installed, otherwise with pandas.
+        """
+        import pandas as pd
+
+        if not self.has_data(table):
+            return pd.DataFrame()
+        duckdb = _duckdb()
+        if duckdb is not None:
+            with duckdb.connect() as connection:
+                return connection.execute(self._latest_sql(table)).df()
+        frame = self._read_pandas(table)
+        key = self.LATEST_KEYS[table]
+        latest = frame.groupby(key)[SNAPSHOT_RUN].transform('max') if key else frame[SNAPSHOT_RUN].max()
+        frame = frame[frame[SNAPSHOT_RUN] == latest]
+        invoice_key = self.INVOICE_KEYS.get(table)
+        if invoice_key and self.has_data(TABLE_DELETED_INVOICES):
+            deleted = self._read_pandas(TABLE_DELETED_INVOICES).groupby('id')[SNAPSHOT_RUN].max()
+            deleted_run = frame[invoice_key].map(deleted)
+            frame = frame[deleted_run.isna() | (deleted_run < frame[SNAPSHOT_RUN])]
+        return frame.reset_index(drop=True)
+
+    def spend_by_vendor(self, status: Optional[str] = Invoice.STATUS_APPROVED, date_from: Optional[date] = None,
+                        date_to: Optional[date] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Invoice count and total_amount per vendor, largest first. Spelling variants of a
+        vendor add up (grouped on vendor_name_norm) under their most common spelling.
+
+        Args:
+            status: Only invoices in this status (None for all)
+            date_from: Invoice date from
+            date_to: Invoice date to
+            limit: Number of vendors to return (0 for all)
+        """
+        rows = self._spend('vendor', status, date_from, date_to)
+        return rows[:limit] if limit else rows
+
+    def spend_by_department(self, status: Optional[str] = Invoice.STATUS_APPROVED, date_from: Optional[date] = None,
+                            date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Invoice count and total_amount per department, largest first; filters as spend_by_vendor."""
+        return self._spend('department', status, date_from, date_to)
+
+    def _spend(self, by: str, status: Optional[str], date_from: Optional[date], date_to: Optional[date]) -> List[Dict[str, Any]]:
+        if not self.has_data(TABLE_INVOICES):
+            return []
+        duckdb = _duckdb()
+        if duckdb is not None:
+            return self._spend_duckdb(duckdb, by, status, date_from, date_to)
+        return self._spend_pandas(by, status, date_from, date_to)
+
+    def _spend_duckdb(self, duckdb, by: str, status, date_from, date_to) -> List[Dict[str, Any]]:
+        conditions, params = ['TRUE'], []
+        if status:
+            conditions.append('i.status = ?')
+            params.append(status)
+        if date_from:
+            conditions.append('i.invoice_date >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('i.invoice_date <= ?')
+            params.append(date_to)
+        where = ' AND '.join(conditions)
+
+        if by == 'vendor':
+            sql = (
+                f"WITH i AS ({self._latest_sql(TABLE_INVOICES)}) "
+                "SELECT mode(i.vendor_name) AS vendor_name, count(*) AS invoice_count, "
+                "sum(i.total_amount) AS total_amount "
+                f"FROM i WHERE {where} GROUP BY coalesce(i.vendor_name_norm, i.vendor_name) "
+                "ORDER BY total_amount DESC NULLS LAST"
+            )
+        else:
+            sql = (
+                f"WITH i AS ({self._latest_sql(TABLE_INVOICES)}), d AS ({self._latest_sql(TABLE_DEPARTMENTS)}) "
+                "SELECT i.department_id, any_value(d.name) AS department_name, count(*) AS invoice_count, "
+                "sum(i.total_amount) AS total_amount "
+                f"FROM i LEFT JOIN d ON d.id = i.department_id WHERE {where} GROUP BY i.department_id "
+                "ORDER BY total_amount DESC NULLS LAST"
+            )
+        with duckdb.connect() as connection:
+            cursor = connection.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _spend_pandas(self, by: str, status, date_from, date_to) -> List[Dict[str, Any]]:
+        import pandas as pd
+
+        invoices = self.load(TABLE_INVOICES)
+        if status:
+            invoices = invoices[invoices['status'] == status]
+        if date_from or date_to:
+            dates = pd.to_datetime(invoices['invoice_date'])
+            keep = dates.notna()
+            if date_from:
+                keep &= dates >= pd.Timestamp(date_from)
+            if date_to:
+                keep &= dates <= pd.Timestamp(date_to)
+            invoices = invoices[keep]
+
+        if by == 'vendor':
+            invoices = invoices.assign(vendor_key=invoices['vendor_name_norm'].fillna(invoices['vendor_name']))
+            result = invoices.groupby('vendor_key', dropna=False).agg(
+                vendor_name=('vendor_name', lambda names: names.mode().iat[0] if names.notna().any() else None),
+                invoice_count=('id', 'count'),
+                total_amount=('total_amount', 'sum'),
+            ).reset_index(drop=True)
+        else:
+            result = invoices.groupby('department_id').agg(
+                invoice_count=('id', 'count'),
+                total_amount=('total_amount', 'sum'),
+            ).reset_index()
+            departments = self.load(TABLE_DEPARTMENTS)
+            names = dict(zip(departments['id'], departments['name'])) if not departments.empty else {}
+            result.insert(1, 'department_name', result['department_id'].map(names))
+
+        result = result.sort_values('total_amount', ascending=False, na_position='last')
+        return [
+            {key: None if pd.isna(value) else value.item() if hasattr(value, 'item') else value
+             for key, value in record.items()}
+            for record in result.to_dict('records')
+        ]
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
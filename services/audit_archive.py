@@ -0,0 +1,359 @@
+"""
+Cold storage for old audit log entries.
+Entries older than AUDIT_RETENTION_DAYS move out of audit_logs into gzip-compressed
+JSON Lines files, one or more per day, under AUDIT_ARCHIVE_FOLDER:
+
+    YYYY/MM/audit-YYYY-MM-DD-<first id>-<last id>.jsonl.gz
+
+manifest.json lists every file with its time and id range, row count, checksum and
+per-action / per-user counts, so statistics never have to open the archives and
+filtered listings only read the days their date range covers. A day is written,
+then recorded in the manifest, then deleted from the table; rows the manifest
+already covers are only deleted, so an interrupted run can simply be repeated.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import sqlalchemy as sa
+
+from models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivedAuditLog:
+    """Read-only audit entry read back from an archive file; serializes like AuditLog.to_dict."""
+
+    __slots__ = ('id', 'invoice_id', 'user_id', 'action', 'old_values', 'new_values', 'remarks', 'timestamp',
+                 'user_name', 'invoice_number')
+
+    def __init__(self, row: Dict[str, Any]):
+        self.id = row['id']
+        self.invoice_id = row.get('invoice_id')
+        self.user_id = row.get('user_id')
+        self.action = row.get('action')
+        self.old_values = row.get('old_values')
+        self.new_values = row.get('new_values')
+        self.remarks = row.get('remarks')
+        self.timestamp = datetime.fromisoformat(row['timestamp']) if row.get('timestamp') else None
+        self.user_name = None
+        self.invoice_number = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'invoice_id': self.invoice_id,
+            'user_id': self.user_id,
+            'user_name': self.user_name,
+            'action': self.action,
+            'old_values': self.old_values,
+            'new_values': self.new_values,
+            'remarks': self.remarks,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'invoice_number': self.invoice_number,
+            'archived': True
+        }
+
+
+class AuditArchive:
+    """Writes, indexes and reads the audit log archive in one folder."""
+
+    MANIFEST = 'manifest.json'
+    VERSION = 1
+    DEFAULT_RETENTION_DAYS = 365
+
+    # folder -> (manifest mtime, parsed manifest), shared by the workers' requests
+    _manifest_cache: Dict[str, Any] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+
+    @classmethod
+    def from_config(cls) -> Optional['AuditArchive']:
+        """The archive configured for the current application, or None outside an app context."""
+        try:
+            from flask import current_app
+            folder = current_app.config.get('AUDIT_ARCHIVE_FOLDER')
+        except RuntimeError:
+            return None
+        return cls(folder) if folder else None
+
+    # Manifest
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.folder, self.MANIFEST)
+
+    def manifest(self) -> Dict[str, Any]:
+        """Parsed manifest; re-read only when the file changed."""
+        path = self._manifest_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {'version': self.VERSION, 'partitions': []}
+        with self._cache_lock:
+            cached = self._manifest_cache.get(self.folder)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with self._cache_lock:
+            self._manifest_cache[self.folder] = (mtime, manifest)
+        return manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest = dict(manifest, partitions=sorted(manifest['partitions'], key=lambda p: (p['day'], p['min_id'])))
+        self._write_atomic(self._manifest_path(), json.dumps(manifest, indent=1).encode('utf-8'))
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def partitions(self, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Manifest entries whose time range overlaps [date_from, date_to], oldest day first."""
+        selected = []
+        for partition in self.manifest()['partitions']:
+            if date_from and datetime.fromisoformat(partition['max_timestamp']) < date_from:
+                continue
+            if date_to and datetime.fromisoformat(partition['min_timestamp']) > date_to:
+                continue
+            selected.append(partition)
+        return selected
+
+    def statistics(self) -> Dict[str, Any]:
+        """Row, per-action and per-user counts over all archived entries, from the manifest alone."""
+        actions, users = Counter(), Counter()
+        rows = 0
+        for partition in self.manifest()['partitions']:
+            rows += partition['rows']
+            actions.update(partition['action_counts'])
+            users.update({int(user_id): count for user_id, count in partition['user_counts'].items()})
+        return {'rows': rows, 'action_counts': dict(actions), 'user_counts': dict(users)}
+
+    # Writing
+
+    def archive(self, engine, before: datetime, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Move every audit entry older than the start of before's day into the archive, one day at a time.
+
+        Args:
+            engine: Engine of the primary database
+            before: Entries with an earlier day are archived
+            dry_run: Only report what would be archived
+
+        Returns:
+            Summary with the days processed, rows archived, rows deleted and files written
+        """
+        table = AuditLog.__table__
+        cutoff = datetime.combine(before.date(), datetime.min.time())
+        summary = {'days': 0, 'archived': 0, 'deleted': 0, 'files': []}
+        with engine.connect() as connection:
+            first = connection.execute(sa.select(sa.func.min(table.c.timestamp)).where(table.c.timestamp < cutoff)).scalar()
+        day = first.date() if isinstance(first, datetime) else (date.fromisoformat(str(first)[:10]) if first else None)
+        while day is not None:
+            start = datetime.combine(day, datetime.min.time())
+            end = min(start + timedelta(days=1), cutoff)
+            if dry_run:
+                with engine.connect() as connection:
+                    count = connection.execute(
+                        sa.select(sa.func.count()).select_from(table).where(table.c.timestamp >= start, table.c.timestamp < end)
+                    ).scalar()
+                summary['archived'] += count
+            else:
+                archived, deleted, path = self._archive_day(engine, day, start, end)
+                summary['archived'] += archived
+                summary['deleted'] += deleted
+                if path:
+                    summary['files'].append(path)
+            summary['days'] += 1
+            with engine.connect() as connection:
+                following = connection.execute(
+                    sa.select(sa.func.min(table.c.timestamp)).where(table.c.timestamp >= end, table.c.timestamp < cutoff)
+                ).scalar()
+            day = None if following is None else (
+                following.date() if isinstance(following, datetime) else date.fromisoformat(str(following)[:10])
+            )
+        return summary
+
+    def _archive_day(self, engine, day: date, start: datetime, end: datetime):
+        table = AuditLog.__table__
+        covered = [(p['min_id'], p['max_id']) for p in self.manifest()['partitions'] if p['day'] == day.isoformat()]
+
+        rows, max_seen = [], None
+        with engine.connect() as connection:
+            result = connection.execution_options(yield_per=1000).execute(
+                sa.select(table).where(table.c.timestamp >= start, table.c.timestamp < end).order_by(table.c.id)
+            )
+            for row in result.mappings():
+                max_seen = row['id']
+                if not any(low <= row['id'] <= high for low, high in covered):
+                    rows.append(_row_to_json(row))
+        if max_seen is None:
+            return 0, 0, None
+
+        relative = None
+        if rows:
+            relative = os.path.join(
+                f'{day:%Y}', f'{day:%m}', f"audit-{day.isoformat()}-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+            )
+            payload = gzip.compress(
+                b''.join(json.dumps(row, separators=(',', ':')).encode('utf-8') + b'\n' for row in rows),
+                compresslevel=9
+            )
+            self._write_atomic(os.path.join(self.folder, relative), payload)
+            manifest = self.manifest()
+            manifest = dict(manifest, version=self.VERSION, partitions=manifest['partitions'] + [{
+                'file': relative.replace(os.sep, '/'),
+                'day': day.isoformat(),
+                'min_timestamp': min(row['timestamp'] for row in rows),
+                'max_timestamp': max(row['timestamp'] for row in rows),
+                'min_id': rows[0]['id'],
+                'max_id': rows[-1]['id'],
+                'rows': len(rows),
+                'bytes': len(payload),
+                'sha256': hashlib.sha256(payload).hexdigest(),
+                'action_counts': dict(Counter(row['action'] for row in rows)),
+                'user_counts': {str(k): v for k, v in Counter(row['user_id'] for row in rows).items()},
+                'archived_at': datetime.utcnow().isoformat(),
+            }])
+            self._save_manifest(manifest)
+
+        # Only rows that were read (and are now archived); later inserts for the day stay
+        with engine.begin() as connection:
+            deleted = connection.execute(
+                table.delete().where(table.c.timestamp >= start, table.c.timestamp < end, table.c.id <= max_seen)
+            ).rowcount
+        logger.info(f"Archived {len(rows)} audit entries of {day.isoformat()}; deleted {deleted} from audit_logs")
+        return len(rows), deleted, relative
+
+    # Reading
+
+    def iter_rows(self, partition: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        with gzip.open(os.path.join(self.folder, partition['file']), 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def verify(self) -> List[str]:
+        """Problems found comparing the archive files with the manifest; empty when consistent."""
+        problems = []
+        for partition in self.manifest()['partitions']:
+            path = os.path.join(self.folder, partition['file'])
+            if not os.path.exists(path):
+                problems.append(f"{partition['file']}: missing")
+                continue
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if digest != partition['sha256']:
+                problems.append(f"{partition['file']}: checksum mismatch")
+                continue
+            rows = sum(1 for _ in self.iter_rows(partition))
+            if rows != partition['rows']:
+                problems.append(f"{partition['file']}: {rows} rows, manifest says {partition['rows']}")
+        return problems
+
+    def _matching(self, partitions: Iterable[Dict[str, Any]], filters: Dict[str, Any]) -> Iterator[ArchivedAuditLog]:
+        for partition in partitions:
+            if filters.get('action') and filters['action'] not in partition['action_counts']:
+                continue
+            if filters.get('user_id') and str(filters['user_id']) not in partition['user_counts']:
+                continue
+            for row in self.iter_rows(partition):
+                if filters.get('user_id') and row.get('user_id') != filters['user_id']:
+                    continue
+                if filters.get('invoice_id') and row.get('invoice_id') != filters['invoice_id']:
+                    continue
+                if filters.get('action') and row.get('action') != filters['action']:
+                    continue
+                entry = ArchivedAuditLog(row)
+                if filters.get('date_from') and entry.timestamp < filters['date_from']:
+                    continue
+                if filters.get('date_to') and entry.timestamp > filters['date_to']:
+                    continue
+                yield entry
+
+    def count(self, filters: Dict[str, Any]) -> int:
+        """Number of archived entries matching the audit list filters."""
+        return sum(1 for _ in self._matching(self.partitions(filters.get('date_from'), filters.get('date_to')), filters))
+
+    def entries(self, filters: Dict[str, Any]) -> Iterator[ArchivedAuditLog]:
+        """Archived entries matching filters, oldest first; one day is decompressed at a time."""
+        days: Dict[str, List[Dict[str, Any]]] = {}
+        for partition in self.partitions(filters.get('date_from'), filters.get('date_to')):
+            days.setdefault(partition['day'], []).append(partition)
+        for day in sorted(days):
+            yield from sorted(self._matching(days[day], filters), key=lambda entry: (entry.timestamp, entry.id))
+
+    def seek(self, filters: Dict[str, Any], limit: int, after: Optional[tuple] = None, descending: bool = True) -> List[ArchivedAuditLog]:
+        """
+        Up to limit archived entries matching filters in (timestamp, id) order, starting after the key after.
+
+        Whole days are read in order until enough entries were found, so only the days
+        a page actually touches are decompressed.
+        """
+        partitions = self.partitions(filters.get('date_from'), filters.get('date_to'))
+        days: Dict[str, List[Dict[str, Any]]] = {}
+        for partition in partitions:
+            days.setdefault(partition['day'], []).append(partition)
+
+        def beyond(entry):
+            if after is None:
+                return True
+            key = (entry.timestamp, entry.id)
+            return key < after if descending else key > after
+
+        found: List[ArchivedAuditLog] = []
+        for day in sorted(days, reverse=descending):
+            if after is not None:
+                # Skip whole days on the wrong side of the cursor
+                day_start = datetime.fromisoformat(day)
+                if descending and day_start > after[0]:
+                    continue
+                if not descending and day_start + timedelta(days=1) <= after[0]:
+                    continue
+            found.extend(entry for entry in self._matching(days[day], filters) if beyond(entry))
+            if len(found) >= limit:
+                break
+        found.sort(key=lambda entry: (entry.timestamp, entry.id), reverse=descending)
+        return found[:limit]
+
+
+def _row_to_json(row) -> Dict[str, Any]:
+    def payload(value):
+        if value is None or isinstance(value, (dict, list)):
+            return value
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return value
+
+    timestamp = row['timestamp']
+    return {
+        'id': row['id'],
+        'invoice_id': row['invoice_id'],
+        'user_id': row['user_id'],
+        'action': row['action'],
+        'old_values': payload(row['old_values']),
+        'new_values': payload(row['new_values']),
+        'remarks': row['remarks'],
+        'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp),
+    }
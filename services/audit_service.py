@@ -1,23 +1,55 @@
 """
 Audit logging service for tracking all invoice operations.
 Integrates with the existing AuditLog model and provides proper tracking of user actions.
+Entries join the request's transaction instead of committing on their own, so they
+are written together with the change they describe; actions listed in
+AUDIT_ASYNC_ACTIONS go through the background AuditWriter instead.
 """
 
+import atexit
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, Iterator, List
 from datetime import datetime
+from sqlalchemy import event, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
-from models.audit_log import AuditLog
+from models.audit_log import AuditLog, parse_payload
 from models.invoice import Invoice
 from models.user import User
+from services.audit_archive import ArchivedAuditLog, AuditArchive
+from services.audit_writer import AuditWriter
 from utils.exceptions import DatabaseError
+from utils.pagination import DIRECTION_NEXT, DIRECTION_PREV, decode_cursor, encode_cursor, keyset_paginate
 
 logger = logging.getLogger(__name__)
 
+_writer_lock = threading.Lock()
+_PENDING_KEY = 'audit_pending'
+
+# Columns of audit log exports, in CSV order
+EXPORT_COLUMNS = [
+    'id', 'timestamp', 'action', 'user_id', 'user_name', 'invoice_id', 'invoice_number',
+    'remarks', 'old_values', 'new_values', 'archived',
+]
+
+
+def _clear_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
 class AuditService:
     """Service for audit logging operations."""
     
+    @staticmethod
+    def _log_list_options():
+        """Loader options so AuditLog.to_dict does not lazy-load user and invoice per row."""
+        return (
+            joinedload(AuditLog.user).load_only(User.id, User.username),
+            joinedload(AuditLog.invoice).load_only(Invoice.id, Invoice.invoice_number),
+        )
+    
     @staticmethod
     def log_invoice_action(
         user_id: int,
@@ -39,7 +71,7 @@ class AuditService:
             remarks: Additional remarks
             
         Returns:
-            Created AuditLog object
+            Created AuditLog object; pending until the current transaction commits
             
         Raises:
             DatabaseError: If database operation fails
@@ -56,8 +88,12 @@ class AuditService:
                 remarks=remarks
             )
             
+            if AuditService._submit_async(audit_log):
+                return audit_log
+            # No commit here: the entry is written by the transaction's next commit, normally the
+            # business change it describes; commit_pending writes any left at the end of the request
             db.session.add(audit_log)
-            db.session.commit()
+            db.session.info[_PENDING_KEY] = True
             
             logger.info(f"Logged {action} action for user {user_id}, invoice {invoice_id}")
             return audit_log
@@ -71,6 +107,72 @@ class AuditService:
             logger.error(f"Unexpected error logging invoice action: {str(e)}")
             raise DatabaseError(f"Unexpected error logging invoice action: {str(e)}")
     
+    @staticmethod
+    def _async_writer(action: str) -> Optional[AuditWriter]:
+        """The application's background writer if action is one of AUDIT_ASYNC_ACTIONS."""
+        try:
+            from flask import current_app
+            app = current_app._get_current_object()
+        except RuntimeError:
+            return None
+        if action not in app.config.get('AUDIT_ASYNC_ACTIONS', ()):
+            return None
+        with _writer_lock:
+            writer = app.extensions.get('audit_writer')
+            if writer is None:
+                from app import db
+                writer = AuditWriter(
+                    db.engine,
+                    batch_size=app.config.get('AUDIT_ASYNC_BATCH_SIZE', 200),
+                    flush_seconds=app.config.get('AUDIT_ASYNC_FLUSH_SECONDS', 1.0),
+                    max_queue=app.config.get('AUDIT_ASYNC_QUEUE_SIZE', 10000)
+                )
+                app.extensions['audit_writer'] = writer
+                atexit.register(writer.close)
+        return writer
+    
+    @staticmethod
+    def _submit_async(audit_log: AuditLog) -> bool:
+        writer = AuditService._async_writer(audit_log.action)
+        if writer is None:
+            return False
+        audit_log.timestamp = audit_log.timestamp or datetime.utcnow()
+        row = {column.name: getattr(audit_log, column.name) for column in AuditLog.__table__.columns if column.name != 'id'}
+        return writer.submit(row)
+    
+    @staticmethod
+    def commit_pending() -> None:
+        """
+        Commit audit entries still waiting in the session, e.g. ones logged after the business
+        commit. Runs after each request (see init_app); failures are logged, not raised.
+        """
+        from app import db
+        
+        # A flag rather than session.new: autoflush may already have sent the INSERT
+        if not db.session.info.get(_PENDING_KEY):
+            return
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Database error writing pending audit entries: {str(e)}")
+    
+    @staticmethod
+    def init_app(app) -> None:
+        """Write pending audit entries before responses of successful requests go out."""
+        from app import db
+        
+        def commit_pending_audit(response):
+            if response.status_code < 500:
+                AuditService.commit_pending()
+            return response
+        
+        app.after_request(commit_pending_audit)
+        if not event.contains(db.session, 'after_commit', _clear_pending):
+            # Entries are written or discarded with their transaction
+            event.listen(db.session, 'after_commit', _clear_pending)
+            event.listen(db.session, 'after_rollback', _clear_pending)
+    
     @staticmethod
     def log_invoice_upload(user_id: int, invoice_id: int, filename: str) -> AuditLog:
         """
@@ -180,13 +282,13 @@ class AuditService:
         new_values: Dict[str, Any]
     ) -> AuditLog:
         """
-        Log invoice edit action.
+        Log invoice edit action. Only the keys whose values changed are stored.
         
         Args:
             user_id: ID of user who edited
             invoice_id: ID of edited invoice
-            old_values: Previous values
-            new_values: New values
+            old_values: Previous values, e.g. the invoice's to_dict() before the edit
+            new_values: New values, e.g. its to_dict() after the edit
             
         Returns:
             Created AuditLog object
@@ -214,6 +316,10 @@ class AuditService:
     def log_invoice_deletion(user_id: int, invoice_id: int, filename: str) -> AuditLog:
         """
         Log invoice deletion action.
+
+        Meant for the deleting transaction (InvoiceService.delete_invoice's before_commit).
+        The entry keeps the id in old_values rather than in invoice_id: the row it would
+        reference is gone, and deleting it clears invoice_id on its other entries too.
         
         Args:
             user_id: ID of user who deleted
@@ -226,7 +332,7 @@ class AuditService:
         return AuditService.log_invoice_action(
             user_id=user_id,
             action=AuditLog.ACTION_DELETED,
-            invoice_id=invoice_id,
+            old_values={'invoice_id': invoice_id},
             remarks=f"Deleted file: {filename}"
         )
     
@@ -285,7 +391,8 @@ class AuditService:
             List of AuditLog objects
         """
         try:
-            return AuditLog.query.filter(AuditLog.invoice_id == invoice_id)\
+            return AuditLog.query.options(*AuditService._log_list_options())\
+                .filter(AuditLog.invoice_id == invoice_id)\
                 .order_by(AuditLog.timestamp.desc())\
                 .limit(limit).all()
         except SQLAlchemyError as e:
@@ -308,7 +415,8 @@ class AuditService:
             List of AuditLog objects
         """
         try:
-            return AuditLog.query.filter(AuditLog.user_id == user_id)\
+            return AuditLog.query.options(*AuditService._log_list_options())\
+                .filter(AuditLog.user_id == user_id)\
                 .order_by(AuditLog.timestamp.desc())\
                 .limit(limit).all()
         except SQLAlchemyError as e:
@@ -327,7 +435,8 @@ class AuditService:
             List of AuditLog objects
         """
         try:
-            return AuditLog.query.order_by(AuditLog.timestamp.desc())\
+            return AuditLog.query.options(*AuditService._log_list_options())\
+                .order_by(AuditLog.timestamp.desc())\
                 .limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"Database error getting recent audit logs: {str(e)}")
@@ -357,10 +466,12 @@ class AuditService:
         action: Optional[str] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
-        limit: int = 100
-    ) -> List[AuditLog]:
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_total: bool = False
+    ) -> Dict[str, Any]:
         """
-        Get audit logs with various filters.
+        Get audit logs with various filters, newest first, keyset-paginated on (timestamp, id).
         
         Args:
             user_id: Filter by user ID
@@ -368,39 +479,215 @@ class AuditService:
             action: Filter by action
             date_from: Filter by date from
             date_to: Filter by date to
-            limit: Maximum number of logs to return
+            limit: Maximum number of logs to return per page
+            cursor: Opaque cursor from a previous page's next_cursor or prev_cursor
+            include_total: Also count the filtered logs
             
         Returns:
-            List of AuditLog objects
+            Dictionary with the page of AuditLog objects under 'logs' and cursor info
+
+        Raises:
+            ValidationError: If the cursor is invalid
         """
         try:
-            query = AuditLog.query
-            
-            if user_id:
-                query = query.filter(AuditLog.user_id == user_id)
-            
-            if invoice_id:
-                query = query.filter(AuditLog.invoice_id == invoice_id)
-            
-            if action:
-                query = query.filter(AuditLog.action == action)
-            
-            if date_from:
-                query = query.filter(AuditLog.timestamp >= date_from)
+            query = AuditService._apply_filters(
+                AuditLog.query.options(*AuditService._log_list_options()),
+                user_id, invoice_id, action, date_from, date_to
+            )
             
-            if date_to:
-                query = query.filter(AuditLog.timestamp <= date_to)
+            # Archived days are read only when the date range reaches into them
+            archive = AuditArchive.from_config()
+            if archive is not None and archive.partitions(date_from, date_to):
+                filters = {'user_id': user_id, 'invoice_id': invoice_id, 'action': action,
+                           'date_from': date_from, 'date_to': date_to}
+                return AuditService._paginate_with_archive(query, archive, filters, limit, cursor, include_total)
             
-            return query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+            result = keyset_paginate(
+                query, AuditLog.timestamp, AuditLog.id, limit, cursor=cursor, include_total=include_total
+            )
+            return {
+                'logs': result['items'],
+                'total': result['total'],
+                'has_next': result['has_next'],
+                'has_prev': result['has_prev'],
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor']
+            }
             
         except SQLAlchemyError as e:
             logger.error(f"Database error getting filtered audit logs: {str(e)}")
             raise DatabaseError(f"Failed to get filtered audit logs: {str(e)}")
     
+    @staticmethod
+    def _apply_filters(query, user_id: Optional[int], invoice_id: Optional[int], action: Optional[str],
+                       date_from: Optional[datetime], date_to: Optional[datetime]):
+        """The audit list filters applied to an ORM query or a select()."""
+        if user_id:
+            query = query.filter(AuditLog.user_id == user_id)
+        
+        if invoice_id:
+            query = query.filter(AuditLog.invoice_id == invoice_id)
+        
+        if action:
+            query = query.filter(AuditLog.action == action)
+        
+        if date_from:
+            query = query.filter(AuditLog.timestamp >= date_from)
+        
+        if date_to:
+            query = query.filter(AuditLog.timestamp <= date_to)
+        return query
+    
+    @staticmethod
+    def iter_audit_logs_for_export(
+        user_id: Optional[int] = None,
+        invoice_id: Optional[int] = None,
+        action: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Every audit entry matching the get_audit_logs_with_filters filters, oldest first, as
+        EXPORT_COLUMNS dicts. Archived days come first, then audit_logs, read through a
+        streaming cursor batch_size rows at a time, so memory does not grow with the export.
+        
+        Raises:
+            DatabaseError: If database operation fails
+        """
+        from app import db
+        
+        filters = {'user_id': user_id, 'invoice_id': invoice_id, 'action': action,
+                   'date_from': date_from, 'date_to': date_to}
+        try:
+            archive = AuditArchive.from_config()
+            if archive is not None and archive.partitions(date_from, date_to):
+                yield from AuditService._named_archive_rows(archive.entries(filters), batch_size)
+            
+            # Plain columns with outer joins: no ORM identity map to grow, no per-row lazy loads
+            stmt = AuditService._apply_filters(
+                select(
+                    AuditLog.id, AuditLog.timestamp, AuditLog.action, AuditLog.user_id, User.username,
+                    AuditLog.invoice_id, Invoice.invoice_number, AuditLog.remarks,
+                    AuditLog.old_values, AuditLog.new_values,
+                )
+                .outerjoin(User, User.id == AuditLog.user_id)
+                .outerjoin(Invoice, Invoice.id == AuditLog.invoice_id),
+                user_id, invoice_id, action, date_from, date_to
+            ).order_by(AuditLog.timestamp, AuditLog.id).execution_options(yield_per=batch_size)
+            
+            for row in db.session.execute(stmt):
+                yield {
+                    'id': row.id,
+                    'timestamp': row.timestamp,
+                    'action': row.action,
+                    'user_id': row.user_id,
+                    'user_name': row.username,
+                    'invoice_id': row.invoice_id,
+                    'invoice_number': row.invoice_number,
+                    'remarks': row.remarks,
+                    'old_values': parse_payload(row.old_values),
+                    'new_values': parse_payload(row.new_values),
+                    'archived': False,
+                }
+        except SQLAlchemyError as e:
+            logger.error(f"Database error exporting audit logs: {str(e)}")
+            raise DatabaseError(f"Failed to export audit logs: {str(e)}")
+    
+    @staticmethod
+    def _named_archive_rows(entries: Iterable[ArchivedAuditLog], batch_size: int) -> Iterator[Dict[str, Any]]:
+        """Export rows for archived entries, with user_name / invoice_number looked up per batch."""
+        from app import db
+        
+        def named(batch: List[ArchivedAuditLog]) -> Iterator[Dict[str, Any]]:
+            user_ids = {entry.user_id for entry in batch if entry.user_id}
+            invoice_ids = {entry.invoice_id for entry in batch if entry.invoice_id}
+            names = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+            numbers = dict(
+                db.session.query(Invoice.id, Invoice.invoice_number).filter(Invoice.id.in_(invoice_ids)).all()
+            ) if invoice_ids else {}
+            for entry in batch:
+                yield {
+                    'id': entry.id,
+                    'timestamp': entry.timestamp,
+                    'action': entry.action,
+                    'user_id': entry.user_id,
+                    'user_name': names.get(entry.user_id),
+                    'invoice_id': entry.invoice_id,
+                    'invoice_number': numbers.get(entry.invoice_id),
+                    'remarks': entry.remarks,
+                    'old_values': entry.old_values,
+                    'new_values': entry.new_values,
+                    'archived': True,
+                }
+        
+        batch: List[ArchivedAuditLog] = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield from named(batch)
+                batch = []
+        if batch:
+            yield from named(batch)
+    
+    @staticmethod
+    def _paginate_with_archive(query, archive: AuditArchive, filters: Dict[str, Any], limit: int,
+                               cursor: Optional[str], include_total: bool) -> Dict[str, Any]:
+        """
+        One keyset page over the audit_logs rows of query merged with the matching archived entries.
+        Both sources seek from the same cursor; the merged page keeps the nearest limit entries.
+        """
+        from app import db
+        
+        position = decode_cursor(cursor, 'timestamp') if cursor else None
+        backwards = position is not None and position['direction'] == DIRECTION_PREV
+        after = (position['value'], position['id']) if position else None
+        
+        hot = keyset_paginate(query, AuditLog.timestamp, AuditLog.id, limit + 1, cursor=cursor)['items']
+        cold = archive.seek(filters, limit + 1, after=after, descending=not backwards)
+        merged = sorted(hot + cold, key=lambda log: (log.timestamp, log.id), reverse=True)
+        if backwards:
+            # Entries just before the cursor are the oldest end of the reversed seek
+            has_prev = len(merged) > limit
+            logs = merged[-limit:] if limit else []
+            has_next = True
+        else:
+            has_next = len(merged) > limit
+            logs = merged[:limit]
+            has_prev = position is not None
+        
+        # user_name / invoice_number for archived entries in two queries per page
+        archived = [log for log in logs if isinstance(log, ArchivedAuditLog)]
+        if archived:
+            user_ids = {log.user_id for log in archived if log.user_id}
+            invoice_ids = {log.invoice_id for log in archived if log.invoice_id}
+            names = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+            numbers = dict(
+                db.session.query(Invoice.id, Invoice.invoice_number).filter(Invoice.id.in_(invoice_ids)).all()
+            ) if invoice_ids else {}
+            for log in archived:
+                log.user_name = names.get(log.user_id)
+                log.invoice_number = numbers.get(log.invoice_id)
+        
+        total = None
+        if include_total:
+            total = query.order_by(None).count() + archive.count(filters)
+        return {
+            'logs': logs,
+            'total': total,
+            'has_next': has_next,
+            'has_prev': has_prev,
+            'next_cursor': encode_cursor('timestamp', logs[-1].timestamp, logs[-1].id, DIRECTION_NEXT) if logs and has_next else None,
+            'prev_cursor': encode_cursor('timestamp', logs[0].timestamp, logs[0].id, DIRECTION_PREV) if logs and has_prev else None
+        }
+    
     @staticmethod
     def get_audit_statistics() -> Dict[str, Any]:
         """
-        Get audit log statistics.
+        Get audit log statistics over live and archived entries.
+        
+        Archived entries are counted from the archive manifest, so the cost only depends
+        on the size of audit_logs.
         
         Returns:
             Dictionary containing audit statistics
@@ -408,27 +695,36 @@ class AuditService:
         try:
             from app import db
             
+            archive = AuditArchive.from_config()
+            archived = archive.statistics() if archive is not None else {'rows': 0, 'action_counts': {}, 'user_counts': {}}
+            
             total_logs = AuditLog.query.count()
             
             # Count by action
-            action_counts = db.session.query(
+            action_counts = Counter(archived['action_counts'])
+            for action, count in db.session.query(
                 AuditLog.action,
                 db.func.count(AuditLog.id).label('count')
-            ).group_by(AuditLog.action).all()
+            ).group_by(AuditLog.action).all():
+                action_counts[action] += count
             
-            # Count by user
-            user_counts = db.session.query(
-                User.username,
+            # Count by user; per user_id so archived counts can be added before picking the top 10
+            user_counts = Counter(archived['user_counts'])
+            for user_id, count in db.session.query(
+                AuditLog.user_id,
                 db.func.count(AuditLog.id).label('count')
-            ).join(AuditLog, User.id == AuditLog.user_id)\
-            .group_by(User.id, User.username)\
-            .order_by(db.func.count(AuditLog.id).desc())\
-            .limit(10).all()
+            ).group_by(AuditLog.user_id).all():
+                user_counts[user_id] += count
+            top = user_counts.most_common(10)
+            names = dict(
+                db.session.query(User.id, User.username).filter(User.id.in_([user_id for user_id, _ in top])).all()
+            ) if top else {}
             
             return {
-                'total_logs': total_logs,
-                'action_counts': [{'action': action, 'count': count} for action, count in action_counts],
-                'top_users': [{'username': username, 'count': count} for username, count in user_counts]
+                'total_logs': total_logs + archived['rows'],
+                'archived_logs': archived['rows'],
+                'action_counts': [{'action': action, 'count': count} for action, count in action_counts.items()],
+                'top_users': [{'username': names[user_id], 'count': count} for user_id, count in top if user_id in names]
             }
             
         except SQLAlchemyError as e:
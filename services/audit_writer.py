@@ -0,0 +1,105 @@
+"""
+Background writer for high-volume audit entries.
+Entries for the actions in AUDIT_ASYNC_ACTIONS (e.g. viewed, downloaded) skip
+the request's transaction: they go on an in-process queue, and a daemon thread
+inserts them in batches of up to AUDIT_ASYNC_BATCH_SIZE rows, one transaction
+per batch, at least every AUDIT_ASYNC_FLUSH_SECONDS. Entries still queued when
+the process dies are lost, so only use it for actions where that is acceptable.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditWriter:
+    """Queues audit_logs rows and inserts them in batches from a daemon thread."""
+
+    def __init__(self, engine, batch_size: int = 200, flush_seconds: float = 1.0, max_queue: int = 10000):
+        self.engine = engine
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self.max_queue = int(max_queue)
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Queue one audit_logs row.
+
+        Returns:
+            False when the queue is full; the caller should then write the entry itself
+        """
+        try:
+            self._ensure_started().put_nowait(row)
+            return True
+        except queue.Full:
+            logger.warning("Audit writer queue is full; writing the entry synchronously")
+            return False
+
+    def _ensure_started(self) -> queue.Queue:
+        # Threads do not survive fork, so each worker process starts its own
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='audit-writer', daemon=True)
+                self._thread.start()
+        return self._queue
+
+    def _run(self, pending: queue.Queue) -> None:
+        while True:
+            item = pending.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(AuditLog.__table__.insert(), batch)
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to write {len(batch)} queued audit entries: {str(e)}")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is still queued and stop the thread; registered with atexit."""
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            self._thread = None
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            pending.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Audit writer queue is full at shutdown; queued entries may be lost")
+            return
+        thread.join(timeout)
@@ -0,0 +1,400 @@
+"""
+Bulk invoice workflow operations.
+A bulk approve or reject validates every invoice like the single-invoice
+endpoints do, then moves all valid ones with one set-based UPDATE, adds their
+audit entries and uploader notifications with bulk INSERTs and commits once.
+A batch edit groups invoices receiving identical changes into one UPDATE per
+group. These writes bypass the session's flush hooks, so the invoice rollups,
+the search index and the statistics cache are maintained explicitly.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+
+from models.audit_log import AuditLog
+from models.invoice import Invoice
+from models.notification import Notification
+from models.user import User
+from services.database_service import DatabaseService
+from services.fields import BATCH_INVOICE_UPDATE_FIELDS, PAYMENT_FIELDS
+from services.invoice_rollups import InvoiceRollups
+from services.search_index import SearchIndex
+from services.statistics_service import StatisticsService
+from utils.exceptions import DatabaseError, ValidationError
+from utils.workflow_validators import ensure_can_approve, ensure_can_update, ensure_valid_rejection
+
+logger = logging.getLogger(__name__)
+
+ACTION_APPROVE = 'approve'
+ACTION_REJECT = 'reject'
+REVIEW_ACTIONS = (ACTION_APPROVE, ACTION_REJECT)
+# Request fields that only give context, ignored like in single-invoice edits
+CONTEXT_FIELDS = {'department_id'}
+PRIORITIES = {'low', 'medium', 'high'}
+# IDs per IN (...) list
+CHUNK_SIZE = 500
+
+
+class BulkInvoiceService:
+    """Multi-invoice workflow changes committed in a single transaction."""
+
+    DEFAULT_MAX_REVIEW = 1000
+    DEFAULT_MAX_UPDATES = 5000
+
+    @staticmethod
+    def _limit(name: str, default: int) -> int:
+        try:
+            from flask import current_app
+            return int(current_app.config.get(name, default))
+        except RuntimeError:
+            return default
+
+    @staticmethod
+    def parse_invoice_ids(raw: Any) -> List[int]:
+        """
+        Validate a list of invoice IDs from a request body.
+
+        Returns:
+            The IDs in request order without duplicates
+
+        Raises:
+            ValidationError: If raw is not a non-empty list of positive integers within the size limit
+        """
+        if not isinstance(raw, list) or not raw:
+            raise ValidationError('invoice_ids must be a non-empty list')
+        ids: List[int] = []
+        seen = set()
+        for value in raw:
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValidationError('invoice_ids must contain positive integer IDs')
+            if value not in seen:
+                seen.add(value)
+                ids.append(value)
+        limit = BulkInvoiceService._limit('BULK_REVIEW_MAX_INVOICES', BulkInvoiceService.DEFAULT_MAX_REVIEW)
+        if len(ids) > limit:
+            raise ValidationError(f'At most {limit} invoices can be processed per request')
+        return ids
+
+    @staticmethod
+    def review_invoices(invoice_ids: List[int], user: User, action: str,
+                        remarks: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Approve or reject several pending invoices in one transaction.
+
+        Args:
+            invoice_ids: IDs to review, see parse_invoice_ids
+            user: Reviewing user
+            action: ACTION_APPROVE or ACTION_REJECT
+            remarks: Approval remarks, or the rejection reason (required for rejections)
+
+        Returns:
+            One outcome per ID in request order: {'id', 'success', 'status', 'error'}, where status is
+            the invoice's new status on success and an HTTP-style error code otherwise
+
+        Raises:
+            ValidationError: If the action is unknown or a rejection has no remarks
+            DatabaseError: If the transaction fails; nothing is changed then
+        """
+        if action not in REVIEW_ACTIONS:
+            raise ValidationError(f"action must be one of: {', '.join(REVIEW_ACTIONS)}")
+        if action == ACTION_REJECT:
+            ok, msg = ensure_valid_rejection(remarks)
+            if not ok:
+                raise ValidationError(msg)
+
+        from app import db
+
+        outcomes: Dict[int, Dict[str, Any]] = {}
+        try:
+            # Lock the rows (PostgreSQL) so a concurrent review cannot act on them in between
+            invoices = (
+                Invoice.query
+                .options(load_only(
+                    Invoice.id, Invoice.invoice_number, Invoice.uploaded_by, Invoice.status,
+                    *[getattr(Invoice, name) for name in InvoiceRollups.INVOICE_FIELDS]
+                ))
+                .filter(Invoice.id.in_(invoice_ids))
+                .with_for_update()
+                .all()
+            )
+            by_id = {invoice.id: invoice for invoice in invoices}
+
+            candidates: List[Invoice] = []
+            for invoice_id in invoice_ids:
+                invoice = by_id.get(invoice_id)
+                if invoice is None:
+                    outcomes[invoice_id] = _failure(invoice_id, 404, 'Invoice not found')
+                    continue
+                ok, msg = ensure_can_approve(invoice, user)
+                if not ok:
+                    outcomes[invoice_id] = _failure(invoice_id, 403, msg)
+                    continue
+                candidates.append(invoice)
+
+            if candidates:
+                now = datetime.utcnow()
+                new_status = Invoice.STATUS_APPROVED if action == ACTION_APPROVE else Invoice.STATUS_REJECTED
+                values = {'status': new_status, 'approved_by': user.id, 'approved_at': now}
+                if action == ACTION_APPROVE:
+                    if remarks:
+                        values['approval_remarks'] = remarks
+                else:
+                    values['rejection_remarks'] = remarks
+                before = {
+                    invoice.id: {name: getattr(invoice, name) for name in InvoiceRollups.INVOICE_FIELDS}
+                    for invoice in candidates
+                }
+
+                # The status guard keeps this correct where FOR UPDATE is a no-op (SQLite)
+                stmt = (
+                    sa.update(Invoice)
+                    .where(Invoice.id.in_(list(before)), Invoice.status == Invoice.STATUS_PENDING)
+                    .values(**values)
+                )
+                if db.session.get_bind().dialect.update_returning:
+                    updated_ids = set(db.session.execute(
+                        stmt.returning(Invoice.id), execution_options={'synchronize_session': False}
+                    ).scalars())
+                else:
+                    db.session.execute(stmt, execution_options={'synchronize_session': False})
+                    updated_ids = set(before)
+
+                audit_rows, notification_rows, changes = [], [], []
+                for invoice in candidates:
+                    if invoice.id not in updated_ids:
+                        outcomes[invoice.id] = _failure(invoice.id, 409, 'Invoice is no longer pending')
+                        continue
+                    audit_rows.append({
+                        'invoice_id': invoice.id,
+                        'user_id': user.id,
+                        'action': AuditLog.ACTION_APPROVED if action == ACTION_APPROVE else AuditLog.ACTION_REJECTED,
+                        'remarks': _audit_remarks(action, remarks),
+                        'timestamp': now,
+                    })
+                    notification_rows.append(_notification_row(invoice, action, remarks, now))
+                    changes.append((before[invoice.id], dict(before[invoice.id], status=new_status)))
+                    outcomes[invoice.id] = {'id': invoice.id, 'success': True, 'status': new_status, 'error': None}
+
+                if audit_rows:
+                    db.session.execute(sa.insert(AuditLog), audit_rows)
+                    db.session.execute(sa.insert(Notification), notification_rows)
+                    InvoiceRollups.apply_changes(db.session.connection(), changes)
+                    StatisticsService.mark_stale(db.session)
+
+            # The commit also expires the in-session copies still holding pre-UPDATE values
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Database error in bulk {action} of {len(invoice_ids)} invoices: {str(e)}")
+            raise DatabaseError(f"Failed to {action} invoices: {str(e)}")
+
+        succeeded = sum(1 for outcome in outcomes.values() if outcome['success'])
+        logger.info(f"Bulk {action} by user {user.id}: {succeeded} of {len(invoice_ids)} invoices")
+        return [outcomes[invoice_id] for invoice_id in invoice_ids]
+
+
+    @staticmethod
+    def parse_updates(raw: Any) -> List[Dict[str, Any]]:
+        """
+        Validate the entries of a batch edit request.
+
+        Returns:
+            [{'id': int, 'changes': dict}] in request order
+
+        Raises:
+            ValidationError: If raw is not a non-empty list of {id, changes} objects with distinct IDs
+                within the size limit
+        """
+        if not isinstance(raw, list) or not raw:
+            raise ValidationError('updates must be a non-empty list')
+        limit = BulkInvoiceService._limit('BULK_UPDATE_MAX_INVOICES', BulkInvoiceService.DEFAULT_MAX_UPDATES)
+        if len(raw) > limit:
+            raise ValidationError(f'At most {limit} invoices can be updated per request')
+        updates, seen = [], set()
+        for position, entry in enumerate(raw):
+            invoice_id = entry.get('id') if isinstance(entry, dict) else None
+            changes = entry.get('changes') if isinstance(entry, dict) else None
+            if isinstance(invoice_id, bool) or not isinstance(invoice_id, int) or invoice_id < 1 \
+                    or not isinstance(changes, dict):
+                raise ValidationError(f'updates[{position}] must be an object with an integer id and a changes object')
+            if invoice_id in seen:
+                raise ValidationError(f'Invoice {invoice_id} appears more than once')
+            seen.add(invoice_id)
+            updates.append({'id': invoice_id, 'changes': changes})
+        return updates
+
+    @staticmethod
+    def update_invoices(updates: List[Dict[str, Any]], user: User) -> List[Dict[str, Any]]:
+        """
+        Apply field changes to many invoices in one transaction.
+
+        Each entry is checked like a single-invoice edit: payment-only changes need Finance or
+        Super Admin, anything else ensure_can_update. Values are coerced with the rules of
+        DatabaseService.update_invoice. Invoices receiving identical changes share one UPDATE,
+        and every changed invoice gets an audit entry holding only the changed fields.
+
+        Args:
+            updates: Entries from parse_updates
+            user: Editing user
+
+        Returns:
+            One outcome per entry in request order: {'id', 'success', 'status', 'changed_fields', 'error'},
+            where status is 'updated' or 'unchanged' on success and an HTTP-style error code otherwise
+
+        Raises:
+            DatabaseError: If the transaction fails; nothing is changed then
+        """
+        from app import db
+
+        columns = Invoice.__table__.c
+        requested = set()
+        for entry in updates:
+            requested.update(f for f in entry['changes'] if f in BATCH_INVOICE_UPDATE_FIELDS and f in columns)
+
+        outcomes: List[Dict[str, Any]] = []
+        try:
+            invoices: Dict[int, Invoice] = {}
+            load_columns = {'id', 'status', 'uploaded_by', *InvoiceRollups.INVOICE_FIELDS} | requested
+            for chunk in _chunks([entry['id'] for entry in updates]):
+                for invoice in (
+                    Invoice.query
+                    .options(load_only(*[getattr(Invoice, name) for name in sorted(load_columns)]))
+                    .filter(Invoice.id.in_(chunk))
+                    .with_for_update()
+                ):
+                    invoices[invoice.id] = invoice
+
+            groups = defaultdict(list)
+            audit_rows, rollup_changes, reindex_ids = [], [], []
+            now = datetime.utcnow()
+            for entry in updates:
+                invoice_id, changes = entry['id'], entry['changes']
+                invoice = invoices.get(invoice_id)
+                if invoice is None:
+                    outcomes.append(_failure(invoice_id, 404, 'Invoice not found'))
+                    continue
+                fields = set(changes) - CONTEXT_FIELDS
+                forbidden = sorted(f for f in fields if f not in BATCH_INVOICE_UPDATE_FIELDS or f not in columns)
+                if forbidden:
+                    outcomes.append(_failure(invoice_id, 400, f"Forbidden fields in update: {', '.join(forbidden)}"))
+                    continue
+                if fields and fields <= PAYMENT_FIELDS:
+                    if not (user.is_finance() or user.is_super_admin()):
+                        outcomes.append(_failure(invoice_id, 403, 'Only Finance or Super Admin can update payment status'))
+                        continue
+                else:
+                    ok, msg = ensure_can_update(invoice, user)
+                    if not ok:
+                        outcomes.append(_failure(invoice_id, 403, msg))
+                        continue
+                try:
+                    coerced = {field: _coerce(field, changes[field]) for field in sorted(fields)}
+                except ValueError as e:
+                    outcomes.append(_failure(invoice_id, 400, str(e)))
+                    continue
+
+                diff = {field: value for field, value in coerced.items() if getattr(invoice, field) != value}
+                if not diff:
+                    outcomes.append({'id': invoice_id, 'success': True, 'status': 'unchanged', 'changed_fields': [], 'error': None})
+                    continue
+                groups[tuple(diff.items())].append(invoice_id)
+                audit_rows.append({
+                    'invoice_id': invoice_id,
+                    'user_id': user.id,
+                    'action': AuditLog.ACTION_EDITED,
+                    'old_values': {field: _jsonable(getattr(invoice, field)) for field in diff},
+                    'new_values': {field: _jsonable(value) for field, value in diff.items()},
+                    'remarks': 'Invoice data updated',
+                    'timestamp': now,
+                })
+                if any(field in InvoiceRollups.INVOICE_FIELDS for field in diff):
+                    before = {name: getattr(invoice, name) for name in InvoiceRollups.INVOICE_FIELDS}
+                    rollup_changes.append((before, dict(before, **{
+                        name: value for name, value in diff.items() if name in InvoiceRollups.INVOICE_FIELDS
+                    })))
+                if any(field in SearchIndex.FIELDS for field in diff):
+                    reindex_ids.append(invoice_id)
+                outcomes.append({'id': invoice_id, 'success': True, 'status': 'updated', 'changed_fields': list(diff), 'error': None})
+
+            for key, group_ids in groups.items():
+                values = dict(key)
+                values.update(Invoice.business_key_values(values))
+                for chunk in _chunks(group_ids):
+                    db.session.execute(
+                        sa.update(Invoice).where(Invoice.id.in_(chunk)).values(**values),
+                        execution_options={'synchronize_session': False}
+                    )
+            if audit_rows:
+                db.session.execute(sa.insert(AuditLog), audit_rows)
+            if rollup_changes:
+                InvoiceRollups.apply_changes(db.session.connection(), rollup_changes)
+                StatisticsService.mark_stale(db.session)
+            if reindex_ids:
+                SearchIndex.reindex(db.session.connection(), reindex_ids)
+            # The commit also expires the in-session copies still holding pre-UPDATE values
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Database error in batch update of {len(updates)} invoices: {str(e)}")
+            raise DatabaseError(f"Failed to update invoices: {str(e)}")
+
+        logger.info(f"Batch update by user {user.id}: {len(audit_rows)} of {len(updates)} invoices changed "
+                    f"with {len(groups)} UPDATE groups")
+        return outcomes
+
+
+def _failure(invoice_id: int, status: int, message: str) -> Dict[str, Any]:
+    return {'id': invoice_id, 'success': False, 'status': status, 'error': message}
+
+
+def _audit_remarks(action: str, remarks: Optional[str]) -> str:
+    # Same wording as AuditService.log_invoice_approval / log_invoice_rejection
+    if action == ACTION_APPROVE:
+        return f"Invoice approved - {remarks}" if remarks else "Invoice approved"
+    return f"Rejected: {remarks}"
+
+
+def _notification_row(invoice: Invoice, action: str, remarks: Optional[str], now: datetime) -> Dict[str, Any]:
+    # Same messages as Notification.create_invoice_approved/rejected_notification
+    label = invoice.invoice_number or invoice.id
+    if action == ACTION_APPROVE:
+        message = f"Your invoice {label} has been approved"
+        notification_type = Notification.TYPE_INVOICE_APPROVED
+    else:
+        message = f"Your invoice {label} has been rejected. Remarks: {remarks or 'No remarks provided'}"
+        notification_type = Notification.TYPE_INVOICE_REJECTED
+    return {
+        'user_id': invoice.uploaded_by,
+        'invoice_id': invoice.id,
+        'message': message,
+        'notification_type': notification_type,
+        'is_read': False,
+        'created_at': now,
+    }
+
+
+def _chunks(ids: List[int]) -> Iterator[List[int]]:
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _coerce(field: str, value: Any) -> Any:
+    if field == 'priority':
+        if value not in PRIORITIES:
+            raise ValueError('Invalid priority value')
+        return value
+    coerced = DatabaseService._coerce_field_value(field, value, strict=True)
+    # Plain column values only; they also key the UPDATE groups
+    if coerced is not None and not isinstance(coerced, (str, int, float, date)):
+        raise ValueError(f'Invalid value for {field}')
+    return coerced
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
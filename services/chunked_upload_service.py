@@ -0,0 +1,312 @@
+"""
+Resumable chunked upload service for large invoice PDFs.
+Chunks are appended to a part file under UPLOAD_FOLDER/temp/<user_id> so a dropped
+connection only costs the chunk in flight; finalized files join the normal extraction flow.
+"""
+
+import os
+import re
+import json
+import uuid
+import hashlib
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, Optional, Tuple
+from werkzeug.utils import secure_filename
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from utils.file_utils import FileUtils
+from utils.exceptions import FileValidationError, InvoiceFileNotFoundError, UploadOffsetError
+
+logger = logging.getLogger(__name__)
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+@contextmanager
+def _exclusive_lock(lock_path: str) -> Iterator[None]:
+    """Hold an OS lock on lock_path; released when the block exits or the process dies."""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+
+
+class ChunkedUploadService:
+    """Service for init / append-chunk / finalize style uploads."""
+
+    # Bytes copied from the request stream per read; bounds memory per request
+    READ_BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, upload_folder: str, max_file_size: int, max_chunk_size: int):
+        self.upload_folder = upload_folder
+        self.max_file_size = max_file_size
+        self.max_chunk_size = max_chunk_size
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.upload_folder, 'temp', str(user_id))
+
+    def _paths(self, user_id: int, upload_id: str) -> Tuple[str, str]:
+        """Return (part_path, meta_path) for an upload, rejecting malformed IDs."""
+        if not upload_id or not _UPLOAD_ID_PATTERN.match(upload_id):
+            raise InvoiceFileNotFoundError("Upload not found")
+        base = os.path.join(self._user_dir(user_id), upload_id)
+        return f"{base}.part", f"{base}.upload.json"
+
+    def _lock_path(self, user_id: int, upload_id: str) -> str:
+        part_path, _ = self._paths(user_id, upload_id)
+        return part_path[:-len('.part')] + '.lock'
+
+    @contextmanager
+    def _locked(self, user_id: int, upload_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Serialize work on one upload across threads and worker processes; yields its metadata.
+
+        Raises:
+            InvoiceFileNotFoundError: If the upload does not exist, or was finalized or
+                aborted while waiting for the lock
+        """
+        self._load_meta(user_id, upload_id)  # don't leave a lock file behind for unknown IDs
+        with _exclusive_lock(self._lock_path(user_id, upload_id)):
+            yield self._load_meta(user_id, upload_id)
+
+    def _load_meta(self, user_id: int, upload_id: str) -> Dict[str, Any]:
+        part_path, meta_path = self._paths(user_id, upload_id)
+        if not os.path.exists(meta_path) or not os.path.exists(part_path):
+            raise InvoiceFileNotFoundError("Upload not found")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _status(self, meta: Dict[str, Any], part_path: str) -> Dict[str, Any]:
+        offset = os.path.getsize(part_path)
+        return {
+            'upload_id': meta['upload_id'],
+            'filename': meta['filename'],
+            'department_id': meta.get('department_id'),
+            'total_size': meta['total_size'],
+            'offset': offset,
+            'complete': offset == meta['total_size'],
+            'chunk_size': self.max_chunk_size
+        }
+
+    def init_upload(
+        self,
+        user_id: int,
+        filename: str,
+        total_size: int,
+        department_id: Optional[int] = None,
+        sha256: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Start a chunked upload.
+
+        Args:
+            user_id: ID of uploading user
+            filename: Original filename
+            total_size: Size of the complete file in bytes
+            department_id: Department the invoice will belong to
+            sha256: Optional hex digest of the complete file, verified on finalize
+
+        Returns:
+            Upload status dictionary including the new upload_id
+
+        Raises:
+            FileValidationError: If the declared file is not acceptable
+        """
+        safe_name = secure_filename(filename or '')
+        if not safe_name or not safe_name.lower().endswith('.pdf'):
+            raise FileValidationError("Invalid file type. Only PDF files are allowed.")
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise FileValidationError("total_size must be a positive integer")
+        if total_size > self.max_file_size:
+            raise FileValidationError(f"File too large. Maximum size: {self.max_file_size} bytes")
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._user_dir(user_id), exist_ok=True)
+        part_path, meta_path = self._paths(user_id, upload_id)
+
+        meta = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'filename': safe_name,
+            'total_size': total_size,
+            'department_id': department_id,
+            'sha256': sha256.lower() if sha256 else None,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        open(part_path, 'wb').close()
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        logger.info(f"Started chunked upload {upload_id} for user {user_id} ({total_size} bytes)")
+        return self._status(meta, part_path)
+
+    def get_status(self, user_id: int, upload_id: str) -> Dict[str, Any]:
+        """Return the current offset so a client can resume after a failure."""
+        meta = self._load_meta(user_id, upload_id)
+        part_path, _ = self._paths(user_id, upload_id)
+        return self._status(meta, part_path)
+
+    def append_chunk(
+        self,
+        user_id: int,
+        upload_id: str,
+        offset: int,
+        stream,
+        chunk_sha256: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Append one chunk read from a stream at the given offset.
+
+        The chunk is written straight to the part file in small buffers. If its
+        checksum does not match, the part file is truncated back to `offset`.
+        Requests for the same upload take turns, so of two chunks sent for the
+        same offset only the first is written.
+
+        Args:
+            user_id: ID of uploading user
+            upload_id: Upload identifier returned by init_upload
+            offset: Byte offset the chunk starts at; must equal the current size
+            stream: Readable binary stream with the chunk bytes
+            chunk_sha256: Optional hex digest of the chunk
+
+        Returns:
+            Updated upload status dictionary
+
+        Raises:
+            UploadOffsetError: If offset is not the current end of the upload
+            FileValidationError: If the chunk is too large or fails its checksum
+        """
+        part_path, _ = self._paths(user_id, upload_id)
+
+        with self._locked(user_id, upload_id) as meta:
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise UploadOffsetError(f"Chunk offset {offset} does not match upload offset {current}", current)
+
+            limit = min(self.max_chunk_size, meta['total_size'] - current)
+            digest = hashlib.sha256()
+            written = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(current)
+                try:
+                    while True:
+                        buf = stream.read(self.READ_BUFFER_SIZE)
+                        if not buf:
+                            break
+                        written += len(buf)
+                        if written > limit:
+                            raise FileValidationError(f"Chunk exceeds allowed size of {limit} bytes")
+                        digest.update(buf)
+                        f.write(buf)
+
+                    if written == 0:
+                        raise FileValidationError("Empty chunk")
+                    if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+                        raise FileValidationError("Chunk checksum mismatch")
+                except Exception:
+                    # Roll the part file back so the client can resend from the same offset
+                    f.truncate(current)
+                    raise
+
+            return self._status(meta, part_path)
+
+    def finalize(self, user_id: int, upload_id: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Complete an upload and move the assembled file to a regular temp file.
+
+        Args:
+            user_id: ID of uploading user
+            upload_id: Upload identifier
+
+        Returns:
+            Tuple of (assembled file path, upload metadata)
+
+        Raises:
+            FileValidationError: If the upload is incomplete or fails its checksum
+        """
+        part_path, meta_path = self._paths(user_id, upload_id)
+        lock_path = self._lock_path(user_id, upload_id)
+
+        with self._locked(user_id, upload_id) as meta:
+            size = os.path.getsize(part_path)
+            if size != meta['total_size']:
+                raise UploadOffsetError(f"Upload incomplete: {size} of {meta['total_size']} bytes received", size)
+
+            if meta.get('sha256'):
+                if FileUtils.compute_sha256(part_path) != meta['sha256']:
+                    raise FileValidationError("File checksum mismatch")
+
+            name, ext = os.path.splitext(meta['filename'])
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            file_path = os.path.join(self._user_dir(user_id), f"{name}_{timestamp}{ext}")
+            os.replace(part_path, file_path)
+            # Requests still waiting for the lock find the upload gone once they get it
+            for path in (meta_path, lock_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        logger.info(f"Finalized chunked upload {upload_id} for user {user_id}")
+        return file_path, meta
+
+    def abort(self, user_id: int, upload_id: str) -> bool:
+        """Discard an unfinished upload."""
+        part_path, meta_path = self._paths(user_id, upload_id)
+        found = False
+        for path in (part_path, meta_path):
+            try:
+                os.remove(path)
+                found = True
+            except OSError:
+                pass
+        try:
+            os.remove(self._lock_path(user_id, upload_id))
+        except OSError:
+            pass
+        return found
+
+    def cleanup_stale_uploads(self, hours_threshold: int = 24) -> int:
+        """
+        Remove unfinished uploads that have not received a chunk recently.
+
+        Args:
+            hours_threshold: Age in hours after which an idle upload is discarded
+
+        Returns:
+            Number of uploads removed
+        """
+        temp_root = os.path.join(self.upload_folder, 'temp')
+        if not os.path.isdir(temp_root):
+            return 0
+        cutoff = (datetime.now() - timedelta(hours=hours_threshold)).timestamp()
+        removed = 0
+        for root, _dirs, files in os.walk(temp_root):
+            for name in files:
+                if not name.endswith('.upload.json'):
+                    continue
+                meta_path = os.path.join(root, name)
+                base = meta_path[:-len('.upload.json')]
+                part_path = base + '.part'
+                try:
+                    last_activity = os.path.getmtime(part_path if os.path.exists(part_path) else meta_path)
+                    if last_activity < cutoff:
+                        for path in (part_path, meta_path, base + '.lock'):
+                            if os.path.exists(path):
+                                os.remove(path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not clean up chunked upload {meta_path}: {str(e)}")
+        return removed
@@ -4,16 +4,25 @@ Provides helper functions for common database operations and proper error handli
 """
 
 import logging
-from typing import List, Optional, Dict, Any
+import math
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Callable
 from datetime import datetime, date
 from sqlalchemy import and_, or_, desc, asc
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only, selectinload, joinedload, undefer_group
 
 from models.invoice import Invoice
+from models.invoice_text import InvoiceText
+from models.invoice_line_item import InvoiceLineItem
+from models.invoice_rollup import InvoiceRollup
 from services.fields import ALLOWED_INVOICE_UPDATE_FIELDS, ALLOWED_INVOICE_WORKFLOW_FIELDS
 from models.user import User
 from models.department import Department
 from utils.exceptions import DatabaseError
+from utils.pagination import keyset_paginate
+from services.search_index import SearchIndex
+from services.vendor_index import VendorIndex
+from services.invoice_rollups import InvoiceRollups
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +30,37 @@ class DatabaseService:
     """Service for database operations related to invoices."""
     
     @staticmethod
-    def create_invoice(invoice_data: Dict[str, Any]) -> Invoice:
+    def _invoice_list_options(fields: Optional[List[str]] = None, extra_columns: Iterable[str] = ()):
+        """
+        Loader options for queries whose rows are serialized with Invoice.to_dict(fields).
+        Many-to-one names come in the same SELECT; line items in one extra query per page.
+        With a sparse fieldset only the columns and relationships it reads are loaded.
+        """
+        if fields is None:
+            return (
+                undefer_group('text'),
+                joinedload(Invoice.department),
+                joinedload(Invoice.uploader),
+                joinedload(Invoice.approver),
+                selectinload(Invoice.line_item_rows),
+            )
+        columns, relationships = Invoice.fields_requirements(fields)
+        columns.update(extra_columns)
+        options = [load_only(*[getattr(Invoice, name) for name in sorted(columns)])]
+        for name in sorted(relationships):
+            loader = selectinload if name == 'line_item_rows' else joinedload
+            options.append(loader(getattr(Invoice, name)))
+        return tuple(options)
+    
+    @staticmethod
+    def create_invoice(invoice_data: Dict[str, Any], before_commit: Optional[Callable[[Invoice], None]] = None) -> Invoice:
         """
         Create a new invoice record.
         
         Args:
             invoice_data: Dictionary containing invoice data
+            before_commit: Called with the flushed invoice just before the commit, e.g. to add
+                its audit entry to the same transaction
             
         Returns:
             Created Invoice object
@@ -41,6 +75,7 @@ class DatabaseService:
                 department_id=invoice_data['department_id'],
                 uploaded_by=invoice_data['uploaded_by'],
                 file_path=invoice_data.get('file_path'),
+                content_sha256=invoice_data.get('content_sha256'),
                 s_no=invoice_data.get('s_no'),
                 invoice_date=invoice_data.get('invoice_date'),
                 invoice_number=invoice_data.get('invoice_number'),
@@ -66,6 +101,22 @@ class DatabaseService:
             )
             
             db.session.add(invoice)
+            
+            # Extracted line items go in with one executemany insert once the invoice id exists
+            extracted_items = InvoiceLineItem.parse_items(invoice_data.get('line_items'))
+            if extracted_items:
+                db.session.flush()
+                db.session.execute(
+                    InvoiceLineItem.__table__.insert(),
+                    [
+                        dict(InvoiceLineItem.row_values(item), invoice_id=invoice.id, position=position,
+                             is_selected=False, created_at=datetime.utcnow())
+                        for position, item in enumerate(extracted_items)
+                    ]
+                )
+            if before_commit:
+                db.session.flush()
+                before_commit(invoice)
             db.session.commit()
             
             logger.info(f"Created invoice {invoice.id} for user {invoice_data['uploaded_by']}")
@@ -98,13 +149,195 @@ class DatabaseService:
             raise DatabaseError(f"Failed to get invoice: {str(e)}")
     
     @staticmethod
-    def update_invoice(invoice_id: int, update_data: Dict[str, Any], allow_workflow_fields: bool = False) -> Optional[Invoice]:
+    def get_invoice_text(invoice_id: int) -> Optional[InvoiceText]:
+        """
+        Get the stored extraction text for an invoice without loading the invoice row.
+        
+        Args:
+            invoice_id: Invoice ID
+            
+        Returns:
+            InvoiceText object or None if no text was stored
+        """
+        try:
+            return InvoiceText.query.get(invoice_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error getting text for invoice {invoice_id}: {str(e)}")
+            raise DatabaseError(f"Failed to get invoice text: {str(e)}")
+    
+    @staticmethod
+    def get_invoice_by_content_hash(content_sha256: str, requesting_user_id: Optional[int] = None) -> Optional[Invoice]:
+        """
+        Get the earliest invoice whose uploaded file has the given SHA-256.
+        
+        Args:
+            content_sha256: Hex digest of the file contents
+            requesting_user_id: Only consider saved invoices and this user's unsaved ones
+            
+        Returns:
+            Invoice object or None if no (visible) invoice has this hash
+        """
+        if not content_sha256:
+            return None
+        try:
+            query = Invoice.query.filter(Invoice.content_sha256 == content_sha256)
+            if requesting_user_id is not None:
+                # Another user's unsaved draft must not hide a later saved duplicate
+                query = query.filter(
+                    or_(
+                        Invoice.is_saved.is_(True),
+                        Invoice.uploaded_by == requesting_user_id
+                    )
+                )
+            return query.order_by(asc(Invoice.id)).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error looking up invoice by content hash: {str(e)}")
+            raise DatabaseError(f"Failed to look up invoice by content hash: {str(e)}")
+    
+    @staticmethod
+    def _duplicate_summary(invoice: Invoice) -> Dict[str, Any]:
+        """Compact description of a possible duplicate for API responses."""
+        return {
+            'id': invoice.id,
+            'invoice_number': invoice.invoice_number,
+            'gst_number': invoice.gst_number,
+            'vendor_name': invoice.vendor_name,
+            'total_amount': invoice.total_amount,
+            'status': invoice.status,
+            'created_at': invoice.created_at.isoformat() if invoice.created_at else None
+        }
+
+    @staticmethod
+    def _duplicate_candidates_query():
+        """Base query for duplicate candidates: saved invoices, summary columns only."""
+        return Invoice.query.options(load_only(
+            Invoice.id, Invoice.invoice_number, Invoice.gst_number, Invoice.vendor_name,
+            Invoice.total_amount, Invoice.status, Invoice.created_at,
+            Invoice.gst_number_key, Invoice.invoice_number_key
+        )).filter(Invoice.is_saved.is_(True))
+
+    @staticmethod
+    def find_possible_duplicates(invoice: Invoice, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find saved invoices sharing the normalized (GSTIN, invoice number) key.
+
+        Args:
+            invoice: Invoice to check
+            limit: Maximum number of matches to return
+
+        Returns:
+            List of duplicate summaries, oldest first
+        """
+        if not invoice.invoice_number_key:
+            return []
+        try:
+            gst_key = invoice.gst_number_key
+            query = DatabaseService._duplicate_candidates_query().filter(
+                Invoice.gst_number_key == gst_key if gst_key else Invoice.gst_number_key.is_(None),
+                Invoice.invoice_number_key == invoice.invoice_number_key,
+                Invoice.id != invoice.id
+            )
+            return [DatabaseService._duplicate_summary(inv) for inv in query.order_by(asc(Invoice.id)).limit(limit).all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Database error checking duplicates for invoice {invoice.id}: {str(e)}")
+            raise DatabaseError(f"Failed to check duplicates: {str(e)}")
+
+    @staticmethod
+    def get_possible_duplicates_map(invoices: List[Invoice]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Resolve possible duplicates for a page of invoices with a single indexed query.
+
+        Args:
+            invoices: Invoices on the current page
+
+        Returns:
+            Mapping of invoice ID to its list of duplicate summaries (empty when none)
+        """
+        result: Dict[int, List[Dict[str, Any]]] = {inv.id: [] for inv in invoices}
+        keys = {(inv.gst_number_key, inv.invoice_number_key) for inv in invoices if inv.invoice_number_key}
+        if not keys:
+            return result
+        try:
+            conditions = [
+                and_(
+                    Invoice.gst_number_key == gst_key if gst_key else Invoice.gst_number_key.is_(None),
+                    Invoice.invoice_number_key == inv_key
+                )
+                for gst_key, inv_key in keys
+            ]
+            by_key: Dict[Any, List[Invoice]] = {}
+            for candidate in DatabaseService._duplicate_candidates_query().filter(or_(*conditions)).order_by(asc(Invoice.id)).all():
+                by_key.setdefault((candidate.gst_number_key, candidate.invoice_number_key), []).append(candidate)
+            for inv in invoices:
+                matches = by_key.get((inv.gst_number_key, inv.invoice_number_key), [])
+                result[inv.id] = [DatabaseService._duplicate_summary(m) for m in matches if m.id != inv.id]
+            return result
+        except SQLAlchemyError as e:
+            logger.error(f"Database error checking duplicates for invoice page: {str(e)}")
+            raise DatabaseError(f"Failed to check duplicates: {str(e)}")
+
+    AMOUNT_FIELDS = {
+        'gst_percent', 'igst_amount', 'cgst_amount', 'sgst_amount', 'basic_amount', 'total_amount', 'tds',
+        'net_payable', 'amount_paid'
+    }
+
+    @staticmethod
+    def _coerce_field_value(field: str, value: Any, strict: bool = False) -> Any:
+        """
+        Convert an API value for an invoice field to the column's Python type.
+
+        Args:
+            field: Invoice attribute name
+            value: Value from the request payload
+            strict: Raise instead of falling back when the value cannot be converted
+
+        Returns:
+            The converted value; leniently, the original value (or None for paid_at) when conversion fails
+
+        Raises:
+            ValueError: In strict mode, if the value does not fit the field
+        """
+        try:
+            if field == 'invoice_date' and isinstance(value, str) and value:
+                # Accept ISO date or datetime string; use date component
+                return date.fromisoformat(value[:10])
+            if field in DatabaseService.AMOUNT_FIELDS and value not in (None, ''):
+                return float(value)
+            if field == 'selected_line_items':
+                # Compare in serialized form so unchanged selections are a no-op
+                return InvoiceLineItem.normalize_items(value)
+            if field == 'paid_at' and isinstance(value, str) and value:
+                try:
+                    # Accept ISO strings; handle trailing 'Z' as UTC
+                    iso_val = value.rstrip('Z') + ('+00:00' if value.endswith('Z') else '')
+                    return datetime.fromisoformat(iso_val)
+                except ValueError:
+                    if strict:
+                        raise
+                    return None
+        except Exception:
+            if strict:
+                raise ValueError(f'Invalid value for {field}')
+            # Fallback to original value if coercion fails; DB may reject invalid type
+            return value
+        if strict:
+            if value == '' and (field in DatabaseService.AMOUNT_FIELDS or field in ('invoice_date', 'paid_at')):
+                return None
+            if field in ('invoice_date', 'paid_at') and value is not None:
+                raise ValueError(f'Invalid value for {field}')
+        return value
+
+    @staticmethod
+    def update_invoice(invoice_id: int, update_data: Dict[str, Any], allow_workflow_fields: bool = False,
+                       before_commit: Optional[Callable[[Invoice], None]] = None) -> Optional[Invoice]:
         """
         Update invoice with new data.
         
         Args:
             invoice_id: Invoice ID
             update_data: Dictionary containing fields to update
+            before_commit: Called with the changed invoice just before the commit (not for no-op
+                updates), e.g. to add its audit entry to the same transaction
             
         Returns:
             Updated Invoice object or None if not found
@@ -134,32 +367,7 @@ class DatabaseService:
                 if field in processing_fields:
                     continue
                 if field in allowed_fields and hasattr(invoice, field):
-                    # Coerce common field types before assignment
-                    coerced = value
-                    try:
-                        if field == 'invoice_date' and isinstance(value, str) and value:
-                            # Accept ISO date or datetime string; use date component
-                            coerced = date.fromisoformat(value[:10])
-                        elif field in {'gst_percent','igst_amount','cgst_amount','sgst_amount','basic_amount','total_amount','tds','net_payable'} and value not in (None, ''):
-                            coerced = float(value)
-                        elif field == 'selected_line_items' and value is not None:
-                            import json as _json
-                            if isinstance(value, (list, dict)):
-                                coerced = _json.dumps(value)
-                        elif field in {'amount_paid'} and value not in (None, ''):
-                            coerced = float(value)
-                        elif field == 'paid_at' and isinstance(value, str) and value:
-                            try:
-                                # Accept ISO strings; handle trailing 'Z' as UTC
-                                iso_val = value.rstrip('Z') + ('+00:00' if value.endswith('Z') else '')
-                                from datetime import datetime as _dt
-                                coerced = _dt.fromisoformat(iso_val)
-                            except Exception:
-                                coerced = None
-                    except Exception:
-                        # Fallback to original value if coercion fails; DB may reject invalid type
-                        coerced = value
-
+                    coerced = DatabaseService._coerce_field_value(field, value)
                     if getattr(invoice, field) != coerced:
                         setattr(invoice, field, coerced)
                         changed = True
@@ -178,6 +386,8 @@ class DatabaseService:
                     )
                     service.move_to_permanent_storage(invoice)
                 
+                if before_commit:
+                    before_commit(invoice)
                 db.session.commit()
             else:
                 logger.info(f"No-op update for invoice {invoice_id}")
@@ -230,12 +440,86 @@ class DatabaseService:
             logger.error(f"Unexpected error deleting invoice {invoice_id}: {str(e)}")
             raise DatabaseError(f"Unexpected error deleting invoice: {str(e)}")
     
+    @staticmethod
+    def _filter_invoices(query, department_id, user_id, status, vendor_name, vendor_match,
+                         date_from, date_to, search, amount_min, amount_max, requesting_user_id):
+        """
+        The invoice list filters applied to query.
+
+        Returns:
+            (query, matches): matches is the full-text match subquery joined for search, else None
+        """
+        # Apply filters
+        if department_id:
+            query = query.filter(Invoice.department_id == department_id)
+        
+        if user_id:
+            query = query.filter(Invoice.uploaded_by == user_id)
+        
+        if status:
+            # Allow comma-separated statuses
+            if isinstance(status, str) and ',' in status:
+                statuses = [s.strip() for s in status.split(',') if s.strip()]
+                query = query.filter(Invoice.status.in_(statuses))
+            else:
+                query = query.filter(Invoice.status == status)
+        
+        if vendor_name:
+            from app import db
+            vendor_filter = VendorIndex.filter_clause(db.session, Invoice.vendor_name_norm, vendor_name, vendor_match)
+            if vendor_filter is not None:
+                query = query.filter(vendor_filter)
+        
+        if date_from:
+            query = query.filter(Invoice.invoice_date >= date_from)
+        
+        if date_to:
+            query = query.filter(Invoice.invoice_date <= date_to)
+
+        # Amount filtering
+        if amount_min is not None:
+            query = query.filter(Invoice.total_amount >= amount_min)
+        
+        if amount_max is not None:
+            query = query.filter(Invoice.total_amount <= amount_max)
+
+        # Generic search across invoice_number, vendor_name, GST, filename and extracted text
+        matches = None
+        if search:
+            from app import db
+            matches = SearchIndex.matches(db.session, search)
+            if matches is not None:
+                query = query.join(matches, matches.c.invoice_id == Invoice.id)
+            else:
+                # No full-text index on this backend (or no word terms): substring scan
+                like = f"%{search}%"
+                query = query.filter(
+                    or_(
+                        Invoice.invoice_number.ilike(like),
+                        Invoice.vendor_name.ilike(like),
+                        Invoice.gst_number.ilike(like),
+                        Invoice.filename.ilike(like)
+                    )
+                )
+        
+        # Hide unsaved extracted invoices from others by default
+        # Show is_saved==False only to the uploader
+        if requesting_user_id is not None:
+            query = query.filter(
+                or_(
+                    Invoice.is_saved.is_(True),
+                    Invoice.uploaded_by == requesting_user_id
+                )
+            )
+        return query, matches
+    
     @staticmethod
     def get_invoices_with_filters(
         department_id: Optional[int] = None,
         user_id: Optional[int] = None,
         status: Optional[str] = None,
         vendor_name: Optional[str] = None,
+        vendor_match: str = 'contains',
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
         search: Optional[str] = None,
@@ -245,116 +529,157 @@ class DatabaseService:
         per_page: int = 20,
         sort_by: str = 'created_at',
         sort_order: str = 'desc',
-        requesting_user_id: Optional[int] = None
+        requesting_user_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[List[str]] = None,
+        extra_columns: Iterable[str] = ()
     ) -> Dict[str, Any]:
         """
-        Get invoices with various filters and pagination.
+        Get invoices with various filters and keyset pagination on (sort_by, id).
         
         Args:
             department_id: Filter by department ID
             user_id: Filter by user ID
             status: Filter by status
-            vendor_name: Filter by vendor name (partial match)
+            vendor_name: Filter by vendor name, compared on its normalized form
+            vendor_match: 'contains' (default), 'exact' or 'fuzzy' (typo tolerant trigram match)
             date_from: Filter by invoice date from
             date_to: Filter by invoice date to
-            search: Generic search across invoice fields
+            search: Full-text prefix search across invoice fields and extracted text
             amount_min: Filter by minimum total amount
             amount_max: Filter by maximum total amount
-            page: Page number for pagination
+            page: Legacy page number, only used when no cursor is given
             per_page: Number of items per page
-            sort_by: Field to sort by
+            sort_by: Column to sort by, or 'relevance' to rank search matches; unknown names fall back to created_at
             sort_order: Sort order ('asc' or 'desc')
             requesting_user_id: User ID for access control
+            cursor: Opaque cursor from a previous page's next_cursor or prev_cursor
+            include_total: Also count the filtered invoices (total and pages are None otherwise)
+            fields: Sparse fieldset from Invoice.parse_fields; only the columns it needs are loaded
+            extra_columns: Further columns the caller reads from the rows when fields is given
             
         Returns:
             Dictionary containing invoices and pagination info
+
+        Raises:
+            ValidationError: If the cursor or vendor_match is invalid
         """
         try:
-            query = Invoice.query
-            
-            # Apply filters
-            if department_id:
-                query = query.filter(Invoice.department_id == department_id)
+            # Only real columns can be keyset-sorted; hasattr would also accept properties
+            sort_column = getattr(Invoice, sort_by) if sort_by in Invoice.__table__.columns else Invoice.created_at
             
-            if user_id:
-                query = query.filter(Invoice.uploaded_by == user_id)
-            
-            if status:
-                # Allow comma-separated statuses
-                if isinstance(status, str) and ',' in status:
-                    statuses = [s.strip() for s in status.split(',') if s.strip()]
-                    query = query.filter(Invoice.status.in_(statuses))
-                else:
-                    query = query.filter(Invoice.status == status)
+            # Everything to_dict touches is loaded up front so a page costs a fixed number of queries
+            query = Invoice.query.options(*DatabaseService._invoice_list_options(
+                fields, extra_columns=[*extra_columns, sort_column.key]
+            ))
             
-            if vendor_name:
-                query = query.filter(Invoice.vendor_name.ilike(f'%{vendor_name}%'))
-            
-            if date_from:
-                query = query.filter(Invoice.invoice_date >= date_from)
-            
-            if date_to:
-                query = query.filter(Invoice.invoice_date <= date_to)
-
-            # Amount filtering
-            if amount_min is not None:
-                query = query.filter(Invoice.total_amount >= amount_min)
-            
-            if amount_max is not None:
-                query = query.filter(Invoice.total_amount <= amount_max)
+            query, matches = DatabaseService._filter_invoices(
+                query, department_id, user_id, status, vendor_name, vendor_match,
+                date_from, date_to, search, amount_min, amount_max, requesting_user_id
+            )
 
-            # Generic search across invoice_number, vendor_name, GST, filename
-            if search:
-                like = f"%{search}%"
-                query = query.filter(
-                    or_(
-                        Invoice.invoice_number.ilike(like),
-                        Invoice.vendor_name.ilike(like),
-                        Invoice.gst_number.ilike(like),
-                        Invoice.filename.ilike(like)
-                    )
-                )
-            
-            # Hide unsaved extracted invoices from others by default
-            # Show is_saved==False only to the uploader
-            if requesting_user_id is not None:
-                query = query.filter(
-                    or_(
-                        Invoice.is_saved.is_(True),
-                        Invoice.uploaded_by == requesting_user_id
-                    )
-                )
+            if matches is not None and sort_by == 'relevance':
+                # Rank is computed per search, so relevance order pages by OFFSET
+                rows = query.order_by(matches.c.rank, Invoice.id).offset((max(page, 1) - 1) * per_page).limit(per_page + 1).all()
+                total = query.order_by(None).count() if include_total else None
+                return {
+                    'invoices': rows[:per_page],
+                    'total': total,
+                    'pages': math.ceil(total / per_page) if total is not None else None,
+                    'current_page': page,
+                    'per_page': per_page,
+                    'has_next': len(rows) > per_page,
+                    'has_prev': page > 1,
+                    'next_cursor': None,
+                    'prev_cursor': None
+                }
 
-            # Apply sorting
-            if hasattr(Invoice, sort_by):
-                sort_column = getattr(Invoice, sort_by)
-                if sort_order.lower() == 'desc':
-                    query = query.order_by(desc(sort_column))
-                else:
-                    query = query.order_by(asc(sort_column))
-            else:
-                query = query.order_by(desc(Invoice.created_at))
-            
-            # Apply pagination
-            pagination = query.paginate(
-                page=page, 
-                per_page=per_page, 
-                error_out=False
+            result = keyset_paginate(
+                query,
+                sort_column,
+                Invoice.id,
+                per_page,
+                cursor=cursor,
+                descending=sort_order.lower() == 'desc',
+                include_total=include_total,
+                page=page
             )
             
             return {
-                'invoices': pagination.items,
-                'total': pagination.total,
-                'pages': pagination.pages,
+                'invoices': result['items'],
+                'total': result['total'],
+                'pages': math.ceil(result['total'] / per_page) if result['total'] is not None else None,
                 'current_page': page,
                 'per_page': per_page,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'has_next': result['has_next'],
+                'has_prev': result['has_prev'],
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor']
             }
             
         except SQLAlchemyError as e:
             logger.error(f"Database error getting invoices with filters: {str(e)}")
             raise DatabaseError(f"Failed to get invoices: {str(e)}")
+    
+    @staticmethod
+    def iter_invoices_for_export(
+        department_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        vendor_name: Optional[str] = None,
+        vendor_match: str = 'contains',
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        search: Optional[str] = None,
+        amount_min: Optional[float] = None,
+        amount_max: Optional[float] = None,
+        sort_by: str = 'created_at',
+        sort_order: str = 'desc',
+        requesting_user_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Every invoice matching the get_invoices_with_filters filters as a get_invoice_data_dict
+        row. Only those columns are loaded, batch_size rows per round trip through a streaming
+        cursor, so memory does not grow with the number of invoices.
+
+        The query is built, and the filters validated, when this is called; only reading the
+        rows is deferred to the returned iterator. sort_by accepts what get_invoices_with_filters
+        does, including 'relevance' with a search.
+        
+        Raises:
+            ValidationError: If vendor_match is invalid
+            DatabaseError: If database operation fails (also raised while iterating)
+        """
+        from app import db
+        
+        try:
+            sort_column = getattr(Invoice, sort_by) if sort_by in Invoice.__table__.columns else Invoice.created_at
+            columns = [Invoice.id, *(getattr(Invoice, name) for name in Invoice.INVOICE_DATA_FIELDS.values())]
+            query, matches = DatabaseService._filter_invoices(
+                db.session.query(Invoice).options(load_only(*columns)), department_id, user_id, status,
+                vendor_name, vendor_match, date_from, date_to, search, amount_min, amount_max, requesting_user_id
+            )
+            if matches is not None and sort_by == 'relevance':
+                query = query.order_by(matches.c.rank, Invoice.id)
+            elif sort_order.lower() == 'desc':
+                query = query.order_by(sort_column.desc(), Invoice.id.desc())
+            else:
+                query = query.order_by(sort_column.asc(), Invoice.id.asc())
+        except SQLAlchemyError as e:
+            logger.error(f"Database error exporting invoices: {str(e)}")
+            raise DatabaseError(f"Failed to export invoices: {str(e)}")
+        return DatabaseService._invoice_export_rows(query, batch_size)
+
+    @staticmethod
+    def _invoice_export_rows(query, batch_size: int) -> Iterator[Dict[str, Any]]:
+        try:
+            for invoice in query.yield_per(batch_size):
+                yield invoice.get_invoice_data_dict()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error exporting invoices: {str(e)}")
+            raise DatabaseError(f"Failed to export invoices: {str(e)}")
 
     @staticmethod
     def get_finance_users() -> List[User]:
@@ -378,7 +703,8 @@ class DatabaseService:
             List of Invoice objects
         """
         try:
-            query = Invoice.query.filter(Invoice.department_id == department_id)
+            query = Invoice.query.options(*DatabaseService._invoice_list_options())\
+                .filter(Invoice.department_id == department_id)
             if status:
                 query = query.filter(Invoice.status == status)
             return query.order_by(desc(Invoice.created_at)).all()
@@ -399,7 +725,8 @@ class DatabaseService:
             List of Invoice objects
         """
         try:
-            query = Invoice.query.filter(Invoice.uploaded_by == user_id)
+            query = Invoice.query.options(*DatabaseService._invoice_list_options())\
+                .filter(Invoice.uploaded_by == user_id)
             if status:
                 query = query.filter(Invoice.status == status)
             return query.order_by(desc(Invoice.created_at)).all()
@@ -416,7 +743,8 @@ class DatabaseService:
             List of pending Invoice objects
         """
         try:
-            return Invoice.query.filter(Invoice.status == Invoice.STATUS_PENDING)\
+            return Invoice.query.options(*DatabaseService._invoice_list_options())\
+                .filter(Invoice.status == Invoice.STATUS_PENDING)\
                 .order_by(desc(Invoice.submitted_at)).all()
         except SQLAlchemyError as e:
             logger.error(f"Database error getting pending invoices: {str(e)}")
@@ -427,53 +755,13 @@ class DatabaseService:
         """
         Get invoice statistics.
         
+        Counts come from one GROUP BY query and the result is cached; see StatisticsService.
+        
         Returns:
             Dictionary containing various statistics
         """
-        try:
-            from app import db
-            
-            total_invoices = Invoice.query.count()
-            pending_invoices = Invoice.query.filter(Invoice.status == Invoice.STATUS_PENDING).count()
-            approved_invoices = Invoice.query.filter(Invoice.status == Invoice.STATUS_APPROVED).count()
-            rejected_invoices = Invoice.query.filter(Invoice.status == Invoice.STATUS_REJECTED).count()
-            
-            # Get total amount of approved invoices
-            total_amount_result = db.session.query(db.func.sum(Invoice.total_amount))\
-                .filter(Invoice.status == Invoice.STATUS_APPROVED)\
-                .scalar()
-            total_amount = float(total_amount_result) if total_amount_result else 0.0
-            
-            # Priority counts - only consider invoices that have been submitted
-            submitted_statuses = [Invoice.STATUS_PENDING, Invoice.STATUS_APPROVED, Invoice.STATUS_REJECTED]
-            high_count = Invoice.query.filter(Invoice.priority == 'high', Invoice.status.in_(submitted_statuses)).count()
-            med_count = Invoice.query.filter(Invoice.priority == 'medium', Invoice.status.in_(submitted_statuses)).count()
-            low_count = Invoice.query.filter(Invoice.priority == 'low', Invoice.status.in_(submitted_statuses)).count()
-
-            # Department summary
-            department_summary = DatabaseService.get_department_summary()
-
-            # Recent activity (last 10)
-            recent_activity = DatabaseService.get_recent_activity(limit=10)
-
-            return {
-                'total_invoices': total_invoices,
-                'pending_count': pending_invoices,
-                'approved_count': approved_invoices,
-                'rejected_count': rejected_invoices,
-                'total_amount': total_amount,
-                'priority_counts': {
-                    'high': high_count,
-                    'medium': med_count,
-                    'low': low_count
-                },
-                'department_summary': department_summary,
-                'recent_activity': recent_activity
-            }
-            
-        except SQLAlchemyError as e:
-            logger.error(f"Database error getting invoice statistics: {str(e)}")
-            raise DatabaseError(f"Failed to get invoice statistics: {str(e)}")
+        from services.statistics_service import StatisticsService
+        return StatisticsService.get_invoice_statistics()
     
     @staticmethod
     def get_user_by_id(user_id: int) -> Optional[User]:
@@ -536,14 +824,26 @@ class DatabaseService:
         """Aggregate invoice counts by department and status for dashboard."""
         try:
             from app import db
-            rows = db.session.query(
-                Department.name,
-                db.func.count(Invoice.id).label('count'),
-                db.func.sum(db.case((Invoice.status == Invoice.STATUS_APPROVED, 1), else_=0)).label('approved'),
-                db.func.sum(db.case((Invoice.status == Invoice.STATUS_PENDING, 1), else_=0)).label('pending'),
-                db.func.sum(db.case((Invoice.status == Invoice.STATUS_REJECTED, 1), else_=0)).label('rejected'),
-            ).outerjoin(Invoice, Department.id == Invoice.department_id)\
-            .group_by(Department.id, Department.name).all()
+            if InvoiceRollups.available(db.session):
+                # One row per (status, priority, month) bucket instead of one per invoice
+                count = InvoiceRollup.invoice_count
+                rows = db.session.query(
+                    Department.name,
+                    db.func.sum(count).label('count'),
+                    db.func.sum(db.case((InvoiceRollup.status == Invoice.STATUS_APPROVED, count), else_=0)).label('approved'),
+                    db.func.sum(db.case((InvoiceRollup.status == Invoice.STATUS_PENDING, count), else_=0)).label('pending'),
+                    db.func.sum(db.case((InvoiceRollup.status == Invoice.STATUS_REJECTED, count), else_=0)).label('rejected'),
+                ).outerjoin(InvoiceRollup, Department.id == InvoiceRollup.department_id)\
+                .group_by(Department.id, Department.name).all()
+            else:
+                rows = db.session.query(
+                    Department.name,
+                    db.func.count(Invoice.id).label('count'),
+                    db.func.sum(db.case((Invoice.status == Invoice.STATUS_APPROVED, 1), else_=0)).label('approved'),
+                    db.func.sum(db.case((Invoice.status == Invoice.STATUS_PENDING, 1), else_=0)).label('pending'),
+                    db.func.sum(db.case((Invoice.status == Invoice.STATUS_REJECTED, 1), else_=0)).label('rejected'),
+                ).outerjoin(Invoice, Department.id == Invoice.department_id)\
+                .group_by(Department.id, Department.name).all()
 
             return [
                 {
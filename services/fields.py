@@ -42,4 +42,9 @@ ALLOWED_INVOICE_WORKFLOW_FIELDS = {
     'priority',
 }
 
+# Fields the batch edit endpoint may set with set-based UPDATEs: plain columns only,
+# so line item selections and file locations remain single-invoice edits
+BATCH_INVOICE_UPDATE_FIELDS = (ALLOWED_INVOICE_UPDATE_FIELDS - {'selected_line_items', 'filename', 'file_path'}) | {'priority'}
 
+# Payment fields Finance & Super Admin may change on invoices in any status
+PAYMENT_FIELDS = {'payment_status', 'amount_paid', 'paid_at'}
@@ -0,0 +1,272 @@
+"""
+Incrementally maintained invoice rollups.
+invoice_rollups holds invoice counts and amount totals per (department, status,
+priority, created month) bucket. The session's after_flush hook turns every
+invoice insert, delete and change of a bucketed column into +1/-1 deltas and
+upserts them in the same transaction, so dashboard reads cost one row per bucket
+instead of one per invoice.
+"""
+
+import logging
+import weakref
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from utils.date_buckets import GRANULARITY_MONTH, period_start, period_start_expression
+
+logger = logging.getLogger(__name__)
+
+BucketKey = Tuple[int, str, str, date]
+
+
+class InvoiceRollups:
+    """Maintains, rebuilds and checks the invoice_rollups table."""
+
+    TABLE = 'invoice_rollups'
+    KEY_FIELDS = ('department_id', 'status', 'priority', 'month')
+    # Invoice attributes a rollup bucket is derived from
+    INVOICE_FIELDS = ('department_id', 'status', 'priority', 'created_at', 'total_amount')
+    # Float sums drift slightly under repeated +/- deltas
+    AMOUNT_TOLERANCE = 0.005
+
+    _available = weakref.WeakKeyDictionary()
+
+    _rollups = sa.table(
+        TABLE,
+        sa.column('department_id', sa.Integer),
+        sa.column('status', sa.String),
+        sa.column('priority', sa.String),
+        sa.column('month', sa.Date),
+        sa.column('invoice_count', sa.Integer),
+        sa.column('total_amount', sa.Float),
+    )
+    _invoices = sa.table(
+        'invoices',
+        sa.column('id', sa.Integer),
+        sa.column('department_id', sa.Integer),
+        sa.column('status', sa.String),
+        sa.column('priority', sa.String),
+        sa.column('created_at', sa.DateTime),
+        sa.column('total_amount', sa.Float),
+    )
+
+    @classmethod
+    def exists(cls, connection) -> bool:
+        """Whether the rollup table is present; cached per engine."""
+        engine = connection.engine
+        if engine not in cls._available:
+            cls._available[engine] = inspect(connection).has_table(cls.TABLE)
+        return cls._available[engine]
+
+    @classmethod
+    def available(cls, session) -> bool:
+        return cls.exists(session.connection())
+
+    @classmethod
+    def aggregate(cls, connection) -> Dict[BucketKey, Tuple[int, float]]:
+        """Bucket totals computed from the invoices table itself."""
+        inv = cls._invoices
+        month = period_start_expression(inv.c.created_at, GRANULARITY_MONTH, connection.dialect.name)
+        rows = connection.execute(
+            sa.select(
+                inv.c.department_id, inv.c.status, inv.c.priority, month.label('month'),
+                sa.func.count(inv.c.id), sa.func.coalesce(sa.func.sum(inv.c.total_amount), 0.0),
+            )
+            .where(inv.c.created_at.isnot(None))
+            .group_by(inv.c.department_id, inv.c.status, inv.c.priority, month)
+        ).fetchall()
+        return {
+            (department_id, status, priority, period_start(month_value, GRANULARITY_MONTH)): (count, float(amount or 0.0))
+            for department_id, status, priority, month_value, count, amount in rows
+        }
+
+    @classmethod
+    def rebuild(cls, connection) -> int:
+        """Replace every rollup row with totals recomputed from invoices. Returns the number of buckets."""
+        buckets = cls.aggregate(connection)
+        connection.execute(cls._rollups.delete())
+        if buckets:
+            connection.execute(cls._rollups.insert(), [
+                dict(zip(cls.KEY_FIELDS, key), invoice_count=count, total_amount=amount)
+                for key, (count, amount) in buckets.items()
+            ])
+        cls._available[connection.engine] = True
+        return len(buckets)
+
+    @classmethod
+    def check(cls, connection) -> List[Dict]:
+        """
+        Compare the rollup table with totals recomputed from invoices.
+
+        Returns:
+            One dictionary per inconsistent bucket with the expected and stored count and amount
+        """
+        expected = cls.aggregate(connection)
+        r = cls._rollups
+        stored = {
+            (department_id, status, priority, period_start(month, GRANULARITY_MONTH)): (count, float(amount or 0.0))
+            for department_id, status, priority, month, count, amount in connection.execute(
+                sa.select(r.c.department_id, r.c.status, r.c.priority, r.c.month, r.c.invoice_count, r.c.total_amount)
+            )
+        }
+        mismatches = []
+        for key in sorted(set(expected) | set(stored), key=str):
+            expected_count, expected_amount = expected.get(key, (0, 0.0))
+            stored_count, stored_amount = stored.get(key, (0, 0.0))
+            if expected_count != stored_count or abs(expected_amount - stored_amount) > cls.AMOUNT_TOLERANCE:
+                department_id, status, priority, month = key
+                mismatches.append(dict(
+                    department_id=department_id, status=status, priority=priority, month=month.isoformat(),
+                    expected_count=expected_count, stored_count=stored_count,
+                    expected_amount=round(expected_amount, 2), stored_amount=round(stored_amount, 2),
+                ))
+        return mismatches
+
+    @classmethod
+    def ensure(cls, engine) -> bool:
+        """Fill the rollup table if it exists but is empty while invoices are not."""
+        with engine.begin() as connection:
+            cls._available.pop(engine, None)
+            if not cls.exists(connection):
+                return False
+            has_rollups = connection.execute(sa.select(cls._rollups.c.department_id).limit(1)).first()
+            has_invoices = connection.execute(sa.select(cls._invoices.c.id).limit(1)).first()
+            if has_invoices and not has_rollups:
+                cls.rebuild(connection)
+        return True
+
+    @classmethod
+    def apply(cls, connection, deltas: Dict[BucketKey, Tuple[int, float]]) -> None:
+        """Add (count, amount) deltas to their buckets, creating missing ones."""
+        rows = [
+            dict(zip(cls.KEY_FIELDS, key), invoice_count=count, total_amount=amount)
+            for key, (count, amount) in deltas.items() if count or amount
+        ]
+        if not rows:
+            return
+        r = cls._rollups
+        dialect = connection.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(r)
+            connection.execute(
+                insert.on_conflict_do_update(
+                    index_elements=list(cls.KEY_FIELDS),
+                    set_={
+                        'invoice_count': r.c.invoice_count + insert.excluded.invoice_count,
+                        'total_amount': r.c.total_amount + insert.excluded.total_amount,
+                    }
+                ),
+                rows
+            )
+            return
+        for row in rows:
+            match = sa.and_(*[r.c[name] == row[name] for name in cls.KEY_FIELDS])
+            result = connection.execute(
+                r.update().where(match).values(
+                    invoice_count=r.c.invoice_count + row['invoice_count'],
+                    total_amount=r.c.total_amount + row['total_amount'],
+                )
+            )
+            if not result.rowcount:
+                connection.execute(r.insert(), [row])
+
+    @classmethod
+    def apply_changes(cls, connection, changes: Iterable[Tuple[Optional[Mapping], Optional[Mapping]]]) -> None:
+        """
+        Move invoices between buckets for writes that bypass the flush hook, e.g. set-based UPDATEs.
+
+        Args:
+            connection: Connection of the transaction that made the writes
+            changes: (old, new) INVOICE_FIELDS values per invoice; old is None for inserts, new for deletes
+        """
+        if not cls.exists(connection):
+            return
+        deltas: Dict[BucketKey, List] = {}
+        for old, new in changes:
+            for values, sign in ((old, -1), (new, 1)):
+                bucket = _bucket(values) if values is not None else None
+                if bucket is None:
+                    continue
+                key, amount = bucket
+                delta = deltas.setdefault(key, [0, 0.0])
+                delta[0] += sign
+                delta[1] += sign * amount
+        cls.apply(connection, {key: (count, amount) for key, (count, amount) in deltas.items()})
+
+    @classmethod
+    def register(cls, session) -> None:
+        """Keep the rollups in step with invoice writes made through session."""
+        from models.invoice import Invoice
+
+        if event.contains(session, 'after_flush', _apply_after_flush):
+            return
+        # Load the previous value on assignment, even on expired instances, so the old bucket is known
+        for name in cls.INVOICE_FIELDS:
+            event.listen(getattr(Invoice, name), 'set', _keep_old_value, active_history=True)
+        event.listen(session, 'before_flush', _load_deleted_before_flush)
+        event.listen(session, 'after_flush', _apply_after_flush)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _bucket(values) -> Optional[Tuple[BucketKey, float]]:
+    month = period_start(values['created_at'], GRANULARITY_MONTH)
+    if month is None or values['department_id'] is None:
+        return None
+    key = (values['department_id'], values['status'], values['priority'], month)
+    return key, float(values['total_amount'] or 0.0)
+
+
+def _load_deleted_before_flush(session, flush_context, instances):
+    from models.invoice import Invoice
+
+    # Deleted rows cannot be loaded after the flush; read their bucket columns now
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            for name in InvoiceRollups.INVOICE_FIELDS:
+                getattr(obj, name)
+
+
+def _apply_after_flush(session, flush_context):
+    from models.invoice import Invoice
+
+    connection = session.connection()
+    if not InvoiceRollups.exists(connection):
+        return
+
+    def values(obj):
+        return {name: getattr(obj, name) for name in InvoiceRollups.INVOICE_FIELDS}
+
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            changes.append((None, values(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            state = inspect(obj)
+            old = {}
+            for name in InvoiceRollups.INVOICE_FIELDS:
+                history = state.attrs[name].history
+                old[name] = history.deleted[0] if history.deleted else state.dict.get(name)
+            changes.append((old, None))
+    for obj in session.dirty:
+        if not isinstance(obj, Invoice) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        histories = {name: state.attrs[name].history for name in InvoiceRollups.INVOICE_FIELDS}
+        if not any(h.has_changes() for h in histories.values()):
+            continue
+        old = {
+            name: h.deleted[0] if h.deleted else (h.unchanged[0] if h.unchanged else getattr(obj, name))
+            for name, h in histories.items()
+        }
+        changes.append((old, values(obj)))
+
+    if changes:
+        InvoiceRollups.apply_changes(connection, changes)
@@ -5,7 +5,7 @@ Handles PDF uploads, extraction, validation, and database operations.
 
 import os
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable
 from datetime import datetime, date
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
@@ -17,6 +17,7 @@ from required_fields import REQUIRED_FIELDS
 from models.invoice import Invoice
 from models.user import User
 from models.department import Department
+from services.database_service import DatabaseService
 from utils.file_utils import FileUtils
 from utils.exceptions import InvoiceProcessingError, FileValidationError
 
@@ -35,7 +36,8 @@ class InvoiceService:
         file: FileStorage, 
         user: User, 
         department_id: int,
-        model: str = "gpt-4o-mini"
+        model: str = "gpt-4o-mini",
+        progress: Optional[Callable[..., None]] = None
     ) -> Dict[str, Any]:
         """
         Process an uploaded PDF invoice file.
@@ -45,9 +47,11 @@ class InvoiceService:
             user: User who uploaded the file
             department_id: Department ID for the invoice
             model: OpenAI model to use for extraction
+            progress: Optional callback receiving (stage, **data) extraction events
             
         Returns:
-            Dict containing processed invoice data and metadata
+            Dict containing processed invoice data and metadata, or
+            {'__duplicate_of__': Invoice} when the same file was already uploaded
             
         Raises:
             FileValidationError: If file validation fails
@@ -57,65 +61,158 @@ class InvoiceService:
             # Validate file
             self._validate_upload(file)
             
+            # Short-circuit re-uploads of a file we already have (indexed hash lookup)
+            content_sha256 = self.file_utils.compute_sha256(file)
+            existing = DatabaseService.get_invoice_by_content_hash(content_sha256, requesting_user_id=user.id)
+            if existing:
+                logger.info(f"Upload by user {user.id} matches existing invoice {existing.id} by content hash")
+                if progress:
+                    progress('duplicate', invoice_id=existing.id)
+                return {'__duplicate_of__': existing}
+            
             # Generate secure filename and save to temporary storage
             filename = secure_filename(file.filename)
             file_path = self.file_utils.save_to_temp_storage(
                 file, filename, user.id
             )
             
-            # Extract invoice data using existing logic
-            extracted_data = self._extract_invoice_data(file_path, model)
-            
-            # Process and validate extracted data (DB payload)
-            processed_data = self._process_extracted_data(extracted_data, filename)
-            # Add metadata to DB payload
-            processed_data.update({
-                'file_path': file_path,
-                'extraction_method': 'openai',
-                'extraction_confidence': 0.95,
-                'raw_text': extracted_data.get('raw_text', ''),
-                'department_id': department_id,
-                'uploaded_by': user.id
-            })
-
-            # Build API payload snapshot from extracted_data (uppercase canonical keys)
-            # Ensure we keep line_items and raw_text for FE multi-line display
-            # Build safe API payload without circular references
-            src = extracted_data or {}
-            rows = src.get('line_items') or []
-            safe_rows = []
-            try:
-                for it in rows:
-                    if isinstance(it, dict):
-                        item_copy = dict(it)
-                        # Remove potential nested reference to line_items to avoid cycles
-                        item_copy.pop('line_items', None)
-                        safe_rows.append(item_copy)
-                    else:
-                        safe_rows.append(it)
-            except Exception:
-                safe_rows = []
-
-            processed_data_api = {k: v for k, v in src.items() if k != 'line_items'}
-            processed_data_api['line_items'] = safe_rows
-            processed_data_api['raw_text'] = src.get('raw_text', '')
-            # Optionally merge a few lowercase DB fields for FE convenience (without overriding uppercase)
-            for k in ['invoice_number','vendor_name','total_amount','gst_number','invoice_date','filename']:
-                if k not in processed_data_api and k in processed_data:
-                    processed_data_api[k] = processed_data.get(k)
-
-            # Return DB payload by default for backward compatibility
-            # Callers that need API snapshot can access via tuple (db_payload, api_payload)
-            return {
-                '__db_payload__': processed_data,
-                '__api_payload__': processed_data_api
-            }
+            return self._process_saved_file(file_path, filename, content_sha256, user, department_id, model, progress)
             
         except Exception as e:
             fname = getattr(file, 'filename', '<unknown>')
             logger.error(f"Error processing invoice {fname}: {str(e)}")
+            if progress:
+                progress('failed', error=str(e))
+            raise InvoiceProcessingError(f"Failed to process invoice: {str(e)}")
+    
+    def process_stored_invoice(
+        self,
+        file_path: str,
+        filename: str,
+        user: User,
+        department_id: int,
+        model: str = "gpt-4o-mini",
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a PDF that has already been written to temporary storage,
+        e.g. one assembled from a chunked upload.
+        
+        Args:
+            file_path: Path of the stored PDF under the user's temp folder
+            filename: Original filename
+            user: User who uploaded the file
+            department_id: Department ID for the invoice
+            model: OpenAI model to use for extraction
+            progress: Optional callback receiving (stage, **data) extraction events
+            
+        Returns:
+            Same shape as process_uploaded_invoice
+            
+        Raises:
+            FileValidationError: If file validation fails
+            InvoiceProcessingError: If processing fails
+        """
+        try:
+            self._validate_stored_file(file_path, filename)
+            
+            content_sha256 = self.file_utils.compute_sha256(file_path)
+            existing = DatabaseService.get_invoice_by_content_hash(content_sha256, requesting_user_id=user.id)
+            if existing:
+                logger.info(f"Upload by user {user.id} matches existing invoice {existing.id} by content hash")
+                self.file_utils.cleanup_temp_file(file_path)
+                if progress:
+                    progress('duplicate', invoice_id=existing.id)
+                return {'__duplicate_of__': existing}
+            
+            return self._process_saved_file(
+                file_path, secure_filename(filename), content_sha256, user, department_id, model, progress
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing stored invoice {filename}: {str(e)}")
+            if progress:
+                progress('failed', error=str(e))
             raise InvoiceProcessingError(f"Failed to process invoice: {str(e)}")
     
+    def _process_saved_file(
+        self,
+        file_path: str,
+        filename: str,
+        content_sha256: str,
+        user: User,
+        department_id: int,
+        model: str,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """Run extraction on a saved file and build the DB and API payloads."""
+        # Extract invoice data using existing logic
+        extracted_data = self._extract_invoice_data(file_path, model, progress)
+        
+        # Process and validate extracted data (DB payload)
+        processed_data = self._process_extracted_data(extracted_data, filename)
+        # Add metadata to DB payload
+        processed_data.update({
+            'file_path': file_path,
+            'content_sha256': content_sha256,
+            'extraction_method': 'openai',
+            'extraction_confidence': 0.95,
+            'raw_text': extracted_data.get('raw_text', ''),
+            'department_id': department_id,
+            'uploaded_by': user.id
+        })
+
+        # Build API payload snapshot from extracted_data (uppercase canonical keys)
+        # Ensure we keep line_items and raw_text for FE multi-line display
+        # Build safe API payload without circular references
+        src = extracted_data or {}
+        rows = src.get('line_items') or []
+        safe_rows = []
+        try:
+            for it in rows:
+                if isinstance(it, dict):
+                    item_copy = dict(it)
+                    # Remove potential nested reference to line_items to avoid cycles
+                    item_copy.pop('line_items', None)
+                    safe_rows.append(item_copy)
+                else:
+                    safe_rows.append(it)
+        except Exception:
+            safe_rows = []
+
+        processed_data_api = {k: v for k, v in src.items() if k != 'line_items'}
+        processed_data_api['line_items'] = safe_rows
+        processed_data_api['raw_text'] = src.get('raw_text', '')
+        # Optionally merge a few lowercase DB fields for FE convenience (without overriding uppercase)
+        for k in ['invoice_number','vendor_name','total_amount','gst_number','invoice_date','filename']:
+            if k not in processed_data_api and k in processed_data:
+                processed_data_api[k] = processed_data.get(k)
+
+        # Return DB payload by default for backward compatibility
+        # Callers that need API snapshot can access via tuple (db_payload, api_payload)
+        return {
+            '__db_payload__': processed_data,
+            '__api_payload__': processed_data_api
+        }
+    
+    def _validate_stored_file(self, file_path: str, filename: str) -> None:
+        """Validate a file already on disk without reading it into memory."""
+        if not file_path or not os.path.exists(file_path):
+            raise FileValidationError("No file provided")
+        
+        file_size = os.path.getsize(file_path)
+        if file_size > self.max_file_size:
+            raise FileValidationError(f"File too large. Maximum size: {self.max_file_size} bytes")
+        
+        if file_size == 0:
+            raise FileValidationError("Empty file")
+        
+        if not self.file_utils.is_allowed_file(filename):
+            raise FileValidationError("Invalid file type. Only PDF files are allowed.")
+        
+        if not self.file_utils.validate_file_integrity(file_path):
+            raise FileValidationError("Invalid PDF file. File appears to be corrupted or not a valid PDF.")
+    
     def _validate_upload(self, file: FileStorage) -> None:
         """Validate uploaded file."""
         if not file or not file.filename:
@@ -170,13 +267,19 @@ class InvoiceService:
             except OSError:
                 pass
     
-    def _extract_invoice_data(self, file_path: str, model: str) -> Dict[str, Any]:
+    def _extract_invoice_data(
+        self,
+        file_path: str,
+        model: str,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
         """
         Extract invoice data using the existing extraction pipeline.
         
         Args:
             file_path: Path to the PDF file
             model: OpenAI model to use
+            progress: Optional callback passed through to the extraction pipeline
             
         Returns:
             Dict containing extracted invoice data
@@ -217,7 +320,7 @@ class InvoiceService:
                 # Skip OCR, use only PyMuPDF text extraction
                 logger.info("OCR disabled, using PyMuPDF text extraction only")
             
-            extracted_rows, full_text = process_pdf(file_path, model=model, use_ocr=ocr_enabled)
+            extracted_rows, full_text = process_pdf(file_path, model=model, use_ocr=ocr_enabled, progress=progress)
             
             # Check if extraction returned valid data
             if not extracted_rows or not isinstance(extracted_rows, list) or len(extracted_rows) == 0:
@@ -369,6 +472,7 @@ class InvoiceService:
                 department_id=data['department_id'],
                 uploaded_by=data['uploaded_by'],
                 file_path=data.get('file_path'),
+                content_sha256=data.get('content_sha256'),
                 s_no=data.get('s_no'),
                 invoice_date=data.get('invoice_date'),
                 invoice_number=data.get('invoice_number'),
@@ -439,29 +543,35 @@ class InvoiceService:
             logger.error(f"Error updating invoice {invoice.id}: {str(e)}")
             raise InvoiceProcessingError(f"Failed to update invoice: {str(e)}")
     
-    def delete_invoice(self, invoice: Invoice) -> bool:
+    def delete_invoice(self, invoice: Invoice, before_commit: Optional[Callable[[Invoice], None]] = None) -> bool:
         """
         Delete invoice and associated file.
         
         Args:
             invoice: Invoice object to delete
+            before_commit: Called with the invoice just before the commit, e.g. to add its
+                deletion audit entry to the same transaction
             
         Returns:
             True if successful
         """
         try:
-            # Delete associated file if it exists
-            if invoice.file_path and os.path.exists(invoice.file_path):
-                os.remove(invoice.file_path)
-            
-            # Delete from database
             from app import db
+            file_path = invoice.file_path
+            if before_commit:
+                before_commit(invoice)
             db.session.delete(invoice)
             db.session.commit()
             
+            # The file goes once the row is gone, so a failed commit leaves both in place
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+            
             return True
             
         except Exception as e:
+            from app import db
+            db.session.rollback()
             logger.error(f"Error deleting invoice {invoice.id}: {str(e)}")
             raise InvoiceProcessingError(f"Failed to delete invoice: {str(e)}")
     
@@ -484,6 +594,7 @@ class InvoiceService:
         """
         Move invoice file from temporary to permanent storage.
         This should be called when invoice status changes to draft or above.
+        The new file_path is not committed here.
         
         Args:
             invoice: Invoice object
@@ -510,10 +621,8 @@ class InvoiceService:
                 invoice.uploaded_by
             )
             
-            # Update invoice file_path in database
-            from app import db
+            # Committed by the caller, together with the change that triggered the move
             invoice.file_path = permanent_path
-            db.session.commit()
             
             return True
             
@@ -4,12 +4,15 @@ Provides helpers to create and manage notifications for invoice workflow events.
 """
 
 import logging
+import math
 from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import joinedload
 
 from models.notification import Notification
 from models.user import User
 from models.invoice import Invoice
 from services.database_service import DatabaseService
+from utils.pagination import keyset_paginate
 
 logger = logging.getLogger(__name__)
 
@@ -74,21 +77,30 @@ class NotificationService:
             return []
 
     @staticmethod
-    def get_user_notifications(user_id: int, only_unread: bool = False, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Get notifications for a user with optional unread filter and pagination."""
+    def get_user_notifications(user_id: int, only_unread: bool = False, page: int = 1, per_page: int = 20,
+                               cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+        """Get notifications for a user with optional unread filter and keyset pagination on (created_at, id)."""
         try:
-            query = Notification.query.filter(Notification.user_id == user_id)
+            # to_dict reads invoice.invoice_number; fetch it in the same SELECT
+            query = Notification.query.options(
+                joinedload(Notification.invoice).load_only(Invoice.id, Invoice.invoice_number)
+            ).filter(Notification.user_id == user_id)
             if only_unread:
                 query = query.filter(Notification.is_read.is_(False))
-            pagination = query.order_by(Notification.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+            result = keyset_paginate(
+                query, Notification.created_at, Notification.id, per_page,
+                cursor=cursor, include_total=include_total, page=page
+            )
             return {
-                'notifications': [n.to_dict() for n in pagination.items],
-                'total': pagination.total,
-                'pages': pagination.pages,
+                'notifications': [n.to_dict() for n in result['items']],
+                'total': result['total'],
+                'pages': math.ceil(result['total'] / per_page) if result['total'] is not None else None,
                 'current_page': page,
                 'per_page': per_page,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'has_next': result['has_next'],
+                'has_prev': result['has_prev'],
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor']
             }
         except Exception as e:
             logger.error(f"Failed to get notifications for user {user_id}: {str(e)}")
@@ -0,0 +1,165 @@
+"""
+Extraction progress events for upload jobs.
+Events are appended to a small JSON-lines file per job under UPLOAD_FOLDER/progress, so the
+request doing the extraction and the request streaming progress may run in different workers.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+_JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class ProgressService:
+    """Service for recording and reading per-job extraction stage events."""
+
+    STAGE_RECEIVED = 'received'
+    STAGE_TEXT_LAYER_READ = 'text_layer_read'
+    STAGE_OCR_PAGE = 'ocr_page'
+    STAGE_LLM_REQUESTED = 'llm_requested'
+    STAGE_LLM_DONE = 'llm_done'
+    STAGE_PERSISTED = 'persisted'
+    STAGE_DUPLICATE = 'duplicate'
+    STAGE_FAILED = 'failed'
+
+    TERMINAL_STAGES = {STAGE_PERSISTED, STAGE_DUPLICATE, STAGE_FAILED}
+
+    def __init__(self, upload_folder: str):
+        self.progress_folder = os.path.join(upload_folder, 'progress')
+
+    @staticmethod
+    def is_valid_job_id(job_id: Optional[str]) -> bool:
+        return bool(job_id) and bool(_JOB_ID_PATTERN.match(job_id))
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.progress_folder, f"{job_id}.jsonl")
+
+    def exists(self, job_id: str) -> bool:
+        return self.is_valid_job_id(job_id) and os.path.exists(self._job_path(job_id))
+
+    def start(self, job_id: str, user_id: int) -> None:
+        """
+        Create the event log for a job; the first event records its owner.
+
+        Raises:
+            FileExistsError: If a log for job_id already exists. Job ids come from clients, so
+                an existing log is never truncated: it may be another user's, or still streaming.
+        """
+        os.makedirs(self.progress_folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.progress_folder, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'stage': self.STAGE_RECEIVED, 'ts': time.time(), 'user_id': user_id}) + '\n')
+            # link() publishes the log with its owner line already in place, and fails if it exists
+            os.link(tmp_path, self._job_path(job_id))
+        finally:
+            os.remove(tmp_path)
+
+    def emit(self, job_id: str, stage: str, **data) -> None:
+        """Append one event. Each event is a single short line written in one call."""
+        event = {'stage': stage, 'ts': time.time()}
+        event.update(data)
+        with open(self._job_path(job_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, default=str) + '\n')
+
+    def reporter(self, job_id: Optional[str], user_id: int) -> Optional[Callable[..., None]]:
+        """
+        Start a job and return a callback for the extraction pipeline.
+
+        Args:
+            job_id: Client-chosen job identifier, or None if progress was not requested
+            user_id: ID of the user that owns the job
+
+        Returns:
+            Callable taking (stage, **data), or None when job_id is missing or invalid.
+            The callback never raises so progress reporting cannot break an upload.
+
+        Raises:
+            FileExistsError: If job_id is already in use
+        """
+        if not self.is_valid_job_id(job_id):
+            return None
+        try:
+            self.start(job_id, user_id)
+        except FileExistsError:
+            logger.warning(f"User {user_id} reused progress job id {job_id}")
+            raise
+        except OSError as e:
+            logger.warning(f"Could not start progress log for job {job_id}: {str(e)}")
+            return None
+
+        def report(stage: str, **data) -> None:
+            try:
+                self.emit(job_id, stage, **data)
+            except Exception as e:
+                logger.warning(f"Could not record progress event {stage} for job {job_id}: {str(e)}")
+
+        return report
+
+    def get_owner(self, job_id: str) -> Optional[int]:
+        """Return the user_id recorded when the job started."""
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.loads(f.readline()).get('user_id')
+        except (OSError, ValueError):
+            return None
+
+    def read_events(self, job_id: str, offset: int = 0) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        Read complete events written after a byte offset.
+
+        Args:
+            job_id: Job identifier
+            offset: Byte offset returned by the previous call
+
+        Returns:
+            Tuple of ([(offset after event, event), ...], new offset)
+        """
+        events = []
+        try:
+            with open(self._job_path(job_id), 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    # A line without its newline is still being written; pick it up next time
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        events.append((offset, json.loads(line)))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return events, offset
+
+    def cleanup_old_jobs(self, hours_threshold: int = 24) -> int:
+        """
+        Remove event logs older than the threshold.
+
+        Args:
+            hours_threshold: Age in hours after which a job log is removed
+
+        Returns:
+            Number of job logs removed
+        """
+        if not os.path.isdir(self.progress_folder):
+            return 0
+        cutoff = (datetime.now() - timedelta(hours=hours_threshold)).timestamp()
+        removed = 0
+        for name in os.listdir(self.progress_folder):
+            path = os.path.join(self.progress_folder, name)
+            try:
+                if name.endswith('.jsonl') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove progress log {path}: {str(e)}")
+        return removed
@@ -0,0 +1,272 @@
+"""
+Full-text search index over invoices.
+SQLite uses an FTS5 virtual table keyed by invoice id, PostgreSQL a tsvector
+table with a GIN index. Index rows are written from the session's after_flush
+hook, in the same transaction as the invoice change.
+"""
+
+import logging
+import re
+import weakref
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndex:
+    """Backend-specific full-text index for invoice search."""
+
+    TABLE = 'invoice_search'
+    FIELDS = ('invoice_number', 'vendor_name', 'gst_number', 'filename')
+    # bm25 column weights for FTS5, in FIELDS order followed by the extracted text
+    SQLITE_WEIGHTS = (10.0, 5.0, 10.0, 2.0, 1.0)
+    DEFAULT_MAX_TEXT_CHARS = 100000
+    MAX_QUERY_TERMS = 8
+    BATCH_SIZE = 500
+
+    # engine -> whether the index table exists there; checked once per engine
+    _available = weakref.WeakKeyDictionary()
+
+    _invoices = sa.table(
+        'invoices', *[sa.column(name) for name in ('id',) + FIELDS]
+    )
+    _invoice_texts = sa.table('invoice_texts', sa.column('invoice_id'), sa.column('content'))
+
+    @staticmethod
+    def supports(dialect_name: str) -> bool:
+        return dialect_name in ('sqlite', 'postgresql')
+
+    @classmethod
+    def create(cls, connection) -> bool:
+        """
+        Create the index table if it does not exist.
+
+        Returns:
+            True if the index exists afterwards, False if the backend cannot provide one
+        """
+        dialect = connection.dialect.name
+        if not cls.supports(dialect):
+            return False
+        try:
+            if dialect == 'sqlite':
+                connection.exec_driver_sql(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {cls.TABLE} USING fts5("
+                    f"{', '.join(cls.FIELDS)}, body, tokenize='unicode61 remove_diacritics 2')"
+                )
+            else:
+                connection.exec_driver_sql(
+                    f"CREATE TABLE IF NOT EXISTS {cls.TABLE} ("
+                    "invoice_id INTEGER PRIMARY KEY REFERENCES invoices(id) ON DELETE CASCADE, "
+                    "document TSVECTOR NOT NULL)"
+                )
+                connection.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS ix_{cls.TABLE}_document ON {cls.TABLE} USING GIN (document)"
+                )
+        except OperationalError as e:
+            # SQLite builds without FTS5
+            logger.warning(f"Full-text search index unavailable: {str(e)}")
+            return False
+        cls._available[connection.engine] = True
+        return True
+
+    @classmethod
+    def drop(cls, connection) -> None:
+        if cls.supports(connection.dialect.name):
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {cls.TABLE}")
+        cls._available[connection.engine] = False
+
+    @classmethod
+    def exists(cls, connection) -> bool:
+        """Whether the index table is present; cached per engine."""
+        engine = connection.engine
+        if engine not in cls._available:
+            cls._available[engine] = cls.supports(connection.dialect.name) and inspect(connection).has_table(cls.TABLE)
+        return cls._available[engine]
+
+    @classmethod
+    def ensure(cls, engine, include_text: bool = True) -> bool:
+        """Create the index on engine and fill it from existing invoices if it was missing."""
+        with engine.begin() as connection:
+            cls._available.pop(engine, None)
+            if cls.exists(connection):
+                return True
+            if not cls.create(connection):
+                return False
+            cls.rebuild(connection, include_text=include_text)
+        return True
+
+    @classmethod
+    def _load_documents(cls, connection, invoice_ids: Iterable[int], include_text: bool, max_text_chars: int) -> List[Dict]:
+        """Read the indexed fields (and optionally the decompressed text) for invoice_ids."""
+        invoice_ids = list(invoice_ids)
+        if not invoice_ids:
+            return []
+        columns = [cls._invoices.c.id] + [cls._invoices.c[name] for name in cls.FIELDS]
+        stmt = sa.select(*columns)
+        if include_text:
+            stmt = stmt.add_columns(cls._invoice_texts.c.content).select_from(
+                cls._invoices.outerjoin(cls._invoice_texts, cls._invoice_texts.c.invoice_id == cls._invoices.c.id)
+            )
+        rows = connection.execute(stmt.where(cls._invoices.c.id.in_(invoice_ids))).mappings()
+        documents = []
+        for row in rows:
+            body = ''
+            if include_text and row['content']:
+                body = zlib.decompress(row['content']).decode('utf-8', errors='replace')[:max_text_chars]
+            document = {name: row[name] or '' for name in cls.FIELDS}
+            document.update(invoice_id=row['id'], body=body)
+            documents.append(document)
+        return documents
+
+    @classmethod
+    def remove(cls, connection, invoice_ids: Iterable[int]) -> None:
+        invoice_ids = [int(i) for i in invoice_ids]
+        if not invoice_ids:
+            return
+        key = 'rowid' if connection.dialect.name == 'sqlite' else 'invoice_id'
+        connection.execute(
+            sa.text(f"DELETE FROM {cls.TABLE} WHERE {key} IN :ids").bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': invoice_ids}
+        )
+
+    @classmethod
+    def index(cls, connection, invoice_ids: Iterable[int], include_text: bool = True,
+              max_text_chars: int = DEFAULT_MAX_TEXT_CHARS) -> None:
+        """(Re)write the index rows of invoice_ids from their current database values."""
+        documents = cls._load_documents(connection, invoice_ids, include_text, max_text_chars)
+        if not documents:
+            return
+        if connection.dialect.name == 'sqlite':
+            # FTS5 has no upsert; replace the rows
+            cls.remove(connection, [doc['invoice_id'] for doc in documents])
+            connection.execute(
+                sa.text(
+                    f"INSERT INTO {cls.TABLE} (rowid, {', '.join(cls.FIELDS)}, body) "
+                    f"VALUES (:invoice_id, {', '.join(':' + name for name in cls.FIELDS)}, :body)"
+                ),
+                documents
+            )
+        else:
+            connection.execute(
+                sa.text(
+                    f"INSERT INTO {cls.TABLE} (invoice_id, document) VALUES (:invoice_id, "
+                    "setweight(to_tsvector('simple', :invoice_number || ' ' || :gst_number), 'A') || "
+                    "setweight(to_tsvector('simple', :vendor_name), 'B') || "
+                    "setweight(to_tsvector('simple', :filename), 'C') || "
+                    "setweight(to_tsvector('simple', :body), 'D')) "
+                    "ON CONFLICT (invoice_id) DO UPDATE SET document = EXCLUDED.document"
+                ),
+                documents
+            )
+
+    @classmethod
+    def reindex(cls, connection, invoice_ids: Iterable[int]) -> None:
+        """index() with the application's SEARCH_INDEX_* settings; a no-op when the index is missing."""
+        if not cls.exists(connection):
+            return
+        try:
+            from flask import current_app
+            include_text = current_app.config.get('SEARCH_INDEX_INCLUDE_TEXT', True)
+            max_text_chars = current_app.config.get('SEARCH_INDEX_MAX_TEXT_CHARS', cls.DEFAULT_MAX_TEXT_CHARS)
+        except RuntimeError:
+            include_text, max_text_chars = True, cls.DEFAULT_MAX_TEXT_CHARS
+        cls.index(connection, invoice_ids, include_text=include_text, max_text_chars=max_text_chars)
+
+    @classmethod
+    def rebuild(cls, connection, include_text: bool = True, max_text_chars: int = DEFAULT_MAX_TEXT_CHARS) -> int:
+        """Index every invoice in id-ordered batches. Returns the number of invoices indexed."""
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql(f"DELETE FROM {cls.TABLE}")
+        count = 0
+        last_id = 0
+        while True:
+            ids = connection.execute(
+                sa.select(cls._invoices.c.id).where(cls._invoices.c.id > last_id)
+                .order_by(cls._invoices.c.id).limit(cls.BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            cls.index(connection, ids, include_text=include_text, max_text_chars=max_text_chars)
+            count += len(ids)
+            last_id = ids[-1]
+        return count
+
+    @classmethod
+    def query_terms(cls, search: str) -> List[str]:
+        """Split user input into lowercase word terms; punctuation never reaches the match syntax."""
+        return re.findall(r'[^\W_]+', (search or '').lower())[:cls.MAX_QUERY_TERMS]
+
+    @classmethod
+    def matches(cls, session, search: str) -> Optional[sa.Subquery]:
+        """
+        Subquery of (invoice_id, rank) for invoices matching every term of search as a prefix.
+        Lower rank is a better match.
+
+        Returns:
+            None if the index is unavailable or search has no word terms, so callers can fall back
+        """
+        terms = cls.query_terms(search)
+        connection = session.connection()
+        if not terms or not cls.exists(connection):
+            return None
+        if connection.dialect.name == 'sqlite':
+            weights = ', '.join(str(w) for w in cls.SQLITE_WEIGHTS)
+            stmt = sa.text(
+                f"SELECT rowid AS invoice_id, bm25({cls.TABLE}, {weights}) AS rank "
+                f"FROM {cls.TABLE} WHERE {cls.TABLE} MATCH :search_query"
+            ).bindparams(search_query=' '.join(f'"{term}"*' for term in terms))
+        else:
+            stmt = sa.text(
+                f"SELECT invoice_id, -ts_rank(document, to_tsquery('simple', :search_query)) AS rank "
+                f"FROM {cls.TABLE} WHERE document @@ to_tsquery('simple', :search_query)"
+            ).bindparams(search_query=' & '.join(f'{term}:*' for term in terms))
+        return stmt.columns(sa.column('invoice_id', sa.Integer), sa.column('rank', sa.Float)).subquery('search_matches')
+
+    @classmethod
+    def register(cls, session) -> None:
+        """Keep the index in step with invoice writes made through session."""
+        if not event.contains(session, 'after_flush', _sync_after_flush):
+            event.listen(session, 'after_flush', _sync_after_flush)
+
+
+def _sync_after_flush(session, flush_context):
+    from models.invoice import Invoice
+    from models.invoice_text import InvoiceText
+
+    connection = session.connection()
+    if not SearchIndex.exists(connection):
+        return
+
+    changed, removed = set(), set()
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            changed.add(obj.id)
+        elif isinstance(obj, InvoiceText):
+            changed.add(obj.invoice_id)
+    for obj in session.dirty:
+        if isinstance(obj, Invoice):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in SearchIndex.FIELDS):
+                changed.add(obj.id)
+        elif isinstance(obj, InvoiceText) and inspect(obj).attrs.content.history.has_changes():
+            changed.add(obj.invoice_id)
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            removed.add(obj.id)
+        elif isinstance(obj, InvoiceText):
+            changed.add(obj.invoice_id)
+
+    changed -= removed
+    changed.discard(None)
+    if not changed and not removed:
+        return
+
+    if removed:
+        SearchIndex.remove(connection, removed)
+    if changed:
+        SearchIndex.reindex(connection, changed)
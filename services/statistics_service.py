@@ -0,0 +1,310 @@
+"""
+Dashboard statistics.
+Each statistic family is one aggregated GROUP BY query, and the assembled
+payloads are cached for STATS_CACHE_TTL_SECONDS. A session hook drops the cache
+after any commit that changes invoice status, priority, amount or department,
+or adds or removes invoices, users or departments.
+"""
+
+import logging
+from datetime import datetime, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.department import Department
+from models.invoice import Invoice
+from models.invoice_rollup import InvoiceRollup
+from models.user import User
+from services.invoice_rollups import InvoiceRollups
+from utils.cache import TTLCache
+from utils.date_buckets import (
+    GRANULARITY_DAY, GRANULARITY_MONTH, GRANULARITY_WEEK, as_date, period_label, period_start,
+    period_start_expression, shift_periods, validate_granularity
+)
+from utils.exceptions import DatabaseError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Invoice columns the cached statistics are derived from
+_INVOICE_STAT_FIELDS = ('status', 'priority', 'total_amount', 'department_id', 'created_at')
+_USER_STAT_FIELDS = ('is_active',)
+_DEPARTMENT_STAT_FIELDS = ('name',)
+_PENDING_KEY = 'statistics_stale'
+
+
+class StatisticsService:
+    """Aggregated, cached statistics for the dashboards."""
+
+    CACHE_PREFIX = 'stats:'
+    INVOICE_STATISTICS_KEY = CACHE_PREFIX + 'invoices'
+    SYSTEM_STATISTICS_KEY = CACHE_PREFIX + 'system'
+    TREND_KEY = CACHE_PREFIX + 'trend'
+    DEFAULT_TTL_SECONDS = 30
+
+    SUBMITTED_STATUSES = (Invoice.STATUS_PENDING, Invoice.STATUS_APPROVED, Invoice.STATUS_REJECTED)
+    PRIORITIES = ('high', 'medium', 'low')
+    DEFAULT_TREND_PERIODS = {GRANULARITY_DAY: 30, GRANULARITY_WEEK: 12, GRANULARITY_MONTH: 12}
+
+    cache = TTLCache(default_ttl=DEFAULT_TTL_SECONDS)
+
+    @classmethod
+    def _ttl(cls) -> float:
+        try:
+            from flask import current_app
+            return current_app.config.get('STATS_CACHE_TTL_SECONDS', cls.DEFAULT_TTL_SECONDS)
+        except RuntimeError:
+            return cls.DEFAULT_TTL_SECONDS
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls.cache.invalidate(cls.CACHE_PREFIX)
+
+    @staticmethod
+    def get_invoice_status_counts() -> Dict[str, Any]:
+        """
+        Invoice counts per status and priority in a single GROUP BY query, over the
+        rollup buckets when the rollup table exists.
+
+        Returns:
+            Dictionary with total, by_status, submitted, priority_counts (over submitted
+            invoices) and approved_amount
+        """
+        try:
+            from app import db
+            if InvoiceRollups.available(db.session):
+                rows = db.session.query(
+                    InvoiceRollup.status,
+                    InvoiceRollup.priority,
+                    db.func.sum(InvoiceRollup.invoice_count),
+                    db.func.sum(InvoiceRollup.total_amount),
+                ).group_by(InvoiceRollup.status, InvoiceRollup.priority).all()
+            else:
+                rows = db.session.query(
+                    Invoice.status,
+                    Invoice.priority,
+                    db.func.count(Invoice.id),
+                    db.func.sum(Invoice.total_amount),
+                ).group_by(Invoice.status, Invoice.priority).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error counting invoices: {str(e)}")
+            raise DatabaseError(f"Failed to count invoices: {str(e)}")
+
+        by_status: Dict[str, int] = {}
+        priority_counts = {priority: 0 for priority in StatisticsService.PRIORITIES}
+        approved_amount = 0.0
+        for status, priority, count, amount in rows:
+            count = int(count or 0)
+            by_status[status] = by_status.get(status, 0) + count
+            if status in StatisticsService.SUBMITTED_STATUSES and priority in priority_counts:
+                priority_counts[priority] += count
+            if status == Invoice.STATUS_APPROVED and amount:
+                approved_amount += float(amount)
+        return {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'submitted': sum(by_status.get(s, 0) for s in StatisticsService.SUBMITTED_STATUSES),
+            'priority_counts': priority_counts,
+            'approved_amount': round(approved_amount, 2),
+        }
+
+    @staticmethod
+    def _build_invoice_statistics() -> Dict[str, Any]:
+        from services.database_service import DatabaseService
+
+        counts = StatisticsService.get_invoice_status_counts()
+        return {
+            'total_invoices': counts['total'],
+            'pending_count': counts['by_status'].get(Invoice.STATUS_PENDING, 0),
+            'approved_count': counts['by_status'].get(Invoice.STATUS_APPROVED, 0),
+            'rejected_count': counts['by_status'].get(Invoice.STATUS_REJECTED, 0),
+            'total_amount': counts['approved_amount'],
+            'priority_counts': counts['priority_counts'],
+            'department_summary': DatabaseService.get_department_summary(),
+            'recent_activity': DatabaseService.get_recent_activity(limit=10)
+        }
+
+    @classmethod
+    def get_invoice_statistics(cls) -> Dict[str, Any]:
+        """
+        Invoice dashboard statistics, served from the cache when fresh.
+
+        Returns:
+            Dictionary with status counts, approved amount, priority counts,
+            department summary and recent activity
+        """
+        return cls.cache.get_or_set(cls.INVOICE_STATISTICS_KEY, cls._build_invoice_statistics, cls._ttl())
+
+    @staticmethod
+    def _trend_range(granularity: str, date_from: Optional[datetime],
+                     date_to: Optional[datetime]) -> Tuple[datetime, Optional[datetime]]:
+        """Default the start to the last DEFAULT_TREND_PERIODS buckets up to date_to (or now)."""
+        if date_from is None:
+            anchor = period_start(date_to or datetime.utcnow(), granularity)
+            periods = StatisticsService.DEFAULT_TREND_PERIODS[granularity]
+            date_from = datetime.combine(shift_periods(anchor, granularity, 1 - periods), time.min)
+        if date_to is not None and date_to <= date_from:
+            raise ValidationError('date_to must be later than date_from')
+        return date_from, date_to
+
+    @staticmethod
+    def _build_submission_trend(granularity: str, date_from: datetime,
+                                date_to: Optional[datetime]) -> List[Dict[str, Any]]:
+        from app import db
+
+        def month_aligned(value):
+            return value is None or (value == datetime.combine(period_start(value, GRANULARITY_MONTH), time.min))
+
+        try:
+            if (granularity == GRANULARITY_MONTH and month_aligned(date_from) and month_aligned(date_to)
+                    and InvoiceRollups.available(db.session)):
+                # Whole months: read the monthly rollup buckets
+                bucket = InvoiceRollup.month
+                query = db.session.query(bucket, db.func.sum(InvoiceRollup.invoice_count))\
+                    .filter(InvoiceRollup.status.in_(StatisticsService.SUBMITTED_STATUSES),
+                            bucket >= date_from.date())
+                if date_to is not None:
+                    query = query.filter(bucket < date_to.date())
+            else:
+                # Range scan on (status, created_at); only the bucket column is read
+                bucket = period_start_expression(Invoice.created_at, granularity, db.engine.dialect.name)
+                query = db.session.query(bucket, db.func.count(Invoice.id))\
+                    .filter(Invoice.status.in_(StatisticsService.SUBMITTED_STATUSES),
+                            Invoice.created_at >= date_from)
+                if date_to is not None:
+                    query = query.filter(Invoice.created_at < date_to)
+            rows = query.group_by(bucket).order_by(bucket).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error building invoice trend: {str(e)}")
+            raise DatabaseError(f"Failed to build invoice trend: {str(e)}")
+
+        trend = []
+        for value, count in rows:
+            if not count:
+                continue
+            label = period_label(as_date(value), granularity)
+            point = {'period': label, 'count': int(count)}
+            if granularity == GRANULARITY_MONTH:
+                point['month'] = label
+            trend.append(point)
+        return trend
+
+    @classmethod
+    def get_submission_trend(cls, granularity: str = GRANULARITY_MONTH, date_from: Optional[datetime] = None,
+                             date_to: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Submitted invoice counts per day, week or month, from one GROUP BY query.
+
+        Args:
+            granularity: 'day', 'week' (starting Monday) or 'month'
+            date_from: Inclusive start; defaults to the start of the last DEFAULT_TREND_PERIODS buckets
+            date_to: Exclusive end; open-ended if None
+
+        Returns:
+            List of {'period', 'count'} in period order, plus 'month' for monthly buckets;
+            buckets without submissions are omitted
+
+        Raises:
+            ValidationError: If granularity is unknown or the range is empty
+        """
+        validate_granularity(granularity)
+        date_from, date_to = cls._trend_range(granularity, date_from, date_to)
+        key = f"{cls.TREND_KEY}:{granularity}:{date_from.isoformat()}:{date_to.isoformat() if date_to else ''}"
+        return cls.cache.get_or_set(
+            key, lambda: cls._build_submission_trend(granularity, date_from, date_to), cls._ttl()
+        )
+
+    @staticmethod
+    def _build_system_statistics() -> Dict[str, Any]:
+        from app import db
+        from services.audit_service import AuditService
+
+        try:
+            total_users, active_users = db.session.query(
+                db.func.count(User.id),
+                db.func.sum(db.case((User.is_active.is_(True), 1), else_=0)),
+            ).one()
+            total_departments = db.session.query(db.func.count(Department.id)).scalar()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error counting users: {str(e)}")
+            raise DatabaseError(f"Failed to count users: {str(e)}")
+
+        counts = StatisticsService.get_invoice_status_counts()
+        return {
+            'users': {
+                'total': total_users,
+                'active': int(active_users or 0),
+            },
+            'departments': {
+                'total': total_departments
+            },
+            'invoices': {
+                # Only invoices that have been submitted for approval (not drafts)
+                'total': counts['submitted'],
+                'pending': counts['by_status'].get(Invoice.STATUS_PENDING, 0),
+                'approved': counts['by_status'].get(Invoice.STATUS_APPROVED, 0),
+                'rejected': counts['by_status'].get(Invoice.STATUS_REJECTED, 0),
+            },
+            'recent_activity': [log.to_dict() for log in AuditService.get_recent_audit_logs(limit=20)]
+        }
+
+    @classmethod
+    def get_system_statistics(cls, granularity: str = GRANULARITY_MONTH, date_from: Optional[datetime] = None,
+                              date_to: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        System-wide statistics for the Super Admin dashboard, served from the cache when fresh.
+
+        Args:
+            granularity: Trend bucket size, see get_submission_trend
+            date_from: Inclusive start of the trend range
+            date_to: Exclusive end of the trend range
+
+        Raises:
+            ValidationError: If the trend parameters are invalid
+        """
+        trend = cls.get_submission_trend(granularity, date_from, date_to)
+        stats = cls.cache.get_or_set(cls.SYSTEM_STATISTICS_KEY, cls._build_system_statistics, cls._ttl())
+        return dict(stats, invoices=dict(stats['invoices'], trend=trend, trend_granularity=granularity))
+
+    @staticmethod
+    def mark_stale(session) -> None:
+        """Invalidate the cache when session commits; for writes that bypass the flush, e.g. set-based UPDATEs."""
+        session.info[_PENDING_KEY] = True
+
+    @classmethod
+    def register(cls, session) -> None:
+        """Invalidate the cached statistics when a commit through session changes what they count."""
+        if not event.contains(session, 'after_flush', _mark_stale_after_flush):
+            event.listen(session, 'after_flush', _mark_stale_after_flush)
+            event.listen(session, 'after_commit', _invalidate_after_commit)
+
+
+def _changes_statistics(obj, new_or_deleted: bool) -> bool:
+    if isinstance(obj, Invoice):
+        fields = _INVOICE_STAT_FIELDS
+    elif isinstance(obj, User):
+        fields = _USER_STAT_FIELDS
+    elif isinstance(obj, Department):
+        fields = _DEPARTMENT_STAT_FIELDS
+    else:
+        return False
+    if new_or_deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _mark_stale_after_flush(session, flush_context):
+    if session.info.get(_PENDING_KEY):
+        return
+    if (any(_changes_statistics(obj, True) for obj in session.new)
+            or any(_changes_statistics(obj, True) for obj in session.deleted)
+            or any(_changes_statistics(obj, False) for obj in session.dirty)):
+        session.info[_PENDING_KEY] = True
+
+
+def _invalidate_after_commit(session):
+    # Only once the change is visible, so a concurrent rebuild cannot cache the old state
+    if session.info.pop(_PENDING_KEY, False):
+        StatisticsService.invalidate()
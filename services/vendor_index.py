@@ -0,0 +1,208 @@
+"""
+Vendor name matching over invoices.vendor_name_norm.
+PostgreSQL serves substring and fuzzy matches from a pg_trgm GIN index. Other
+backends resolve the filter against an in-process trigram index of the distinct
+normalized vendor names, then look invoices up by the b-tree index on the key.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+
+from utils.exceptions import ValidationError
+from utils.normalization import normalize_vendor_name_key
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word, padded the way pg_trgm pads them."""
+    grams = set()
+    for word in (text or '').lower().split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _TrigramKeyIndex:
+    """In-memory inverted trigram index of normalized vendor keys."""
+
+    def __init__(self):
+        self.keys: Set[str] = set()
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.key_grams: Dict[str, Set[str]] = {}
+        self.last_invoice_id = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def add(self, key: str) -> None:
+        if key in self.keys:
+            return
+        grams = trigrams(key)
+        self.keys.add(key)
+        self.key_grams[key] = grams
+        for gram in grams:
+            self.postings[gram].add(key)
+
+    def refresh(self, connection, max_age: float) -> None:
+        """Reload every distinct key when stale; otherwise only pick up keys of newer invoices."""
+        invoices = sa.table('invoices', sa.column('id'), sa.column('vendor_name_norm'))
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > max_age:
+                # Edits to existing invoices are picked up here
+                self.keys, self.postings, self.key_grams = set(), defaultdict(set), {}
+                self.last_invoice_id = connection.execute(sa.select(sa.func.max(invoices.c.id))).scalar() or 0
+                rows = connection.execute(
+                    sa.select(invoices.c.vendor_name_norm).where(invoices.c.vendor_name_norm.isnot(None)).distinct()
+                ).scalars()
+                for key in rows:
+                    self.add(key)
+                self.loaded_at = time.monotonic()
+                return
+            rows = connection.execute(
+                sa.select(invoices.c.id, invoices.c.vendor_name_norm)
+                .where(invoices.c.id > self.last_invoice_id).order_by(invoices.c.id)
+            ).fetchall()
+            for invoice_id, key in rows:
+                if key:
+                    self.add(key)
+                self.last_invoice_id = invoice_id
+
+    def containing(self, fragment: str) -> List[str]:
+        grams = trigrams(fragment)
+        # Every trigram inside a word of fragment also occurs in a key containing it
+        inner = [g for g in grams if not g.startswith(' ') and not g.endswith(' ')]
+        # Held while reading: refresh() and add() change these sets from other request threads
+        with self.lock:
+            candidates = self.keys
+            for gram in inner:
+                candidates = candidates & self.postings.get(gram, set())
+                if not candidates:
+                    return []
+            return [key for key in candidates if fragment in key]
+
+    def similar(self, text: str, threshold: float) -> List[str]:
+        grams = trigrams(text)
+        if not grams:
+            return []
+        shared = defaultdict(int)
+        matches = []
+        with self.lock:
+            for gram in grams:
+                for key in self.postings.get(gram, ()):
+                    shared[key] += 1
+            for key, count in shared.items():
+                if count / (len(grams) + len(self.key_grams[key]) - count) >= threshold:
+                    matches.append(key)
+        return matches
+
+
+class VendorIndex:
+    """Builds vendor_name filters for invoice listings."""
+
+    MATCH_CONTAINS = 'contains'
+    MATCH_EXACT = 'exact'
+    MATCH_FUZZY = 'fuzzy'
+    MATCH_MODES = (MATCH_CONTAINS, MATCH_EXACT, MATCH_FUZZY)
+
+    TRIGRAM_INDEX = 'ix_invoices_vendor_name_norm_trgm'
+    DEFAULT_THRESHOLD = 0.3  # pg_trgm's default similarity threshold
+    DEFAULT_REFRESH_SECONDS = 300
+    # Above this many matching keys an IN list stops paying off
+    MAX_KEYS_IN_FILTER = 500
+
+    _key_indexes = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def create_trigram_index(cls, connection) -> bool:
+        """Create the pg_trgm index on PostgreSQL. Returns False elsewhere or without the extension."""
+        if connection.dialect.name != 'postgresql':
+            return False
+        savepoint = connection.begin_nested()
+        try:
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {cls.TRIGRAM_INDEX} ON invoices USING GIN (vendor_name_norm gin_trgm_ops)"
+            )
+            savepoint.commit()
+            return True
+        except SQLAlchemyError as e:
+            savepoint.rollback()
+            logger.warning(f"pg_trgm vendor index unavailable, fuzzy vendor matching will scan: {str(e)}")
+            return False
+
+    @classmethod
+    def ensure(cls, engine) -> bool:
+        with engine.begin() as connection:
+            return cls.create_trigram_index(connection)
+
+    @classmethod
+    def _key_index(cls, connection) -> _TrigramKeyIndex:
+        engine = connection.engine
+        if engine not in cls._key_indexes:
+            cls._key_indexes[engine] = _TrigramKeyIndex()
+        index = cls._key_indexes[engine]
+        try:
+            from flask import current_app
+            max_age = current_app.config.get('VENDOR_INDEX_REFRESH_SECONDS', cls.DEFAULT_REFRESH_SECONDS)
+        except RuntimeError:
+            max_age = cls.DEFAULT_REFRESH_SECONDS
+        index.refresh(connection, max_age)
+        return index
+
+    @classmethod
+    def filter_clause(cls, session, column, vendor_name: str, mode: str = MATCH_CONTAINS,
+                      threshold: Optional[float] = None):
+        """
+        Build a filter on the normalized vendor column.
+
+        Args:
+            session: Session the listing query runs in
+            column: The vendor_name_norm column
+            vendor_name: Raw vendor name from the request
+            mode: 'contains', 'exact' (same normalized name) or 'fuzzy' (trigram similarity, typo tolerant)
+            threshold: Similarity threshold for fuzzy matching
+
+        Returns:
+            SQLAlchemy criterion, or None if vendor_name normalizes to nothing
+
+        Raises:
+            ValidationError: If mode is unknown
+        """
+        if mode not in cls.MATCH_MODES:
+            raise ValidationError(f"vendor_match must be one of: {', '.join(cls.MATCH_MODES)}")
+        key = normalize_vendor_name_key(vendor_name)
+        if not key:
+            return None
+        if mode == cls.MATCH_EXACT:
+            return column == key
+
+        connection = session.connection()
+        if threshold is None:
+            try:
+                from flask import current_app
+                threshold = current_app.config.get('VENDOR_FUZZY_THRESHOLD', cls.DEFAULT_THRESHOLD)
+            except RuntimeError:
+                threshold = cls.DEFAULT_THRESHOLD
+
+        if connection.dialect.name == 'postgresql':
+            if mode == cls.MATCH_FUZZY:
+                # Transaction-local threshold for the indexable % operator
+                connection.execute(
+                    sa.text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                    {'threshold': str(threshold)}
+                )
+                return column.op('%')(key)
+            return column.contains(key, autoescape=True)
+
+        index = cls._key_index(connection)
+        keys = index.similar(key, threshold) if mode == cls.MATCH_FUZZY else index.containing(key)
+        if mode == cls.MATCH_CONTAINS and len(keys) > cls.MAX_KEYS_IN_FILTER:
+            return column.contains(key, autoescape=True)
+        return column.in_(keys) if keys else sa.false()
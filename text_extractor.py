@@ -1,5 +1,5 @@
 import os
-from typing import Tuple
+from typing import Tuple, Optional, Callable
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
@@ -64,7 +64,13 @@ def _ocr_pixmap(page) -> str:
     img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
     return pytesseract.image_to_string(img)
 
-def extract_text(file_path: str, use_ocr: bool = True, save_text_dir: str = "../outputs/text") -> Tuple[str, bool, str]:
+def extract_text(
+    file_path: str,
+    use_ocr: bool = True,
+    save_text_dir: str = "../outputs/text",
+    progress: Optional[Callable[..., None]] = None,
+) -> Tuple[str, bool, str]:
+    """Extract text page by page. `progress(stage, **data)` is called after each page if given."""
     try:
         if not is_supported(os.path.splitext(file_path)[1]):
             raise ValueError("Only PDF files are supported by text_extractor.")
@@ -75,9 +81,14 @@ def extract_text(file_path: str, use_ocr: bool = True, save_text_dir: str = "../
         used_ocr_any = False
 
         with fitz.open(file_path) as doc:
-            for page in doc:
+            page_count = doc.page_count
+            for page_no, page in enumerate(doc, start=1):
                 raw_text = page.get_text("text") or ""
+                if progress:
+                    progress("text_layer_read", page=page_no, pages=page_count)
                 ocr_text = _ocr_pixmap(page) if use_ocr else ""
+                if use_ocr and progress:
+                    progress("ocr_page", page=page_no, pages=page_count)
 
                 # Prefer OCR if it's more complete
                 if use_ocr and len(ocr_text.strip()) > len(raw_text.strip()):
@@ -0,0 +1,76 @@
+"""
+Small in-process TTL cache.
+Entries live in the worker process that computed them; invalidation is local to
+that process, so with several workers the TTL bounds how stale the others get.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after a time-to-live."""
+
+    def __init__(self, default_ttl: float = 30.0):
+        self.default_ttl = default_ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so values computed before it are not stored
+        self._generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value for key, computing it with factory on a miss.
+
+        Concurrent misses on the same key wait for a single computation instead of
+        each running factory. A value is not stored if the key was invalidated
+        while it was being computed.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key, missing)
+            if value is not missing:
+                return value
+            with self._lock:
+                generation = self._generation
+            value = factory()
+            with self._lock:
+                if generation != self._generation:
+                    return value
+            self.set(key, value, ttl)
+            return value
+
+    def invalidate(self, prefix: str = '') -> None:
+        """Drop every entry whose (string) key starts with prefix; all entries by default."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if str(k).startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self.invalidate()
@@ -0,0 +1,88 @@
+"""Backend-aware date bucketing for GROUP BY queries."""
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import sqlalchemy as sa
+
+from utils.exceptions import ValidationError
+
+GRANULARITY_DAY = 'day'
+GRANULARITY_WEEK = 'week'
+GRANULARITY_MONTH = 'month'
+GRANULARITIES = (GRANULARITY_DAY, GRANULARITY_WEEK, GRANULARITY_MONTH)
+
+
+def validate_granularity(granularity: str) -> str:
+    """
+    Raises:
+        ValidationError: If granularity is not one of GRANULARITIES
+    """
+    if granularity not in GRANULARITIES:
+        raise ValidationError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    return granularity
+
+
+def _inline(value: str):
+    # Constants rendered inline, so the expression is identical in SELECT and GROUP BY
+    return sa.literal_column("'%s'" % value.replace("'", "''"))
+
+
+def period_start_expression(column, granularity: str, dialect_name: str):
+    """
+    SQL expression truncating a timestamp column to the start of its bucket.
+    Weeks start on Monday. The result type differs per backend; read it back with as_date().
+    """
+    if dialect_name == 'sqlite':
+        if granularity == GRANULARITY_DAY:
+            return sa.func.date(column)
+        if granularity == GRANULARITY_WEEK:
+            # Step back six days, then forward to the next Monday: the Monday on or before column
+            return sa.func.date(column, _inline('-6 days'), _inline('weekday 1'))
+        return sa.func.strftime(_inline('%Y-%m-01'), column)
+    if dialect_name == 'postgresql':
+        return sa.func.date_trunc(_inline(granularity), column)
+    # MySQL / MariaDB
+    if granularity == GRANULARITY_DAY:
+        return sa.func.date(column)
+    if granularity == GRANULARITY_WEEK:
+        return sa.func.subdate(sa.func.date(column), sa.func.weekday(column))
+    return sa.func.date_format(column, _inline('%Y-%m-01'))
+
+
+def as_date(value) -> Optional[date]:
+    """Normalize a bucket value read from any backend (date, datetime or ISO string) to a date."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def period_start(value, granularity: str) -> Optional[date]:
+    """Python counterpart of period_start_expression."""
+    day = as_date(value)
+    if day is None:
+        return None
+    if granularity == GRANULARITY_WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == GRANULARITY_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def shift_periods(start: date, granularity: str, count: int) -> date:
+    """Start of the bucket count periods after (or before, if negative) the bucket starting at start."""
+    if granularity == GRANULARITY_DAY:
+        return start + timedelta(days=count)
+    if granularity == GRANULARITY_WEEK:
+        return start + timedelta(weeks=count)
+    months = start.year * 12 + start.month - 1 + count
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def period_label(start: date, granularity: str) -> str:
+    """'YYYY-MM' for months, 'YYYY-MM-DD' (the first day) for days and weeks."""
+    return start.strftime('%Y-%m') if granularity == GRANULARITY_MONTH else start.isoformat()
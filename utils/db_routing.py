@@ -0,0 +1,143 @@
+"""
+Read-replica routing for the Flask-SQLAlchemy session.
+When DATABASE_REPLICA_URLS is configured, sessions serving GET/HEAD requests run
+their reads on one replica picked per request, so the DatabaseService and
+AuditService read helpers behind those endpoints never touch the primary.
+Flushes, every statement after the request's first write, write requests and
+work outside a request always use the primary. A client that wrote recently
+keeps reading from the primary for REPLICA_STICKY_SECONDS (read-your-writes);
+that memory is per worker process, so size the window to cover replica lag.
+"""
+
+import hashlib
+import random
+from contextlib import contextmanager
+from typing import List, Optional
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+from utils.cache import TTLCache
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+DEFAULT_STICKY_SECONDS = 10
+
+_WROTE = 'smartinv.db_wrote'
+_REPLICA_KEY = 'smartinv.db_replica'
+_FORCE = 'routing_force'  # 'replica' or 'primary'
+
+# Clients that committed a write recently, keyed by client_key()
+_recent_writers = TTLCache(default_ttl=DEFAULT_STICKY_SECONDS)
+
+
+def replica_binds(urls: List[str], options_for=None) -> dict:
+    """
+    SQLALCHEMY_BINDS entries for the replica URLs.
+
+    Args:
+        urls: Replica database URLs
+        options_for: Optional callable(url) returning engine options for that URL
+    """
+    binds = {}
+    for index, url in enumerate(u.strip() for u in urls if u and u.strip()):
+        binds[f'{REPLICA_BIND_PREFIX}{index}'] = dict(options_for(url) if options_for else {}, url=url)
+    return binds
+
+
+def client_key() -> Optional[str]:
+    """Identify the caller of the current request for read-your-writes stickiness."""
+    email = request.headers.get('X-User-Email')
+    if email:
+        return f'email:{email.strip().lower()}'
+    authorization = request.headers.get('Authorization')
+    if authorization:
+        return 'token:' + hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:32]
+    return None
+
+
+def _request_wrote() -> bool:
+    return has_request_context() and request.environ.get(_WROTE, False)
+
+
+def _mark_request_wrote() -> None:
+    if has_request_context():
+        request.environ[_WROTE] = True
+
+
+class RoutingSession(Session):
+    """Session whose reads go to a replica bind when the current request allows it."""
+
+    def _replica_keys(self) -> List[str]:
+        return [key for key in self._db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+    def _reads_from_replica(self) -> bool:
+        if self._flushing:
+            return False
+        forced = self.info.get(_FORCE)
+        if forced:
+            return forced == 'replica'
+        if not has_request_context() or request.method not in READ_METHODS or _request_wrote():
+            return False
+        key = client_key()
+        return key is None or _recent_writers.get(key) is None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Bulk INSERT/UPDATE/DELETE statements are writes even outside a flush
+        if isinstance(clause, UpdateBase):
+            _mark_request_wrote()
+        elif bind is None and self._reads_from_replica():
+            # Routing state lives on the request (or the session outside one)
+            state = request.environ if has_request_context() else self.info
+            if _REPLICA_KEY not in state:
+                keys = self._replica_keys()
+                # One replica per request, so it reads a single snapshot
+                state[_REPLICA_KEY] = random.choice(keys) if keys else None
+            if state[_REPLICA_KEY]:
+                return self._db.engines[state[_REPLICA_KEY]]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def _forced(session, route: str):
+    previous = session.info.get(_FORCE)
+    session.info[_FORCE] = route
+    try:
+        yield session
+    finally:
+        if previous is None:
+            session.info.pop(_FORCE, None)
+        else:
+            session.info[_FORCE] = previous
+
+
+def replica_reads(session):
+    """Route reads in the block to a replica, e.g. for report jobs outside a request."""
+    return _forced(session, 'replica')
+
+
+def primary_reads(session):
+    """Keep reads in the block on the primary, e.g. a GET that must see the latest state."""
+    return _forced(session, 'primary')
+
+
+def _mark_wrote_after_flush(session, flush_context):
+    _mark_request_wrote()
+
+
+def _stick_after_commit(session):
+    if not _request_wrote():
+        return
+    key = client_key()
+    if key:
+        ttl = current_app.config.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+        _recent_writers.set(key, True, ttl)
+
+
+def register_write_tracking(session) -> None:
+    """Track writes made through session for routing and stickiness."""
+    if not event.contains(session, 'after_flush', _mark_wrote_after_flush):
+        event.listen(session, 'after_flush', _mark_wrote_after_flush)
+        event.listen(session, 'after_commit', _stick_after_commit)
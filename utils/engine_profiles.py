@@ -0,0 +1,88 @@
+"""
+Per-backend database engine profiles.
+SQLite gets WAL journaling and a busy timeout so concurrent workers queue for the
+write lock instead of failing with "database is locked"; PostgreSQL gets an
+explicit connection pool and a server-side statement timeout.
+"""
+
+import logging
+import weakref
+from typing import Any, Dict, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# Engines that already have the SQLite PRAGMA hook
+_configured = weakref.WeakSet()
+
+
+def sqlite_pragmas(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """PRAGMAs applied to every new SQLite connection, in order."""
+    return {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        'cache_size': -int(config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    }
+
+
+def engine_options(database_uri: str, config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the backend of database_uri.
+
+    Args:
+        database_uri: SQLAlchemy database URL
+        config: Application config holding the SQLITE_* / DB_* settings
+
+    Returns:
+        Keyword arguments for create_engine
+    """
+    backend = make_url(database_uri).get_backend_name()
+    if backend == 'sqlite':
+        # The driver-level timeout covers waits before the busy_timeout PRAGMA has run
+        return {'connect_args': {'timeout': int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000.0}}
+    options = {
+        'pool_size': int(config.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(config.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(config.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(config.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+    statement_timeout = int(config.get('DB_STATEMENT_TIMEOUT_MS', 0) or 0)
+    if backend == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+def merge_engine_options(base: Mapping[str, Any], overrides: Mapping[str, Any]) -> Dict[str, Any]:
+    """Explicitly configured options win; connect_args are merged key by key."""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if key == 'connect_args' and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def apply_engine_profile(engine, config: Mapping[str, Any]) -> None:
+    """Install the per-connection settings that create_engine options cannot express."""
+    if engine.dialect.name != 'sqlite' or engine in _configured:
+        return
+    pragmas = sqlite_pragmas(config)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+    _configured.add(engine)
+    logger.debug(f"SQLite engine profile applied: {pragmas}")
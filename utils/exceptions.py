@@ -11,6 +11,12 @@ class FileValidationError(InvoiceProcessingError):
     """Exception raised when file validation fails."""
     pass
 
+class UploadOffsetError(FileValidationError):
+    """Exception raised when a chunk does not start at the current end of a chunked upload."""
+    def __init__(self, message, expected_offset):
+        super().__init__(message)
+        self.expected_offset = expected_offset
+
 class ExtractionError(InvoiceProcessingError):
     """Exception raised when invoice data extraction fails."""
     pass
@@ -0,0 +1,359 @@
+"""
+Chunk generators for streamed file exports (NDJSON, CSV, XLSX, Parquet, gzip).
+Each stage consumes and yields lazily, so a response built from them holds
+only the current buffer in memory however many rows are exported.
+"""
+
+import csv
+import io
+import itertools
+import json
+import math
+import re
+import zipfile
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from utils.exceptions import ValidationError
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+FORMAT_XLSX = 'xlsx'
+FORMAT_PARQUET = 'parquet'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_NONE = 'none'
+COMPRESSIONS = (COMPRESSION_GZIP, COMPRESSION_NONE)
+
+MIMETYPES = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv',
+    FORMAT_XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    FORMAT_PARQUET: 'application/vnd.apache.parquet',
+}
+
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+
+def validate_choice(value: str, choices, name: str) -> str:
+    """
+    Raises:
+        ValidationError: If value is not one of choices
+    """
+    value = (value or '').lower()
+    if value not in choices:
+        raise ValidationError(f"Invalid {name} '{value}'. Use one of: {', '.join(choices)}")
+    return value
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def primed(rows: Iterable[Any]) -> Iterator[Any]:
+    """
+    rows with the first one already read, so the query (or file) behind a lazy row
+    source runs, and fails, before the response starts rather than inside its body.
+    """
+    iterator = iter(rows)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return itertools.chain((first,), iterator)
+
+
+def ndjson_lines(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """One JSON document per row, newline-terminated."""
+    for row in rows:
+        yield json.dumps(row, default=_default, separators=(',', ':')) + '\n'
+
+
+def csv_lines(rows: Iterable[Dict[str, Any]], columns: List[str], batch_rows: int = 500) -> Iterator[str]:
+    """
+    Header plus one CSV record per row, in batches of batch_rows records.
+    Dict and list values are written as JSON; datetimes as ISO 8601.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        record = []
+        for column in columns:
+            value = row.get(column)
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, default=_default, separators=(',', ':'))
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            record.append(value)
+        writer.writerow(record)
+        pending += 1
+        if pending >= batch_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encoded(chunks: Iterable[str], chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[bytes]:
+    """UTF-8 encode chunks, coalescing small ones into writes of about chunk_bytes."""
+    pending: List[bytes] = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream into one gzip member, yielding output as the compressor emits it."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_body(lines: Iterable[str], compression: str) -> Iterator[bytes]:
+    """Response body for text lines, gzip-compressed unless compression is 'none'."""
+    body = encoded(lines)
+    return gzipped(body) if compression == COMPRESSION_GZIP else body
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable file collecting what zipfile / pyarrow write until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_XLSX_REL_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_XLSX_MAIN_NS}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+# Characters XML 1.0 does not allow; extracted PDF text occasionally contains them
+_XML_INVALID = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _column_letter(index: int) -> str:
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(reference: str, value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)) and not (isinstance(value, float) and not math.isfinite(value)):
+        return f'<c r="{reference}"><v>{value!r}</v></c>'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, default=_default, separators=(',', ':'))
+    text = escape(_XML_INVALID.sub('', str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_chunks(rows: Iterable[Dict[str, Any]], columns: List[str], sheet_name: str = 'Sheet1',
+                batch_rows: int = 500) -> Iterator[bytes]:
+    """
+    A one-sheet workbook (header row, then one row per dict), streamed as it is written.
+
+    The worksheet goes straight into a deflated zip entry with inline strings, so nothing
+    is buffered beyond batch_rows rows; the zip directory follows the last row.
+    """
+    sink = _ChunkSink()
+    letters = [_column_letter(index) for index in range(len(columns))]
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, xml in _XLSX_PARTS.items():
+            workbook.writestr(name, _XML_HEADER + xml)
+        workbook.writestr('xl/workbook.xml', _XML_HEADER + (
+            f'<workbook xmlns="{_XLSX_MAIN_NS}" xmlns:r="{_XLSX_REL_NS}"><sheets>'
+            f'<sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield sink.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(_xlsx_cell(f'{letter}1', column) for letter, column in zip(letters, columns))
+            sheet.write((_XML_HEADER + f'<worksheet xmlns="{_XLSX_MAIN_NS}"><sheetData>'
+                         f'<row r="1">{header}</row>').encode('utf-8'))
+            pending = []
+            for number, row in enumerate(rows, start=2):
+                cells = ''.join(
+                    _xlsx_cell(f'{letter}{number}', row.get(column)) for letter, column in zip(letters, columns)
+                )
+                pending.append(f'<row r="{number}">{cells}</row>')
+                if len(pending) >= batch_rows:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode('utf-8'))
+    yield sink.drain()
+
+
+# Logical column types accepted by parquet_chunks
+PARQUET_TYPES = ('string', 'int', 'float', 'bool', 'date', 'timestamp')
+
+
+def arrow_schema(columns: List[str], types: Dict[str, str]):
+    """pyarrow schema for columns; types maps them to PARQUET_TYPES names, default 'string'."""
+    pa = require_pyarrow()
+    arrow_types = {
+        'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(),
+        'date': pa.date32(), 'timestamp': pa.timestamp('us'),
+    }
+    return pa.schema([(column, arrow_types[types.get(column, 'string')]) for column in columns])
+
+
+def _arrow_value(value: Any, kind: Optional[str]) -> Any:
+    if value is None:
+        return None
+    if kind == 'date' and isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if kind == 'timestamp' and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if kind == 'string' and not isinstance(value, str):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=_default, separators=(',', ':'))
+        return _default(value) if isinstance(value, (datetime, date)) else str(value)
+    return value
+
+
+def require_pyarrow():
+    """
+    Raises:
+        ValidationError: If pyarrow, needed for Parquet, is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValidationError("Parquet export requires the pyarrow package")
+    return pyarrow
+
+
+def arrow_table(rows: List[Dict[str, Any]], schema):
+    """pyarrow table of rows with schema, converting ISO strings, dicts etc. to the column types."""
+    pa = require_pyarrow()
+    kinds = {
+        pa.date32(): 'date', pa.timestamp('us'): 'timestamp', pa.string(): 'string',
+    }
+    fields = [(field.name, kinds.get(field.type)) for field in schema]
+    return pa.Table.from_pylist(
+        [{name: _arrow_value(row.get(name), kind) for name, kind in fields} for row in rows], schema=schema
+    )
+
+
+def parquet_batches(rows: Iterable[Dict[str, Any]], columns: List[str], types: Dict[str, str],
+                    batch_rows: int) -> Iterator[Any]:
+    """pyarrow tables of up to batch_rows rows with the schema from columns / types."""
+    schema = arrow_schema(columns, types)
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield arrow_table(batch, schema)
+            batch = []
+    if batch:
+        yield arrow_table(batch, schema)
+
+
+def parquet_chunks(rows: Iterable[Dict[str, Any]], columns: List[str], types: Dict[str, str],
+                   batch_rows: int = 10000) -> Iterator[bytes]:
+    """
+    A Parquet file streamed one row group (batch_rows rows) at a time; the footer comes last.
+    types maps columns to PARQUET_TYPES names, default 'string'.
+    """
+    require_pyarrow()
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, arrow_schema(columns, types), compression='snappy')
+    try:
+        for table in parquet_batches(rows, columns, types, batch_rows):
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_filename(prefix: str, extension: str, compression: Optional[str] = None) -> str:
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    suffix = '.gz' if compression == COMPRESSION_GZIP else ''
+    return f'{prefix}-{stamp}.{extension}{suffix}'
@@ -5,6 +5,7 @@ Handles file validation, path generation, and storage organization.
 
 import os
 import shutil
+import hashlib
 from datetime import datetime
 from typing import Optional
 from werkzeug.utils import secure_filename
@@ -316,6 +317,32 @@ class FileUtils:
             'upload_folder': self.upload_folder
         }
     
+    @staticmethod
+    def compute_sha256(source, chunk_size: int = 1024 * 1024) -> str:
+        """
+        Compute the SHA-256 hex digest of a file without loading it into memory.
+
+        Args:
+            source: Path to the file, or a FileStorage/file-like object
+            chunk_size: Number of bytes read per iteration
+
+        Returns:
+            Hex digest of the file contents
+        """
+        digest = hashlib.sha256()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
+
+        stream = getattr(source, 'stream', source)
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+        stream.seek(0)  # Reset to beginning
+        return digest.hexdigest()
+
     def validate_file_integrity(self, file_path: str) -> bool:
         """
         Validate file integrity (basic checks).
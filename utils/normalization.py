@@ -0,0 +1,74 @@
+"""
+Normalization helpers for building comparable lookup keys from extracted invoice fields.
+Keys are stored alongside the raw values so that duplicate checks are plain indexed equality lookups.
+"""
+
+import re
+from typing import Optional
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+_DIGIT_RUN = re.compile(r'\d+')
+
+# Characters OCR/LLM extraction commonly confuses with digits in invoice numbers
+_DIGIT_LOOKALIKES = str.maketrans({'O': '0', 'I': '1'})
+
+
+def normalize_gstin_key(gst: Optional[str]) -> Optional[str]:
+    """Normalize a GSTIN for comparison: uppercase with separators removed."""
+    if not gst:
+        return None
+    key = _NON_ALNUM.sub('', str(gst).upper())
+    return key or None
+
+
+def normalize_invoice_number_key(invoice_number: Optional[str]) -> Optional[str]:
+    """
+    Normalize an invoice number for duplicate matching.
+
+    Uppercases, drops separators and whitespace, folds common OCR look-alikes
+    (O -> 0, I -> 1) and strips leading zeros from numeric runs, so that
+    'INV/2024-25/001', 'inv 2024 25 1' and 'INV-2O24-25-01' share one key.
+    """
+    if not invoice_number:
+        return None
+    tokens = _NON_ALNUM.split(str(invoice_number).upper().translate(_DIGIT_LOOKALIKES))
+    key = ''.join(_DIGIT_RUN.sub(lambda m: m.group(0).lstrip('0') or '0', t) for t in tokens)
+    return key[:100] or None
+
+
+# Legal-form and filler words that vary between extractions of the same vendor
+_VENDOR_NOISE_WORDS = {
+    'PVT', 'PRIVATE', 'LTD', 'LIMITED', 'LLP', 'LLC', 'INC', 'INCORPORATED',
+    'CO', 'COMPANY', 'CORP', 'CORPORATION', 'PLC', 'THE',
+}
+_VENDOR_MS_PREFIX = re.compile(r'^\s*M\s*/\s*S\b\.?')
+_VENDOR_JOINED_PUNCT = re.compile(r"[.'`’]")
+_NON_ALNUM_SPACE = re.compile(r'[^0-9A-Z]+')
+
+
+def normalize_vendor_name_key(vendor_name: Optional[str]) -> Optional[str]:
+    """
+    Normalize a vendor name for filtering and fuzzy matching.
+
+    Uppercases, drops a leading 'M/s', joins dotted initials, removes legal-form
+    words and merges runs of single letters, so that 'ABC Pvt Ltd',
+    'A.B.C. Private Limited' and 'M/s A B C Pvt. Ltd.' all become 'ABC'.
+    """
+    if not vendor_name:
+        return None
+    text = _VENDOR_MS_PREFIX.sub(' ', str(vendor_name).upper()).replace('&', ' AND ')
+    text = _NON_ALNUM_SPACE.sub(' ', _VENDOR_JOINED_PUNCT.sub('', text))
+    words = []
+    merging_initials = False
+    for word in text.split():
+        if word in _VENDOR_NOISE_WORDS:
+            merging_initials = False
+            continue
+        if len(word) == 1 and merging_initials:
+            words[-1] += word
+        else:
+            words.append(word)
+            merging_initials = len(word) == 1
+    # A name made only of legal-form words is kept as-is rather than dropped
+    key = ' '.join(words) or ' '.join(text.split())
+    return key[:200] or None
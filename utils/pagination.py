@@ -0,0 +1,174 @@
+"""Keyset (cursor) pagination helpers for list queries."""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, or_
+
+from utils.exceptions import ValidationError
+
+DIRECTION_NEXT = 'next'
+DIRECTION_PREV = 'prev'
+
+
+def _encode_value(value: Any) -> Dict[str, Any]:
+    """Tag sort values that JSON cannot carry natively."""
+    if isinstance(value, datetime):
+        return {'t': 'datetime', 'v': value.isoformat()}
+    if isinstance(value, date):
+        return {'t': 'date', 'v': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'t': 'decimal', 'v': str(value)}
+    return {'t': None, 'v': value}
+
+
+def _decode_value(tag: Optional[str], value: Any) -> Any:
+    if value is None or tag is None:
+        return value
+    if tag == 'datetime':
+        return datetime.fromisoformat(value)
+    if tag == 'date':
+        return date.fromisoformat(value)
+    if tag == 'decimal':
+        return Decimal(value)
+    raise ValueError(f'Unknown cursor value type: {tag}')
+
+
+def encode_cursor(sort_key: str, value: Any, row_id: int, direction: str) -> str:
+    """
+    Build an opaque cursor pointing at one row of an ordered listing.
+
+    Args:
+        sort_key: Name of the sort column, so a cursor cannot be replayed under another ordering
+        value: The row's sort column value
+        row_id: The row's primary key, used as tie-breaker
+        direction: DIRECTION_NEXT for rows after the row, DIRECTION_PREV for rows before it
+
+    Returns:
+        URL-safe base64 string
+    """
+    payload = dict(_encode_value(value), s=sort_key, id=row_id, d=direction)
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValidationError: If the cursor is malformed or was issued for a different sort key
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        decoded = {
+            'value': _decode_value(payload.get('t'), payload.get('v')),
+            'id': int(payload['id']),
+            'direction': payload['d'],
+            'sort_key': payload['s'],
+        }
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, AttributeError):
+        raise ValidationError('Invalid pagination cursor')
+    if decoded['direction'] not in (DIRECTION_NEXT, DIRECTION_PREV):
+        raise ValidationError('Invalid pagination cursor')
+    if decoded['sort_key'] != sort_key:
+        raise ValidationError('Pagination cursor does not match the requested sort order')
+    return decoded
+
+
+def _order_by(sort_column, id_column, descending: bool, nulls_last: bool, nullable: bool):
+    sort = sort_column.desc() if descending else sort_column.asc()
+    if nullable:
+        sort = sort.nulls_last() if nulls_last else sort.nulls_first()
+    return [sort, id_column.desc() if descending else id_column.asc()]
+
+
+def _after(sort_column, id_column, value, row_id, descending: bool, nulls_last: bool, nullable: bool):
+    """Condition selecting the rows that follow (value, row_id) in the given ordering."""
+    beyond = (lambda a, b: a < b) if descending else (lambda a, b: a > b)
+    if value is None:
+        if nulls_last:
+            return and_(sort_column.is_(None), beyond(id_column, row_id))
+        return or_(sort_column.isnot(None), and_(sort_column.is_(None), beyond(id_column, row_id)))
+    condition = or_(beyond(sort_column, value), and_(sort_column == value, beyond(id_column, row_id)))
+    if nullable and nulls_last:
+        condition = or_(condition, sort_column.is_(None))
+    return condition
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    per_page: int,
+    cursor: Optional[str] = None,
+    descending: bool = True,
+    include_total: bool = False,
+    page: int = 1
+) -> Dict[str, Any]:
+    """
+    Page through query ordered by (sort_column, id_column) without OFFSET.
+
+    NULL sort values always come last. Each page costs one LIMIT query seeking
+    from the cursor, however deep it is; the COUNT(*) over the filtered set only
+    runs when include_total is set.
+
+    Args:
+        query: Filtered, unordered query
+        sort_column: Mapped column to order by
+        id_column: Unique column used as tie-breaker
+        per_page: Number of items per page
+        cursor: Cursor from a previous page's next_cursor or prev_cursor
+        descending: Sort direction
+        include_total: Also count the filtered rows
+        page: Legacy page number, honoured with OFFSET only when no cursor is given
+
+    Returns:
+        Dictionary with items, has_next, has_prev, next_cursor, prev_cursor and total (None unless requested)
+
+    Raises:
+        ValidationError: If the cursor is invalid
+    """
+    sort_key = sort_column.key
+    nullable = bool(getattr(sort_column.expression, 'nullable', True))
+    total = query.order_by(None).count() if include_total else None
+
+    position = decode_cursor(cursor, sort_key) if cursor else None
+    backwards = position is not None and position['direction'] == DIRECTION_PREV
+
+    # Walking backwards reads the reversed ordering, then flips the page back
+    seek_descending = descending != backwards
+    seek_nulls_last = not backwards
+    ordered = query.order_by(*_order_by(sort_column, id_column, seek_descending, seek_nulls_last, nullable))
+    if position is not None:
+        ordered = ordered.filter(_after(
+            sort_column, id_column, position['value'], position['id'], seek_descending, seek_nulls_last, nullable
+        ))
+    elif page > 1:
+        ordered = ordered.offset((page - 1) * per_page)
+
+    rows = ordered.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, position is not None or page > 1
+
+    def cursor_for(item, direction):
+        return encode_cursor(sort_key, getattr(item, sort_key), getattr(item, id_column.key), direction)
+
+    return {
+        'items': items,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'next_cursor': cursor_for(items[-1], DIRECTION_NEXT) if items and has_next else None,
+        'prev_cursor': cursor_for(items[0], DIRECTION_PREV) if items and has_prev else None,
+        'total': total,
+    }
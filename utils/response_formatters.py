@@ -25,7 +25,9 @@ def error(message: str, details: Optional[Dict[str, Any]] = None, status: int =
     return body, status
 
 
-def paginated_list(items: List[Dict[str, Any]], total: int, page: int, per_page: int, pages: int, has_next: bool, has_prev: bool):
+def paginated_list(items: List[Dict[str, Any]], total: Optional[int], page: int, per_page: int, pages: Optional[int], has_next: bool, has_prev: bool,
+                   next_cursor: Optional[str] = None, prev_cursor: Optional[str] = None):
+    # total and pages are None when the listing was fetched without a count
     return {
         'items': items,
         'pagination': {
@@ -34,7 +36,9 @@ def paginated_list(items: List[Dict[str, Any]], total: int, page: int, per_page:
             'per_page': per_page,
             'pages': pages,
             'has_next': has_next,
-            'has_prev': has_prev
+            'has_prev': has_prev,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
         }
     }
 